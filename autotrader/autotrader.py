@@ -2,25 +2,62 @@
 """The file contains the class definition of autotrader."""
 
 from autotrader.setup_logger import logger
+from autotrader.metrics import BUCKETS
+from autotrader.tracing import span
+from autotrader.sessions import sessions as exchange_sessions
 from brokers.degiro import Degiro
 
 
 class Autotrader(Degiro):
     """Class representation of autotrader."""
 
-    def __init__(self, user, password, budget, trading_info):
+    def __init__(self, user, password, budget, trading_info=None,
+                 journal=None, sessions=None):
         self.user = user
         self.password = password
         self.budget = budget
         self.source = None
         self.origin = None
         self.exchange = None
+        self.trading_data = []
+        self.sessions = sessions if sessions is not None \
+            else exchange_sessions
+        Degiro.__init__(self, journal=journal)
+        self.signal_to_order = self.metrics.histogram(
+            'autotrader_signal_to_order_seconds',
+            'Time from receipt of trading info to order confirmation '
+            'in seconds.',
+            buckets=BUCKETS + (60.0, 120.0))
+        self.dropped_count = self.metrics.counter(
+            'autotrader_orders_dropped_total',
+            'Orders dropped before sending to the broker.',
+            labelnames=('reason',))
+        if trading_info is not None:
+            self.load(trading_info)
+
+    def load(self, trading_info):
+        """
+        Load trading info of the next batch.
+
+        The broker session is kept, so the same instance can execute
+        several batches without logging in again.
+
+        Parameters
+        ----------
+        trading_info : dict
+            Trading info with keys `from`, `to`, and `data`.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.trading_data = []
         try:
             self.source = trading_info['from']
             self.origin = trading_info['to']
-            self.trading_data = trading_info['data']
             if self.origin.lower() == 'degiro':
-                Degiro.__init__(self)
+                self.trading_data = trading_info['data']
                 self.exchange = 'XET'
             else:
                 logger.warning('Unknown broker.')
@@ -34,98 +71,186 @@ class Autotrader(Degiro):
         """
         Execute a trade.
 
-        Parameters
-        ----------
-        TO DO
+        Trading data are validated and sized first, then product IDs of
+        all ISINs are resolved concurrently, and finally all orders are
+        placed concurrently.
+
+        If a trace is set, each step is recorded as span and the time from
+        receipt of the trading info to confirmation of each order is
+        recorded as signal-to-order latency.
+
+        Orders are dropped without any request to the broker, while the
+        exchange is closed (see `autotrader.sessions.TradingSessions`).
 
         Returns
         -------
-        None.
+        sent : int
+            Number of orders sent to the broker.
 
         """
-        for trading_data in self.trading_data:
-            # get ISIN from trading data
-            try:
-                isin = trading_data['isin']
-            except KeyError:
-                logger.error('Unexpected key in trading info '
-                             '("isin" expected).')
-                continue
+        orders = []
+        with span(self.trace, 'sizing') as attributes:
+            for trading_data in self.trading_data:
+                order = self._parse_trading_data(trading_data)
+                if order:
+                    orders.append(order)
+            attributes['orders'] = len(orders)
 
-            # get transaction from trading data
-            try:
-                transaction = trading_data['transaction']
-            except KeyError:
-                logger.error('Unexpected key in trading info '
-                             '("transaction" expected).')
-                continue
+        if not orders:
+            return 0
 
-            # get price from trading data
-            try:
-                price = float(trading_data['price'])
-            except KeyError:
-                logger.error('Unexpected key in trading info '
-                             '("price" expected).')
-                continue
-            except ValueError:
-                logger.error('The price is not valid')
-                continue
+        # orders outside trading hours would be rejected by the broker
+        if not self.sessions.is_open(self.exchange):
+            logger.warning('{} is closed until {}, {} orders are dropped.'
+                           .format(self.exchange,
+                                   self.sessions.next_open(self.exchange),
+                                   len(orders)))
+            self.dropped_count.inc(len(orders), reason='closed')
+            if self.trace is not None:
+                self.trace.event('closed', exchange=self.exchange,
+                                 orders=len(orders))
+            return 0
 
-            # get size from trading data
-            try:
-                size = float(trading_data['size'])
-                # if size is quotient
-                if size < 1.0:
-                    if price > 0.0:
-                        size = round(self.budget * size/price)
-                    else:
-                        continue
-                else:
-                    size = round(size)
-            except KeyError:
-                logger.error('Unexpected key in trading info '
-                             '("size" expected).')
-                continue
-            except ValueError:
-                logger.error('The size is not valid')
-                continue
+        # get broker info once per batch
+        with span(self.trace, 'connect'):
+            self.connect(self.user, self.password)
+        #self.get_orders(active=True)
 
-            # check volume
-            if price*size < self.budget/100.0:
-                logger.error('Position size is too small.')
-                continue
+        # get product IDs of all ISINs at once
+        with span(self.trace, 'lookup', isins=len(orders)) as attributes:
+            found, errors = self.search_product_ids(
+                [order['isin'] for order in orders],
+                by='isin', exchange=self.exchange)
+            attributes['found'] = len(found)
 
-            # get broker info
-            self.login(self.user, self.password)
-            self.get_config()
-            self.get_user_info()
-            self.get_data('cashFunds')
-            self.get_data('portfolio')
-            #self.get_orders(active=True)
+        batch = []
+        for order in orders:
+            isin = order['isin']
+            transaction = order['transaction']
+            price = order['price']
+            size = order['size']
 
-            # get product iD
+            # get product ID
             try:
-                product_id = self.search_product_id(
-                    isin, by='isin', exchange=self.exchange)[self.exchange]
-            except Exception as e:
-                logger.error(e)
-                logger.warning('No product ID was found.')
+                product_id = found[isin][self.exchange]
+            except KeyError:
+                logger.warning(errors.get(
+                    isin, 'No product ID was found for {}.'.format(isin)))
                 continue
 
             # check sell size
             if transaction == 'SELL':
-                try:
-                    # get actual size of position
-                    actual_size = self.portfolio.loc[
-                        self.portfolio['id'] == product_id, 'size'].values[0]
-                    # adjust sell size, if required
-                    if (actual_size - size)*price < self.budget/100.0:
-                        size = actual_size
-                except Exception as e:
-                    logger.error(e)
+                # get actual size of position
+                position = self.portfolio.get(product_id)
+                if not position:
+                    logger.error('No position with product ID {} '
+                                 'in portfolio.'.format(product_id))
                     continue
+                # adjust sell size, if required
+                if (position.size - size)*price < self.budget/100.0:
+                    size = position.size
+
+            batch.append({'buy_sell': transaction,
+                          'product_id': product_id,
+                          'size': int(size),
+                          'limit': price,
+                          'stop_loss': None,
+                          'order_type': 0,
+                          'validity': 3})
+
+        # execute trades
+        sent = 0
+        with span(self.trace, 'orders', orders=len(batch)):
+            for result in self.place_orders(batch):
+                if result['sent']:
+                    sent += 1
+                if result['error']:
+                    logger.error('Order {} {} of {} failed: {}'.format(
+                        result['order']['buy_sell'],
+                        result['order']['size'],
+                        result['order']['product_id'],
+                        result['error']))
+                if self.trace is None:
+                    continue
+                self.trace.event('order',
+                                 product_id=result['order']['product_id'],
+                                 order_id=result['order_id'],
+                                 attempts=result['attempts'],
+                                 error=result['error'])
+                if result['order_id']:
+                    self.signal_to_order.observe(self.trace.elapsed())
+
+        return sent
+
+    def _parse_trading_data(self, trading_data):
+        """
+        Validate trading data and calculate order size.
+
+        Parameters
+        ----------
+        trading_data : dict
+            Trading data with keys `isin`, `transaction`, `price`,
+            and `size`.
+
+        Returns
+        -------
+        order : dict or None
+            Order with keys `isin`, `transaction`, `price`, and `size`,
+            or None if trading data are not valid.
+
+        """
+        # get ISIN from trading data
+        try:
+            isin = trading_data['isin']
+        except KeyError:
+            logger.error('Unexpected key in trading info '
+                         '("isin" expected).')
+            return None
+
+        # get transaction from trading data
+        try:
+            transaction = trading_data['transaction']
+        except KeyError:
+            logger.error('Unexpected key in trading info '
+                         '("transaction" expected).')
+            return None
+
+        # get price from trading data
+        try:
+            price = float(trading_data['price'])
+        except KeyError:
+            logger.error('Unexpected key in trading info '
+                         '("price" expected).')
+            return None
+        except ValueError:
+            logger.error('The price is not valid')
+            return None
+
+        # get size from trading data
+        try:
+            size = float(trading_data['size'])
+            # if size is quotient
+            if size < 1.0:
+                if price > 0.0:
+                    size = round(self.budget * size/price)
+                else:
+                    return None
+            else:
+                size = round(size)
+        except KeyError:
+            logger.error('Unexpected key in trading info '
+                         '("size" expected).')
+            return None
+        except ValueError:
+            logger.error('The size is not valid')
+            return None
+
+        # check volume
+        if price*size < self.budget/100.0:
+            logger.error('Position size is too small.')
+            return None
 
-            # execute trade
-            self.place_order(transaction, product_id, int(size),
-                             limit=price, stop_loss=None,
-                             order_type=0, validity=3)
+        return {'isin': isin,
+                'transaction': transaction,
+                'price': price,
+                'size': size}
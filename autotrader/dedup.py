@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of deduplication cache."""
+
+import json
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from autotrader.metrics import REGISTRY
+
+
+class DedupCache:
+    """
+    Bounded, time-windowed cache of seen trading data.
+
+    A key is remembered for `window` seconds from its first sighting,
+    repeats within the window are hits. At most `size` keys are kept,
+    the oldest ones are dropped first. Hits and misses are counted in
+    `autotrader_dedup_total`.
+    """
+
+    def __init__(self, window=900.0, size=4096, registry=None):
+        self.window = window
+        self.size = size
+        self.lock = threading.Lock()
+        # first sighting by key, oldest first
+        self.seen = OrderedDict()
+        registry = registry if registry is not None else REGISTRY
+        self.lookups = registry.counter(
+            'autotrader_dedup_total',
+            'Trading data by result of the duplicate check.',
+            ('result',))
+
+    @staticmethod
+    def key(broker, isin, transaction, price, size):
+        """
+        Build a canonical key of trading data.
+
+        Parameters
+        ----------
+        broker : str
+            Broker, e.g. 'degiro'.
+        isin : str
+            ISIN.
+        transaction : str
+            Transaction, e.g. 'BUY'.
+        price : float or str
+            Price.
+        size : float or str
+            Size, absolute or as quotient of the budget.
+
+        Returns
+        -------
+        key : str
+            SHA-256 hash of the normalized values.
+
+        """
+        def number(value):
+            try:
+                return repr(float(value))
+            except (TypeError, ValueError):
+                return str(value)
+
+        canonical = json.dumps([str(broker).strip().lower(),
+                                str(isin).strip().upper(),
+                                str(transaction).strip().upper(),
+                                number(price),
+                                number(size)])
+        return hashlib.sha256(canonical.encode('utf-8')).hexdigest()
+
+    def check(self, key):
+        """
+        Check a key and remember it, if it is new.
+
+        Parameters
+        ----------
+        key : str
+            Key (see `key`).
+
+        Returns
+        -------
+        duplicate : bool
+            True if the key was seen within the window, False else.
+
+        """
+        now = time.monotonic()
+        with self.lock:
+            # drop keys out of the window
+            while self.seen:
+                oldest, seen = next(iter(self.seen.items()))
+                if now - seen < self.window:
+                    break
+                del self.seen[oldest]
+
+            if key in self.seen:
+                self.lookups.inc(result='hit')
+                return True
+
+            self.seen[key] = now
+            while len(self.seen) > self.size:
+                self.seen.popitem(last=False)
+
+        self.lookups.inc(result='miss')
+        return False
+
+    def forget(self, key):
+        """
+        Forget a key, e.g. if its trading data were not queued.
+
+        Parameters
+        ----------
+        key : str
+            Key (see `key`).
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            self.seen.pop(key, None)
+
+        return None
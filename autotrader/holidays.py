@@ -0,0 +1,362 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of exchange holiday calendar."""
+
+import os
+import re
+import json
+import datetime
+import threading
+from autotrader.setup_logger import logger
+
+PATH_HOLIDAYS = '/var/www/flask/autotrader/holidays.json'
+
+URL_CALENDAR = ('https://www.xetra.com/'
+                'xetra-de/handel/handelskalendar-und-zeiten')
+
+MONTHS = {'Jan': 1,
+          'Feb': 2,
+          'Mär': 3,
+          'Apr': 4,
+          'Mai': 5,
+          'Jun': 6,
+          'Jul': 7,
+          'Aug': 8,
+          'Sep': 9,
+          'Okt': 10,
+          'Nov': 11,
+          'Dez': 12}
+
+
+def easter(year):
+    """
+    Get Easter Sunday of a year (Gregorian calendar).
+
+    Parameters
+    ----------
+    year : int
+        Year.
+
+    Returns
+    -------
+    date : datetime.date
+        Easter Sunday.
+
+    """
+    a = year % 19
+    b, c = divmod(year, 100)
+    d, e = divmod(b, 4)
+    f = (b + 8) // 25
+    g = (b - f + 1) // 3
+    h = (19 * a + b - d - g + 15) % 30
+    i, k = divmod(c, 4)
+    m = (32 + 2 * e + 2 * i - h - k) % 7
+    n = (a + 11 * h + 22 * m) // 451
+    month, day = divmod(h + m - 7 * n + 114, 31)
+
+    return datetime.date(year, month, day + 1)
+
+
+def default_holidays(year):
+    """
+    Get regular FWB holidays of a year without the exchange calendar.
+
+    Parameters
+    ----------
+    year : int
+        Year.
+
+    Returns
+    -------
+    holidays : frozenset
+        New Year, Good Friday, Easter Monday, Labour Day, Christmas Eve,
+        Christmas, Boxing Day, and New Year's Eve.
+
+    """
+    sunday = easter(year)
+    return frozenset([datetime.date(year, 1, 1),
+                      sunday - datetime.timedelta(days=2),
+                      sunday + datetime.timedelta(days=1),
+                      datetime.date(year, 5, 1),
+                      datetime.date(year, 12, 24),
+                      datetime.date(year, 12, 25),
+                      datetime.date(year, 12, 26),
+                      datetime.date(year, 12, 31)])
+
+
+class HolidayCalendar:
+    """
+    Class representation of an exchange holiday calendar.
+
+    Holidays of the current year are fetched from the exchange calendar
+    once by `refresh` and persisted in a local file, so lookups need no
+    network and never wait for it. Until the calendar is fetched, the
+    persisted holidays of the year are used, else the regular holidays
+    (see `default_holidays`). The background thread (see `start`)
+    repeats a failed fetch after `retry` seconds. `version` is increased
+    whenever fetched holidays replace the regular ones, so tables derived
+    from the calendar can be rebuilt.
+    """
+
+    def __init__(self, file_name=PATH_HOLIDAYS, url=URL_CALENDAR,
+                 retry=3600.0):
+        self.file_name = file_name
+        self.url = url
+        self.retry = retry
+        self.lock = threading.Lock()
+        # holidays by year
+        self.years = {}
+        self.fetched = set()
+        self.version = 0
+        self.stopped = threading.Event()
+        self.thread = None
+        self._load()
+
+    def _load(self):
+        """Load persisted holidays."""
+        if not self.file_name or not os.path.isfile(self.file_name):
+            return None
+        try:
+            with open(self.file_name) as file:
+                stored = json.load(file)
+            for year, dates in stored.items():
+                self.years[int(year)] = frozenset(
+                    datetime.date.fromisoformat(date) for date in dates)
+                self.fetched.add(int(year))
+        except (OSError, ValueError) as e:
+            logger.error('Reading holidays failed: {}'.format(e))
+
+        return None
+
+    def _save(self):
+        """Persist fetched holidays."""
+        if not self.file_name:
+            return None
+        stored = {str(year): sorted(date.isoformat()
+                                    for date in self.years[year])
+                  for year in sorted(self.fetched)}
+        temp_name = '{}.{}.tmp'.format(self.file_name, os.getpid())
+        try:
+            with open(temp_name, 'w') as file:
+                json.dump(stored, file, indent=1)
+            os.replace(temp_name, self.file_name)
+        except OSError as e:
+            logger.error('Writing holidays failed: {}'.format(e))
+
+        return None
+
+    def fetch(self, year):
+        """
+        Fetch and parse holidays from the exchange calendar.
+
+        Parameters
+        ----------
+        year : int
+            Year of the calendar, which is shown by the page.
+
+        Raises
+        ------
+        ValueError
+            If the page layout is not recognized.
+
+        Returns
+        -------
+        holidays : frozenset
+            Dates when the exchange is closed.
+
+        """
+        # requests and BeautifulSoup are heavy and required only here
+        import requests
+        from bs4 import BeautifulSoup
+        from autotrader.toolkit import fake_headers
+
+        response = requests.get(self.url, headers=fake_headers(),
+                                timeout=(3.05, 15.0))
+        response.raise_for_status()
+        html = BeautifulSoup(response.content, 'html.parser')
+
+        div = html.find('div', attrs={
+            'class': 'accordion grid6Col embeddedTeaser'})
+        if div is None:
+            raise ValueError('Unknown layout of exchange calendar.')
+        holidays = set()
+        for h3 in div.find_all('h3'):
+            match = re.search(r'^(\d{1,2})\. ([^\W\d_]{3})', h3.text.strip())
+            if match and match.group(2) in MONTHS:
+                holidays.add(datetime.date(year,
+                                           MONTHS[match.group(2)],
+                                           int(match.group(1))))
+        if not holidays:
+            raise ValueError('No holidays in exchange calendar.')
+
+        return frozenset(holidays)
+
+    def refresh(self, year=None):
+        """
+        Fetch holidays of a year, unless they are fetched already.
+
+        The exchange calendar is requested here only, never by lookups.
+        Call it at startup, from the scheduler, or let the background
+        thread call it (see `start`).
+
+        Parameters
+        ----------
+        year : int, optional
+            Year. The default is None (current year).
+
+        Returns
+        -------
+        changed : bool
+            True if fetched holidays replaced the regular ones, False else.
+
+        """
+        if year is None:
+            year = datetime.date.today().year
+        if year in self.fetched:
+            return False
+
+        # one fetch at a time, lookups do not wait for it
+        with self.lock:
+            if year in self.fetched:
+                return False
+            try:
+                holidays = self.fetch(year)
+            except Exception as e:
+                logger.error('Fetching holidays of {} failed: {}. '
+                             'Regular holidays are used.'.format(year, e))
+                return False
+            self.years[year] = holidays
+            self.fetched.add(year)
+            self.version += 1
+            self._save()
+        logger.info('Got {} holidays of {}.'.format(len(holidays), year))
+
+        return True
+
+    def start(self):
+        """
+        Refresh the current year in a background thread.
+
+        The thread refreshes at once and then every `retry` seconds, so
+        a failed fetch is repeated and a new year is fetched.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.thread is not None and self.thread.is_alive():
+            return None
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self._run,
+                                       name='holidays',
+                                       daemon=True)
+        self.thread.start()
+
+        return None
+
+    def stop(self):
+        """
+        Stop the background thread.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+        return None
+
+    def _run(self):
+        """Refresh the current year until stopped."""
+        while True:
+            self.refresh()
+            if self.stopped.wait(self.retry):
+                break
+
+        return None
+
+    def holidays(self, year):
+        """
+        Get holidays of a year.
+
+        The lookup uses cached holidays only and never waits for the
+        network (see `refresh`).
+
+        Parameters
+        ----------
+        year : int
+            Year.
+
+        Returns
+        -------
+        holidays : frozenset
+            Dates when the exchange is closed.
+
+        """
+        holidays = self.years.get(year)
+        if holidays is None:
+            holidays = self.years.setdefault(year, default_holidays(year))
+
+        return holidays
+
+    def closed(self, date=None):
+        """
+        Check if the exchange is closed on a date.
+
+        Parameters
+        ----------
+        date : datetime.date, optional
+            Date. The default is None (today).
+
+        Returns
+        -------
+        closed : bool
+            True if closed, False else.
+
+        """
+        if date is None:
+            date = datetime.date.today()
+        elif isinstance(date, datetime.datetime):
+            date = date.date()
+
+        # weekend
+        if date.weekday() in [5, 6]:
+            return True
+
+        return date in self.holidays(date.year)
+
+
+# calendar of Frankfurt Stock Exchange, created with the first lookup
+calendar = None
+calendar_lock = threading.Lock()
+
+
+def fwb_calendar():
+    """
+    Get the shared calendar of Frankfurt Stock Exchange.
+
+    The calendar is refreshed by its background thread (see
+    `HolidayCalendar.start`).
+
+    Returns
+    -------
+    calendar : HolidayCalendar
+        Shared calendar.
+
+    """
+    global calendar
+    with calendar_lock:
+        if calendar is None:
+            file_name = PATH_HOLIDAYS
+            if not os.path.isdir(os.path.dirname(file_name)):
+                logger.error('No such directory for holiday file: {}'
+                             .format(file_name))
+                file_name = None
+            calendar = HolidayCalendar(file_name)
+            calendar.start()
+
+    return calendar
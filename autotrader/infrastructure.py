@@ -1,11 +1,18 @@
 # -*- coding: utf-8 -*-
 """The file contains the class definition of trading server/client."""
 
+import time
+import queue
+import threading
 from socket import error as SocketError
 from socket import errno as SocketErrno
 from multiprocessing.connection import Listener, Client
 from autotrader.setup_logger import logger
-from autotrader.autotrader import Autotrader
+from autotrader.metrics import REGISTRY, MetricsServer
+from autotrader.tracing import PATH_TRACES, Trace, Tracer
+from autotrader.dedup import DedupCache
+from brokers.deadline import Deadline, DeadlineExceeded
+from brokers.journal import PATH_JOURNAL, Journal
 
 
 class TradingServer:
@@ -17,7 +24,18 @@ class TradingServer:
                  password='',
                  broker_user='',
                  broker_password='',
-                 budget=None
+                 budget=None,
+                 workers=2,
+                 queue_size=16,
+                 max_connections=32,
+                 idle_timeout=300.0,
+                 trade_timeout=120.0,
+                 metrics_port=None,
+                 metrics_file=None,
+                 trace_file=PATH_TRACES,
+                 journal_file=PATH_JOURNAL,
+                 dedup_window=900.0,
+                 dedup_size=4096
                  ):
         self.host = host
         self.port = port
@@ -25,14 +43,42 @@ class TradingServer:
         self.broker_user = broker_user
         self.broker_password = broker_password
         self.budget = budget
+        self.workers = workers
+        self.idle_timeout = idle_timeout
+        self.trade_timeout = trade_timeout
+        self.metrics_port = metrics_port
+        self.metrics_file = metrics_file
+        self.metrics_server = None
+        self.tracer = Tracer(trace_file)
+        # trading data seen recently, repeats are not traded again
+        self.dedup = DedupCache(dedup_window, dedup_size) \
+            if dedup_window else None
+        # order journal shared by all workers
+        self.journal = None
+        if journal_file:
+            try:
+                self.journal = Journal(journal_file)
+            except OSError as e:
+                logger.error('Order journal is not available: {}'.format(e))
+        self.job_count = REGISTRY.counter(
+            'autotrader_jobs_total',
+            'Trading info by result of queueing and processing.',
+            ('result',))
+        self.trade_seconds = REGISTRY.histogram(
+            'autotrader_trade_duration_seconds',
+            'Wall-clock time of trades in seconds.')
         self.listener = None
-        self.connection = None
         self.running = False
-        self.message = ''
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.threads = []
+        self.handlers = []
+        self.slots = threading.BoundedSemaphore(max_connections)
         try:
             self.listener = Listener(
                 (self.host, self.port),
                 authkey=bytes(self.password, encoding='UTF-8'))
+            # port 0 binds any free port
+            self.port = self.listener.address[1]
             logger.info('Trading server is running on {}:{}'.format(
                 self.host, self.port))
         except SocketError as e:
@@ -50,6 +96,15 @@ class TradingServer:
         """
         Run trading server.
 
+        The accept loop only authenticates new connections and hands them
+        over to handler threads, so a client can keep its connection open
+        and send many messages. Trading info is put into a bounded job
+        queue, which is processed by a pool of trade workers. If the queue
+        is full, the trading info is rejected.
+
+        Metrics of the server and broker sessions are served on
+        `metrics_port` and/or written into `metrics_file` after each job.
+
         Returns
         -------
         None.
@@ -58,12 +113,28 @@ class TradingServer:
         if not self.listener:
             return None
 
+        # start scrape endpoint
+        if self.metrics_port is not None:
+            try:
+                self.metrics_server = MetricsServer(
+                    self.host, self.metrics_port).start()
+                logger.info('Metrics are served on {}:{}/metrics'.format(
+                    self.host, self.metrics_server.port))
+            except OSError as e:
+                logger.error('Metrics server failed: {}'.format(e))
+
+        # start trade workers
+        for i in range(self.workers):
+            thread = threading.Thread(target=self.work,
+                                      name='worker-{}'.format(i),
+                                      daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
         self.running = True
         while self.running:
             try:
-                self.connection = self.listener.accept()
-                logger.info('Connection accepted from {}.'
-                            .format(self.listener.last_accepted))
+                connection = self.listener.accept()
             except SocketError as e:
                 if e.errno == SocketErrno.ECONNRESET:
                     logger.error('Connection reset by peer.')
@@ -71,68 +142,417 @@ class TradingServer:
                     logger.error('Connection to {}:{} '
                                  'returned socket error {}.'
                                  .format(self.host, self.port, e.errno))
+                continue
             except Exception as e:
                 logger.error(e)
+                continue
+
+            # server is stopping
+            if not self.running:
+                connection.close()
+                break
+
+            logger.info('Connection accepted from {}.'
+                        .format(self.listener.last_accepted))
+
+            # check number of open connections
+            if not self.slots.acquire(blocking=False):
+                logger.error('Too many connections. Connection is rejected.')
+                self.reply(connection, 'rejected')
+                connection.close()
+                continue
+
+            handler = threading.Thread(target=self.serve,
+                                       args=(connection,),
+                                       daemon=True)
+            handler.start()
+            self.handlers = [thread for thread in self.handlers
+                             if thread.is_alive()] + [handler]
+
+        # close listener
+        self.listener.close()
+        for handler in self.handlers:
+            handler.join()
+        self.handlers = []
+
+        # let workers finish queued jobs
+        for thread in self.threads:
+            self.jobs.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        if self.metrics_server:
+            self.metrics_server.stop()
+            self.metrics_server = None
+        self.write_metrics()
+        if self.journal:
+            self.journal.close()
+        logger.info('Trading server has been stopped.')
+
+        return None
+
+    def serve(self, connection):
+        """
+        Receive messages of one connection until it is closed.
+
+        The connection is closed by the server, if there is no message
+        within `idle_timeout` seconds.
+
+        Parameters
+        ----------
+        connection : multiprocessing.connection.Connection
+            Accepted connection.
+
+        Returns
+        -------
+        None.
+
+        """
+        idle = 0.0
+        try:
+            while self.running:
+                # wait for a message, but notice stopping of the server
+                if not connection.poll(1.0):
+                    idle += 1.0
+                    if idle >= self.idle_timeout:
+                        logger.info('Connection is idle and will be closed.')
+                        break
+                    continue
+                idle = 0.0
+
+                try:
+                    message = connection.recv()
+                except EOFError:
+                    # closed by client
+                    break
 
-            while True:
-                self.message = self.connection.recv()
                 # check type of message
                 # message is str
-                if isinstance(self.message, str):
+                if isinstance(message, str):
                     # stop the server
-                    if self.message.lower() == 'shutdown':
-                        self.connection.close()
-                        self.running = False
-                        logger.info('Trading server has been stopped.')
+                    if message.lower() == 'shutdown':
+                        self.stop()
                         break
                     else:
-                        self.connection.close()
                         logger.warning('Got unknown text message.')
-                        break
 
                 # message is dict
-                elif isinstance(self.message, dict):
-                    self.connection.close()
-                    logger.info('Got trading info: {}.'.format(self.message))
-                    try:
-                        # broker Degiro
-                        if self.message['to'].lower() == 'degiro':
-                            at = Autotrader(self.broker_user,
-                                            self.broker_password,
-                                            self.budget,
-                                            self.message)
-                            at.trade()
-
-                        # unknown broker
-                        else:
-                            logger.warning('Unknown broker: {}.'.
-                                           format(self.message['to']))
-
-                    except KeyError:
-                        logger.error('Unexpected key in trading info.')
-                    break
+                elif isinstance(message, dict):
+                    logger.info('Got trading info: {}.'.format(message))
+                    self.reply(connection, self.submit(message))
 
                 # another type of message
                 else:
-                    self.connection.close()
                     logger.warning('Got unknown type of message.')
-                    break
 
-        # close listener
-        self.listener.close()
+        except Exception as e:
+            logger.error(e)
+        finally:
+            connection.close()
+            self.slots.release()
+
+        return None
+
+    def stop(self):
+        """
+        Stop trading server.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not self.running:
+            return None
+        self.running = False
+
+        # wake up the accept loop
+        try:
+            Client((self.host, self.port),
+                   authkey=bytes(self.password, encoding='UTF-8')).close()
+        except Exception as e:
+            logger.error(e)
+
+        return None
+
+    def submit(self, message):
+        """
+        Put trading info into the job queue.
+
+        The deadline and the trace of the trade start when the trading info
+        is received, so time spent in the queue counts against
+        `trade_timeout` and shows up in the timeline.
+
+        Trading data received within `dedup_window` seconds before are
+        dropped before any broker request. Trading info consisting of
+        duplicates only is acknowledged as accepted, so the sender does
+        not retry it. Dedup keys are queued with the job and forgotten,
+        unless an order of the job reaches the broker (see `work`).
+
+        Parameters
+        ----------
+        message : dict
+            Trading info.
+
+        Returns
+        -------
+        reply : str
+            `accepted` if the trading info was queued, `rejected` else.
+
+        """
+        try:
+            # broker Degiro
+            if message['to'].lower() != 'degiro':
+                logger.warning('Unknown broker: {}.'.format(message['to']))
+                self.job_count.inc(result='rejected')
+                return 'rejected'
+        except (KeyError, AttributeError):
+            logger.error('Unexpected key in trading info.')
+            self.job_count.inc(result='rejected')
+            return 'rejected'
+
+        message, keys = self._deduplicate(message)
+        if message is None:
+            logger.info('Trading info is a duplicate and is dropped.')
+            self.job_count.inc(result='duplicate')
+            return 'accepted'
+
+        trace = Trace()
+        try:
+            self.jobs.put_nowait((message, keys,
+                                  Deadline(self.trade_timeout), trace))
+        except queue.Full:
+            logger.error('Job queue is full. Trading info is rejected.')
+            self.job_count.inc(result='rejected')
+            # a retry of the trading info must not be a duplicate
+            self._forget(keys)
+            return 'rejected'
+
+        logger.info('Trading info is queued with trace ID {}.'
+                    .format(trace.id))
+        self.job_count.inc(result='accepted')
+        return 'accepted'
+
+    def _deduplicate(self, message):
+        """
+        Drop trading data seen within the dedup window.
+
+        Parameters
+        ----------
+        message : dict
+            Trading info.
+
+        Returns
+        -------
+        message : dict or None
+            Trading info with new trading data only, or None if all
+            trading data are duplicates.
+        keys : list
+            Dedup keys of the new trading data.
+
+        """
+        data = message.get('data')
+        if self.dedup is None or not isinstance(data, list) or not data:
+            return message, []
+
+        keys = []
+        new = []
+        for trading_data in data:
+            if not isinstance(trading_data, dict):
+                new.append(trading_data)
+                continue
+            key = DedupCache.key(message['to'],
+                                 trading_data.get('isin'),
+                                 trading_data.get('transaction'),
+                                 trading_data.get('price'),
+                                 trading_data.get('size'))
+            if self.dedup.check(key):
+                logger.info('Duplicate trading data {} are dropped.'
+                            .format(trading_data))
+                continue
+            keys.append(key)
+            new.append(trading_data)
+
+        if not new:
+            return None, []
+        if len(new) < len(data):
+            message = dict(message, data=new)
+
+        return message, keys
+
+    def _forget(self, keys):
+        """
+        Forget dedup keys of trading data, which did not reach the broker.
+
+        Parameters
+        ----------
+        keys : list
+            Dedup keys (see `_deduplicate`).
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.dedup is not None:
+            for key in keys:
+                self.dedup.forget(key)
+
+        return None
+
+    def write_metrics(self):
+        """
+        Write metrics into `metrics_file`, if it is set.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.metrics_file:
+            try:
+                REGISTRY.write(self.metrics_file)
+            except OSError as e:
+                logger.error('Writing metrics failed: {}'.format(e))
+
+        return None
+
+    def reply(self, connection, message):
+        """
+        Reply to the client, if it still listens.
+
+        Parameters
+        ----------
+        connection : multiprocessing.connection.Connection
+            Connection to the client.
+        message : str
+            Reply.
+
+        Returns
+        -------
+        None.
+
+        """
+        try:
+            connection.send(message)
+        except (OSError, EOFError):
+            pass
+
+        return None
+
+    def work(self):
+        """
+        Execute trades from the job queue.
+
+        Each worker keeps its own broker session between jobs. Jobs whose
+        deadline has passed while queued are dropped; requests of a running
+        trade do not wait beyond its deadline. The trace of each job is
+        written into the trace file when the job is finished.
+
+        Dedup keys of a job are kept only if an order of the job was sent
+        to the broker, so a resent trading info is not dropped as duplicate
+        after an expired, failed, or empty trade.
+
+        Returns
+        -------
+        None.
+
+        """
+        # broker layer is not required by clients
+        from autotrader.autotrader import Autotrader
+
+        trader = None
+        while True:
+            job = self.jobs.get()
+            if job is None:
+                self.jobs.task_done()
+                break
+
+            message, keys, deadline, trace = job
+            trace.attributes['source'] = message.get('from')
+            trace.attributes['queued'] = round(trace.elapsed() * 1000, 3)
+            if deadline.expired():
+                logger.error('Deadline of {} s exceeded in queue. '
+                             'Trading info with trace ID {} is dropped.'
+                             .format(deadline.seconds, trace.id))
+                trace.attributes['result'] = 'expired'
+                self.job_count.inc(result='expired')
+                self._forget(keys)
+                self.tracer.write(trace)
+                self.jobs.task_done()
+                continue
+
+            started = time.perf_counter()
+            result = 'failed'
+            sent = 0
+            try:
+                if not trader:
+                    with trace.span('init'):
+                        trader = Autotrader(self.broker_user,
+                                            self.broker_password,
+                                            self.budget,
+                                            journal=self.journal)
+                trader.deadline = deadline
+                trader.trace = trace
+                trader.load(message)
+                sent = trader.trade()
+                result = 'traded'
+            except DeadlineExceeded as e:
+                # session is still valid
+                logger.error('Trade {} failed: {}'.format(trace.id, e))
+            except (Exception, SystemExit) as e:
+                logger.error('Trade {} failed: {}'.format(trace.id, e))
+                # start with a new session
+                trader = None
+            finally:
+                if not sent:
+                    self._forget(keys)
+                if trader:
+                    trader.deadline = None
+                    trader.trace = None
+                self.trade_seconds.observe(time.perf_counter() - started)
+                self.job_count.inc(result=result)
+                trace.attributes['result'] = result
+                self.tracer.write(trace)
+                self.write_metrics()
+                self.jobs.task_done()
+
+        return None
 
 
 class TradingClient:
-    """Class representation of trading client."""
+    """
+    Class representation of trading client.
+
+    With `reconnect` set, the client keeps its connection open for many
+    messages and connects again transparently, if the connection was
+    closed by the server (e.g. after idle timeout) or lost.
+    """
 
     def __init__(self,
                  host='localhost',
                  port=6000,
-                 password=''
+                 password='',
+                 reconnect=False,
+                 attempts=3
                  ):
         self.host = host
         self.port = port
         self.password = password
+        self.reconnect = reconnect
+        self.attempts = attempts
+        self.connection = None
+        self.connect()
+
+    def connect(self):
+        """
+        Connect to the server.
+
+        Returns
+        -------
+        None.
+
+        """
         self.connection = None
         try:
             self.connection = Client(
@@ -149,6 +569,32 @@ class TradingClient:
         except Exception as e:
             logger.error(e)
 
+        return None
+
+    def alive(self):
+        """
+        Check if the connection is still open.
+
+        Replies which were not waited for are dropped.
+
+        Returns
+        -------
+        bool
+            True if the connection is open, False else.
+
+        """
+        if not self.connection:
+            return False
+        try:
+            while self.connection.poll(0):
+                self.connection.recv()
+        except (OSError, EOFError):
+            self.connection.close()
+            self.connection = None
+            return False
+
+        return True
+
     def send(self, message):
         """
         Send a message.
@@ -163,8 +609,25 @@ class TradingClient:
         None.
 
         """
-        if self.connection:
-            self.connection.send(message)
+        if not self.reconnect:
+            if self.connection:
+                self.connection.send(message)
+            return None
+
+        for attempt in range(self.attempts):
+            if not self.alive():
+                self.connect()
+            if not self.connection:
+                continue
+            try:
+                self.connection.send(message)
+                return None
+            except (OSError, EOFError) as e:
+                logger.warning('Connection lost: {}'.format(e))
+                self.connection = None
+
+        logger.error('Message could not be sent.')
+        return None
 
     def send_close(self, message):
         """
@@ -180,9 +643,42 @@ class TradingClient:
         None.
 
         """
-        if self.connection:
-            self.connection.send(message)
-            self.connection.close()
+        self.send(message)
+        self.close()
+
+    def submit(self, message, timeout=5.0):
+        """
+        Send trading info and wait for the reply of the server.
+
+        Parameters
+        ----------
+        message : dict
+            Trading info to be sent.
+        timeout : float, optional
+            Time to wait for the reply in seconds. The default is 5.0.
+
+        Returns
+        -------
+        reply : str or None
+            `accepted` or `rejected`, or None if there is no reply.
+
+        """
+        attempts = self.attempts if self.reconnect else 1
+        for attempt in range(attempts):
+            if self.reconnect and not self.alive():
+                self.connect()
+            if not self.connection:
+                continue
+            try:
+                self.connection.send(message)
+                if self.connection.poll(timeout):
+                    return self.connection.recv()
+                return None
+            except (OSError, EOFError) as e:
+                logger.warning('Connection lost: {}'.format(e))
+                self.connection = None
+
+        return None
 
     def close(self):
         """
@@ -199,6 +695,7 @@ class TradingClient:
         """
         if self.connection:
             self.connection.close()
+            self.connection = None
 
     def stop_server(self):
         """
@@ -213,6 +710,4 @@ class TradingClient:
         None.
 
         """
-        if self.connection:
-            self.connection.send('shutdown')
-            self.connection.close()
+        self.send_close('shutdown')
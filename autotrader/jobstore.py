@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of job store."""
+
+import sqlite3
+import datetime
+import threading
+from autotrader.setup_logger import logger
+
+PATH_JOBS = '/var/www/flask/autotrader/jobs.sqlite'
+
+# states of a slot of the time plan
+STATES = ('scheduled', 'running', 'done', 'error', 'missed')
+
+
+class JobStore:
+    """
+    Class representation of a persistent store of scheduled slots.
+
+    Each slot of a time plan is stored with its run time and state, so a
+    restarted scheduler keeps the run times and does not run a slot
+    again once it has been submitted. Slots older than `keep_days` are
+    removed by `prune`. If the file cannot be opened, slots are kept in
+    memory only.
+    """
+
+    def __init__(self, file_name=PATH_JOBS, keep_days=30):
+        self.file_name = file_name
+        self.keep_days = keep_days
+        self.lock = threading.Lock()
+        try:
+            self.connection = sqlite3.connect(file_name,
+                                              check_same_thread=False)
+        except sqlite3.OperationalError as e:
+            logger.error('Job store {}: {}'.format(file_name, e))
+            self.connection = sqlite3.connect(':memory:',
+                                              check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('PRAGMA journal_mode=WAL')
+            self.connection.execute(
+                'CREATE TABLE IF NOT EXISTS slots ('
+                'slot TEXT PRIMARY KEY, '
+                'run_date TEXT NOT NULL, '
+                'state TEXT NOT NULL, '
+                'updated REAL NOT NULL)')
+
+    def add(self, slot, run_date):
+        """
+        Add a slot, unless it is stored already.
+
+        Parameters
+        ----------
+        slot : datetime.datetime
+            Time point of the time plan.
+        run_date : datetime.datetime
+            Time to run the slot.
+
+        Returns
+        -------
+        state : str
+            State of the slot (see `STATES`).
+        run_date : datetime.datetime
+            Stored time to run the slot.
+        added : bool
+            True if the slot was not stored yet, False else.
+
+        """
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                'INSERT OR IGNORE INTO slots VALUES (?, ?, ?, '
+                "strftime('%s', 'now'))",
+                (slot.isoformat(), run_date.isoformat(), 'scheduled'))
+            state, run_date = self.connection.execute(
+                'SELECT state, run_date FROM slots WHERE slot = ?',
+                (slot.isoformat(),)).fetchone()
+
+        return (state, datetime.datetime.fromisoformat(run_date),
+                cursor.rowcount == 1)
+
+    def update(self, slot, state):
+        """
+        Update the state of a slot.
+
+        Parameters
+        ----------
+        slot : str
+            Time point of the time plan in ISO format (ID of the job).
+        state : str
+            State of the slot (see `STATES`).
+
+        Returns
+        -------
+        None.
+
+        """
+        # submission may be reported after the run finished
+        condition = " AND state = 'scheduled'" if state == 'running' else ''
+        try:
+            with self.lock, self.connection:
+                self.connection.execute(
+                    "UPDATE slots SET state = ?, "
+                    "updated = strftime('%s', 'now') WHERE slot = ?"
+                    + condition, (state, slot))
+        except sqlite3.Error as e:
+            logger.error('Updating slot {} failed: {}'.format(slot, e))
+
+        return None
+
+    def prune(self, today=None):
+        """
+        Remove slots older than `keep_days`.
+
+        Parameters
+        ----------
+        today : datetime.date, optional
+            Current date. The default is None (today).
+
+        Returns
+        -------
+        count : int
+            Number of removed slots.
+
+        """
+        if today is None:
+            today = datetime.date.today()
+        before = today - datetime.timedelta(days=self.keep_days)
+        with self.lock, self.connection:
+            cursor = self.connection.execute(
+                'DELETE FROM slots WHERE slot < ?', (before.isoformat(),))
+
+        return cursor.rowcount
+
+    def close(self):
+        """
+        Close the store.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            self.connection.close()
+
+        return None
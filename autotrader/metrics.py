@@ -0,0 +1,358 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definitions of metrics and their exporters."""
+
+import os
+import bisect
+import tempfile
+import threading
+
+# upper bounds of latency buckets in seconds
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+           30.0)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _labels(names, values):
+    """Format label names and values in Prometheus text format."""
+    if not names:
+        return ''
+    pairs = ['{}="{}"'.format(name, str(value).replace('\\', '\\\\')
+                              .replace('"', '\\"').replace('\n', '\\n'))
+             for name, value in zip(names, values)]
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """Class representation of a counter with labels."""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.lock = threading.Lock()
+        self.values = {}
+        # counter without labels is exported from the start
+        if not self.labelnames:
+            self.values[()] = 0
+
+    def inc(self, value=1, **labels):
+        """
+        Increase the counter.
+
+        Parameters
+        ----------
+        value : float, optional
+            Increment. The default is 1.
+        **labels : dict
+            Values of the labels.
+
+        Returns
+        -------
+        None.
+
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+        return None
+
+    def get(self, **labels):
+        """Get the value of the counter for the labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+        return self.values.get(key, 0)
+
+    def samples(self):
+        """Get samples as lines in Prometheus text format."""
+        with self.lock:
+            values = sorted(self.values.items())
+        return ['{}{} {}'.format(self.name, _labels(self.labelnames, key),
+                                 value)
+                for key, value in values]
+
+
+class Histogram:
+    """
+    Class representation of a histogram with labels.
+
+    Observations are counted in cumulative buckets given by their upper
+    bounds, as well as their count and sum.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self.lock = threading.Lock()
+        # counts per bucket (last one is +Inf) and sum by labels
+        self.values = {}
+
+    def observe(self, value, **labels):
+        """
+        Observe a value.
+
+        Parameters
+        ----------
+        value : float
+            Observed value.
+        **labels : dict
+            Values of the labels.
+
+        Returns
+        -------
+        None.
+
+        """
+        key = tuple(labels[name] for name in self.labelnames)
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            counts, total = self.values.get(
+                key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[index] += 1
+            self.values[key] = (counts, total + value)
+
+        return None
+
+    def count(self, **labels):
+        """Get the number of observations for the labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+        counts, _ = self.values.get(key, ([0], 0.0))
+        return sum(counts)
+
+    def sum(self, **labels):
+        """Get the sum of observations for the labels."""
+        key = tuple(labels[name] for name in self.labelnames)
+        return self.values.get(key, ([0], 0.0))[1]
+
+    def samples(self):
+        """Get samples as lines in Prometheus text format."""
+        with self.lock:
+            values = sorted((key, (list(counts), total))
+                            for key, (counts, total) in self.values.items())
+        lines = []
+        names = self.labelnames + ('le',)
+        for key, (counts, total) in values:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                cumulative += count
+                lines.append('{}_bucket{} {}'.format(
+                    self.name, _labels(names, key + (bound,)), cumulative))
+            lines.append('{}_count{} {}'.format(
+                self.name, _labels(self.labelnames, key), cumulative))
+            lines.append('{}_sum{} {}'.format(
+                self.name, _labels(self.labelnames, key), total))
+        return lines
+
+
+class Registry:
+    """
+    Class representation of a metrics registry.
+
+    Metrics are created once by name and shared by all users of the
+    registry, e.g. all broker sessions of the trading server.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.metrics = {}
+
+    def _metric(self, cls, name, documentation, labelnames, **kwargs):
+        """Get a metric by name, create it if it does not exist."""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation,
+                                                  labelnames, **kwargs)
+            elif not isinstance(metric, cls):
+                raise ValueError('Metric {} is a {}.'
+                                 .format(name, metric.kind))
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        """
+        Get a counter.
+
+        Parameters
+        ----------
+        name : str
+            Name of the metric.
+        documentation : str
+            Help text of the metric.
+        labelnames : tuple, optional
+            Names of the labels. The default is ().
+
+        Returns
+        -------
+        counter : Counter
+            Counter registered by the name.
+
+        """
+        return self._metric(Counter, name, documentation, labelnames)
+
+    def histogram(self, name, documentation, labelnames=(),
+                  buckets=BUCKETS):
+        """
+        Get a histogram.
+
+        Parameters
+        ----------
+        name : str
+            Name of the metric.
+        documentation : str
+            Help text of the metric.
+        labelnames : tuple, optional
+            Names of the labels. The default is ().
+        buckets : tuple, optional
+            Upper bounds of the buckets. The default is BUCKETS.
+
+        Returns
+        -------
+        histogram : Histogram
+            Histogram registered by the name.
+
+        """
+        return self._metric(Histogram, name, documentation, labelnames,
+                            buckets=buckets)
+
+    def render(self):
+        """
+        Render all metrics.
+
+        Returns
+        -------
+        text : str
+            Metrics in Prometheus text format.
+
+        """
+        with self.lock:
+            metrics = sorted(self.metrics.items())
+        lines = []
+        for name, metric in metrics:
+            lines.append('# HELP {} {}'.format(name, metric.documentation))
+            lines.append('# TYPE {} {}'.format(name, metric.kind))
+            lines.extend(metric.samples())
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, file_name):
+        """
+        Write all metrics into a text file.
+
+        The file is replaced atomically, so a collector never reads
+        a partial file. Each call writes its own temporary file, so
+        concurrent writers do not collide.
+
+        Parameters
+        ----------
+        file_name : str
+            Path of the text file.
+
+        Returns
+        -------
+        None.
+
+        """
+        handle, temp_name = tempfile.mkstemp(
+            dir=os.path.dirname(os.path.abspath(file_name)),
+            prefix=os.path.basename(file_name) + '.', suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'w') as file:
+                file.write(self.render())
+            # readable by a collector running as another user
+            os.chmod(temp_name, 0o644)
+            os.replace(temp_name, file_name)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+
+        return None
+
+
+# registry shared by the process
+REGISTRY = Registry()
+
+
+class MetricsServer:
+    """
+    Class representation of a local scrape endpoint.
+
+    The server renders the registry on `GET /metrics` in a background
+    thread.
+    """
+
+    def __init__(self, host='localhost', port=9100, registry=None):
+        self.host = host
+        self.port = port
+        self.registry = registry if registry is not None else REGISTRY
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns
+        -------
+        self : MetricsServer
+            The started server.
+
+        """
+        # HTTP server is not required until metrics are served
+        from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+        handler = type('MetricsHandler', (BaseHTTPRequestHandler,),
+                       {'registry': self.registry,
+                        'log_message': _log_message,
+                        'do_GET': _do_get})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='metrics',
+                                       daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        """
+        Stop serving.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+        return None
+
+
+def _log_message(handler, format, *args):
+    """Do not log requests."""
+    return None
+
+
+def _do_get(handler):
+    """Serve the metrics."""
+    if handler.path.split('?')[0] != '/metrics':
+        handler.send_error(404)
+        return None
+
+    content = handler.registry.render().encode('utf-8')
+    handler.send_response(200)
+    handler.send_header('Content-Type', CONTENT_TYPE)
+    handler.send_header('Content-Length', str(len(content)))
+    handler.end_headers()
+    handler.wfile.write(content)
+
+    return None
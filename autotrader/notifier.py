@@ -0,0 +1,292 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of email notifier."""
+
+import time
+import queue
+import atexit
+import smtplib
+import threading
+from email.mime.text import MIMEText
+from email.mime.multipart import MIMEMultipart
+from autotrader.setup_logger import logger
+
+SMTP_PORT = 587
+
+
+class Notifier:
+    """
+    Class representation of an asynchronous email notifier.
+
+    Messages are queued and sent by a background thread over one SMTP
+    connection, which is logged in once and reused until it is idle for
+    `idle` seconds. Messages to the same recipient arriving within
+    `delay` seconds are sent as one digest of at most `digest_size`
+    messages. A dropped connection is reopened once per batch.
+    """
+
+    def __init__(self, relay, user, password, port=SMTP_PORT, starttls=True,
+                 delay=2.0, digest_size=50, idle=60.0, timeout=30.0):
+        self.relay = relay
+        self.user = user
+        self.password = password
+        self.port = port
+        self.starttls = starttls
+        self.delay = delay
+        self.digest_size = digest_size
+        self.idle = idle
+        self.timeout = timeout
+        self.connection = None
+        self.messages = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.sent = threading.Condition(self.lock)
+        # numbers of queued and handled messages
+        self.queued = 0
+        self.handled = 0
+        self.thread = threading.Thread(target=self._run,
+                                       name='notifier',
+                                       daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def send(self, subject, body, recipient):
+        """
+        Queue a message without waiting for it to be sent.
+
+        Parameters
+        ----------
+        subject : str
+            Subject of email.
+        body : str
+            Body of email.
+        recipient : str
+            Email address of receiver.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            if not self.thread.is_alive():
+                logger.error('Notifier is closed, message "{}" is dropped.'
+                             .format(subject))
+                return None
+            self.queued += 1
+            self.messages.put((subject, body, recipient))
+
+        return None
+
+    def flush(self, timeout=None):
+        """
+        Wait until all queued messages are handled.
+
+        Parameters
+        ----------
+        timeout : float, optional
+            Maximum seconds to wait. The default is None (no limit).
+
+        Returns
+        -------
+        flushed : bool
+            True if all messages are handled, False on timeout.
+
+        """
+        with self.lock:
+            queued = self.queued
+            return self.sent.wait_for(
+                lambda: self.handled >= queued or not self.thread.is_alive(),
+                timeout)
+
+    def _run(self):
+        """Send batches of queued messages."""
+        while True:
+            try:
+                message = self.messages.get(
+                    timeout=self.idle if self.connection else None)
+            except queue.Empty:
+                self._disconnect()
+                continue
+            if message is None:
+                break
+
+            # gather messages of a burst
+            batch = [message]
+            stop = False
+            deadline = time.monotonic() + self.delay
+            while True:
+                try:
+                    message = self.messages.get(
+                        timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+                if message is None:
+                    stop = True
+                    break
+                batch.append(message)
+
+            for recipient, subject, body in digests(batch, self.digest_size):
+                self._deliver(subject, body, recipient)
+
+            with self.lock:
+                self.handled += len(batch)
+                self.sent.notify_all()
+            if stop:
+                break
+
+        self._disconnect()
+
+        return None
+
+    def _connect(self):
+        """Open and log in the SMTP connection."""
+        connection = smtplib.SMTP(self.relay, self.port,
+                                  timeout=self.timeout)
+        try:
+            if self.starttls:
+                connection.starttls()
+            if self.user:
+                connection.login(self.user, self.password)
+        except Exception:
+            connection.close()
+            raise
+        self.connection = connection
+
+        return None
+
+    def _disconnect(self):
+        """Close the SMTP connection, if any."""
+        if self.connection is None:
+            return None
+        try:
+            self.connection.quit()
+        except (smtplib.SMTPException, OSError):
+            self.connection.close()
+        self.connection = None
+
+        return None
+
+    def _deliver(self, subject, body, recipient):
+        """Send a message, reopening a dropped connection once."""
+        message = MIMEMultipart()
+        message['From'] = self.user
+        message['To'] = recipient
+        message['Subject'] = subject
+        message.attach(MIMEText(body, 'plain'))
+        text = message.as_string()
+
+        for attempt in range(2):
+            try:
+                if self.connection is None:
+                    self._connect()
+                self.connection.sendmail(self.user, recipient, text)
+                return True
+            except smtplib.SMTPServerDisconnected as e:
+                # stale connection, e.g. closed by the server
+                self.connection = None
+                error = e
+            except smtplib.SMTPException as e:
+                error = e
+                break
+            except OSError as e:
+                if self.connection is not None:
+                    self.connection.close()
+                    self.connection = None
+                error = e
+
+        logger.error('Sending email "{}" failed: {}'.format(subject, error))
+
+        return False
+
+    def close(self):
+        """
+        Send all queued messages and stop the background thread.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            alive = self.thread.is_alive()
+            if alive:
+                self.messages.put(None)
+        if alive:
+            self.thread.join()
+        with self.lock:
+            self.sent.notify_all()
+
+        return None
+
+
+def digests(batch, size):
+    """
+    Merge messages to the same recipient into digests.
+
+    Parameters
+    ----------
+    batch : list
+        Messages as tuples of subject, body, and recipient.
+    size : int
+        Maximum number of messages per digest.
+
+    Returns
+    -------
+    digests : list
+        Messages as tuples of recipient, subject, and body.
+
+    """
+    by_recipient = {}
+    for subject, body, recipient in batch:
+        by_recipient.setdefault(recipient, []).append((subject, body))
+
+    merged = []
+    for recipient, messages in by_recipient.items():
+        for i in range(0, len(messages), size):
+            chunk = messages[i:i + size]
+            if len(chunk) == 1:
+                merged.append((recipient,) + chunk[0])
+                continue
+            body = '\n\n'.join('{}\n{}\n{}'.format(title, '-' * len(title),
+                                                   text)
+                               for title, text in chunk)
+            merged.append((recipient,
+                           'Digest of {} notifications'.format(len(chunk)),
+                           body))
+
+    return merged
+
+
+# shared notifiers by relay and user
+notifiers = {}
+notifiers_lock = threading.Lock()
+
+
+def get_notifier(relay, user, password, port=SMTP_PORT):
+    """
+    Get the shared notifier of a relay and user.
+
+    Parameters
+    ----------
+    relay : str
+        SMTP-server address.
+    user : str
+        User name.
+    password : str
+        User password.
+    port : int, optional
+        SMTP-server port. The default is SMTP_PORT.
+
+    Returns
+    -------
+    notifier : Notifier
+        Shared notifier.
+
+    """
+    key = (relay, port, user)
+    with notifiers_lock:
+        notifier = notifiers.get(key)
+        if notifier is None or not notifier.thread.is_alive():
+            notifier = notifiers[key] = Notifier(relay, user, password,
+                                                 port=port)
+
+    return notifier
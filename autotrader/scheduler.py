@@ -3,30 +3,72 @@
 
 import os
 import sys
-import time
-from datetime import datetime
+import signal
+import datetime
+import threading
+from random import randrange
+from contextlib import contextmanager
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.events import (EVENT_JOB_SUBMITTED, EVENT_JOB_EXECUTED,
+                                EVENT_JOB_ERROR, EVENT_JOB_MISSED,
+                                EVENT_SCHEDULER_SHUTDOWN)
 from autotrader.setup_logger import logger
-from autotrader.toolkit import FWB_closed, time_plan_convertor, send_email
+from autotrader.toolkit import time_plan_convertor, send_email
+from autotrader.timeplan import TimePlan
+from autotrader.sessions import sessions
+from autotrader.jobstore import PATH_JOBS, JobStore
 from autotrader.infrastructure import TradingClient
 
 
+# events of a finished run of a job
+EVENTS_DONE = EVENT_JOB_EXECUTED | EVENT_JOB_ERROR | EVENT_JOB_MISSED
+
+# states of slots by event of the job
+STATES = {EVENT_JOB_SUBMITTED: 'running',
+          EVENT_JOB_EXECUTED: 'done',
+          EVENT_JOB_ERROR: 'error',
+          EVENT_JOB_MISSED: 'missed'}
+
+# time of day when the daemon computes the time plan of the day
+RECOMPUTE = datetime.time(0, 5)
+
+# seconds a slot may run late, e.g. after a restart
+MISFIRE_GRACE = 300
+
+
 class Scheduler:
-    """Scheduler class."""
+    """
+    Scheduler class.
 
-    def __init__(self, host, port, password):
+    The main thread sleeps until the last job of the time plan has run,
+    the job scheduler is shut down, or SIGINT or SIGTERM arrives, without
+    any polling.
+
+    In daemon mode (see `run_daemon`) the process is kept alive across
+    days and slots are persisted in a job store.
+    """
+
+    def __init__(self, host, port, password, exchange='XET'):
         self.verbose = True
         self.signedup = False
         self.host = host
         self.port = port
         self.password = password
+        self.exchange = exchange
         self.time_plan = []
         self.scheduler = None
+        self.done = threading.Event()
+        self.remaining = 0
+        self.lock = threading.Lock()
+        self.store = None
 
     def create_time_plan(self, time_plan):
         """
         Create a time plan.
 
+        Time points outside trading hours of the exchange are deferred to
+        the next session of the same day, or dropped if there is none.
+
         Parameters
         ----------
         time_plan : str
@@ -38,12 +80,13 @@ class Scheduler:
 
         """
         # check if today is not a bank holiday
-        if FWB_closed():
+        if not sessions.trading_day(self.exchange):
             logger.info('Today is a bank holiday')
         else:
             try:
                 # create time plan
-                self.time_plan = time_plan_convertor(time_plan)
+                self.time_plan = self._in_session(
+                    time_plan_convertor(time_plan))
             except Exception as e:
                 logger.warning(e)
 
@@ -54,6 +97,85 @@ class Scheduler:
             logger.warning('No time points in the time plan.')
             sys.exit(0)
 
+    def _in_session(self, time_points):
+        """
+        Move time points into trading hours of the exchange.
+
+        Parameters
+        ----------
+        time_points : list
+            Time points in local time.
+
+        Returns
+        -------
+        time_points : list
+            Sorted time points within trading hours.
+
+        """
+        in_session = set()
+        deferred = 0
+        dropped = 0
+        for time_point in time_points:
+            if sessions.is_open(self.exchange, time_point):
+                in_session.add(time_point)
+                continue
+            next_open = sessions.next_open(self.exchange, time_point)
+            if next_open is None:
+                dropped += 1
+                continue
+            # local time of the system as the time plan
+            next_open = next_open.astimezone().replace(tzinfo=None)
+            if next_open.date() == time_point.date():
+                in_session.add(next_open)
+                deferred += 1
+            else:
+                dropped += 1
+
+        if deferred or dropped:
+            logger.info('{} time points deferred and {} dropped outside '
+                        'trading hours of {}.'.format(deferred, dropped,
+                                                      self.exchange))
+
+        return sorted(in_session)
+
+    def _on_event(self, event):
+        """Count finished jobs and wake the main thread after the last."""
+        if event.code == EVENT_SCHEDULER_SHUTDOWN:
+            self.done.set()
+            return None
+        with self.lock:
+            self.remaining -= 1
+            if self.remaining <= 0:
+                self.done.set()
+
+        return None
+
+    def _on_daemon_event(self, event):
+        """Persist the state of a slot, or wake the main thread."""
+        if event.code == EVENT_SCHEDULER_SHUTDOWN:
+            self.done.set()
+        elif self.store is not None:
+            self.store.update(event.job_id, STATES[event.code])
+
+        return None
+
+    def _notify(self, task, time_points, kwargs):
+        """Send notification about the scheduled time points."""
+        subject = 'Scheduler is set for the task {}'.format(task.__name__)
+        body = ('The scheduler is successfully set for {} tasks.\n'
+                'The first task execution on {}.\n'
+                'The last task execution on {}.'.format(
+                    len(time_points),
+                    time_points[0],
+                    time_points[-1]))
+        send_email(subject, body,
+                   kwargs['recipient'],
+                   kwargs['relay'],
+                   kwargs['relay_user'],
+                   kwargs['relay_password'])
+
+        return None
+
     def set_scheduler(self, task, **kwargs):
         """
         Set scheduler for a task `task` according to the time plan.
@@ -85,6 +207,10 @@ class Scheduler:
             if self.scheduler:
                 self.scheduler.shutdown(wait=False)
             self.scheduler = BackgroundScheduler()
+            self.done.clear()
+            self.remaining = len(self.time_plan)
+            self.scheduler.add_listener(self._on_event,
+                                        EVENTS_DONE | EVENT_SCHEDULER_SHUTDOWN)
 
             for time_point in self.time_plan:
                 self.scheduler.add_job(task, 'date', run_date=time_point,
@@ -97,28 +223,17 @@ class Scheduler:
                     'Z' if os.name == 'nt' else 'C'))
 
             # send notification
-            subject = 'Scheduler is set for the task {}'.format(task.__name__)
-            body = ('The scheduler is successfully set for {} tasks.\n'
-                    'The first task execution on {}.\n'
-                    'The last task execution on {}.'.format(
-                        len(self.time_plan),
-                        self.time_plan[0],
-                        self.time_plan[-1]))
-            send_email(subject, body,
-                       kwargs['recipient'],
-                       kwargs['relay'],
-                       kwargs['relay_user'],
-                       kwargs['relay_password'])
+            self._notify(task, self.time_plan, kwargs)
 
         except Exception as e:
             logger.critical(e)
 
         if self.scheduler:
             try:
-                # wait till the last time of time plan
-                while datetime.now() <= self.time_plan[-1]:
-                    # wait 25 seconds
-                    time.sleep(25)
+                # wait till the last job of time plan has run
+                with terminating():
+                    if self.scheduler.running:
+                        self.done.wait()
             except (KeyboardInterrupt, SystemExit):
                 # shut down scheduler
                 self.scheduler.shutdown(wait=False)
@@ -132,3 +247,155 @@ class Scheduler:
             tc.stop_server()
 
         return None
+
+    def schedule_day(self, plan, day, task, kwargs, now=None):
+        """
+        Schedule slots of a day, which were not submitted yet.
+
+        Parameters
+        ----------
+        plan : autotrader.timeplan.TimePlan
+            Compiled time plan.
+        day : datetime.date
+            Day.
+        task : callable
+            Function which should be executed by scheduler.
+        kwargs : dict
+            Keyword arguments of the task.
+        now : datetime.datetime, optional
+            Current time. The default is None (now).
+
+        Returns
+        -------
+        run_dates : list
+            Run times of scheduled slots.
+
+        """
+        self.store.prune(day)
+        if now is None:
+            now = datetime.datetime.now()
+        late = now - datetime.timedelta(seconds=MISFIRE_GRACE)
+        run_dates = []
+        for slot in self._in_session(plan.day(day)):
+            # the run time is kept across restarts
+            state, run_date, added = self.store.add(
+                slot, slot + datetime.timedelta(seconds=randrange(60)))
+            if state != 'scheduled':
+                continue
+            # only slots scheduled before a restart may run late
+            if run_date < (now if added else late):
+                self.store.update(slot.isoformat(), 'missed')
+                continue
+            self.scheduler.add_job(task, 'date', run_date=run_date,
+                                   id=slot.isoformat(), kwargs=kwargs,
+                                   misfire_grace_time=MISFIRE_GRACE,
+                                   replace_existing=True)
+            run_dates.append(run_date)
+
+        if run_dates:
+            logger.info('{} slots are scheduled on {}.'.format(
+                len(run_dates), day))
+            try:
+                self._notify(task, run_dates, kwargs)
+            except Exception as e:
+                logger.error(e)
+        else:
+            logger.info('No slots on {}.'.format(day))
+
+        return run_dates
+
+    def run_daemon(self, time_plan, task, file_name=PATH_JOBS, **kwargs):
+        """
+        Run a task according to the time plan on every trading day.
+
+        The process is kept alive across days and the slots of each day
+        are computed at `RECOMPUTE` from the trading calendar, which is
+        refreshed before. Slots are persisted in a job store, so after
+        a restart submitted slots are not run again and pending slots keep
+        their run times.
+
+        Parameters
+        ----------
+        time_plan : str or list
+            Time plan (see `autotrader.timeplan.TimePlan`).
+        task : callable
+            Function which should be executed by scheduler.
+        file_name : str, optional
+            Path of the job store. The default is PATH_JOBS.
+        **kwargs : dict
+            Keyword arguments (see `set_scheduler`).
+
+        Returns
+        -------
+        None.
+
+        """
+        calendar = sessions.calendar(self.exchange)
+        plan = TimePlan(time_plan, calendar=calendar)
+        self.store = JobStore(file_name)
+        self.scheduler = BackgroundScheduler()
+        self.done.clear()
+        self.scheduler.add_listener(
+            self._on_daemon_event,
+            EVENT_JOB_SUBMITTED | EVENTS_DONE | EVENT_SCHEDULER_SHUTDOWN)
+        self.scheduler.start()
+
+        try:
+            with terminating():
+                while not self.done.is_set():
+                    today = datetime.date.today()
+                    try:
+                        # holidays of a new year before lookups of the day
+                        calendar.refresh(today.year)
+                        self.schedule_day(plan, today, task, kwargs)
+                    except Exception as e:
+                        logger.critical(e)
+                    # wait till the time plan of the next day is computed
+                    wake = datetime.datetime.combine(
+                        today + datetime.timedelta(days=1), RECOMPUTE)
+                    self.done.wait(max(0.0, (wake - datetime.datetime.now())
+                                       .total_seconds()))
+        except (KeyboardInterrupt, SystemExit):
+            pass
+
+        # shut down scheduler if running
+        if self.scheduler.running:
+            self.scheduler.shutdown(wait=True)
+        self.store.close()
+        self.store = None
+
+        # stop trading server
+        tc = TradingClient(self.host, self.port, self.password)
+        tc.stop_server()
+
+        return None
+
+
+@contextmanager
+def terminating():
+    """
+    Let SIGTERM end a wait of the main thread as SIGINT does.
+
+    Within the block SIGTERM raises SystemExit in the main thread. The
+    previous handler is restored afterwards. In other threads signal
+    handlers cannot be set, and the block runs unchanged.
+
+    Yields
+    ------
+    None.
+
+    """
+    if threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    previous = signal.signal(signal.SIGTERM, _terminate)
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
+
+
+def _terminate(signum, frame):
+    """Raise SystemExit in the main thread on SIGTERM."""
+    raise SystemExit(128 + signum)
@@ -0,0 +1,213 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of trading sessions."""
+
+import bisect
+import datetime
+import threading
+from zoneinfo import ZoneInfo
+from autotrader.setup_logger import logger
+
+TIMEZONE = 'Europe/Berlin'
+
+# trading phases by exchange as (phase, start, end) in local time
+PHASES = {'XET': (('opening auction', '08:50', '09:00'),
+                  ('continuous', '09:00', '17:30'),
+                  ('closing auction', '17:30', '17:35')),
+          'FRA': (('continuous', '08:00', '22:00'),)}
+
+
+class TradingSessions:
+    """
+    Class representation of trading sessions of exchanges.
+
+    The phases of all trading days of a year are precomputed as a table
+    of UNIX times sorted by start per exchange, so lookups are a binary
+    search. Holidays are taken from the calendar of an exchange, the
+    calendar of Frankfurt Stock Exchange by default (see
+    `autotrader.holidays.fwb_calendar`). A table is rebuilt once the
+    version of the calendar changes, i.e. when a refresh of the calendar
+    replaced the regular holidays. Lookups never fetch the calendar.
+    """
+
+    def __init__(self, phases=None, calendars=None, timezone=TIMEZONE):
+        self.phases = phases if phases is not None else PHASES
+        self.calendars = calendars if calendars is not None else {}
+        self.timezone = ZoneInfo(timezone)
+        self.lock = threading.Lock()
+        # (calendar version, starts, ends, phases) by exchange and year
+        self.tables = {}
+
+    def calendar(self, exchange):
+        """Get the holiday calendar of an exchange."""
+        calendar = self.calendars.get(exchange)
+        if calendar is None:
+            from autotrader.holidays import fwb_calendar
+            calendar = self.calendars[exchange] = fwb_calendar()
+        return calendar
+
+    def table(self, exchange, year):
+        """
+        Get the session table of an exchange.
+
+        Parameters
+        ----------
+        exchange : str
+            Exchange, e.g. 'XET'.
+        year : int
+            Year.
+
+        Raises
+        ------
+        KeyError
+            If the exchange is unknown.
+
+        Returns
+        -------
+        table : tuple
+            Lists of start times, end times, and phases.
+
+        """
+        periods = self.phases[exchange]
+        calendar = self.calendar(exchange)
+        # changed by a refresh of the calendar in the background
+        version = calendar.version
+        key = (exchange, year)
+        table = self.tables.get(key)
+        if table is not None and table[0] == version:
+            return table[1:]
+
+        phases = [(phase,
+                   datetime.time.fromisoformat(start),
+                   datetime.time.fromisoformat(end))
+                  for phase, start, end in periods]
+        starts, ends, names = [], [], []
+        date = datetime.date(year, 1, 1)
+        while date.year == year:
+            if not calendar.closed(date):
+                for phase, start, end in phases:
+                    starts.append(datetime.datetime.combine(
+                        date, start, self.timezone).timestamp())
+                    ends.append(datetime.datetime.combine(
+                        date, end, self.timezone).timestamp())
+                    names.append(phase)
+            date += datetime.timedelta(days=1)
+
+        with self.lock:
+            table = self.tables.get(key)
+            if table is None or table[0] < version:
+                table = self.tables[key] = (version, starts, ends, names)
+
+        return table[1:]
+
+    def _timestamp(self, when):
+        """Convert time to UNIX time and local year."""
+        if when is None:
+            when = datetime.datetime.now(self.timezone)
+        elif not isinstance(when, datetime.datetime):
+            when = datetime.datetime.fromtimestamp(when, self.timezone)
+        timestamp = when.timestamp()
+        return timestamp, datetime.datetime.fromtimestamp(
+            timestamp, self.timezone).year
+
+    def phase(self, exchange, when=None):
+        """
+        Get the trading phase of an exchange.
+
+        Parameters
+        ----------
+        exchange : str
+            Exchange, e.g. 'XET'.
+        when : datetime or float, optional
+            Time, naive datetimes are local time of the system.
+            The default is None (now).
+
+        Returns
+        -------
+        phase : str or None
+            Phase, e.g. 'continuous', or None if the exchange is closed.
+
+        """
+        timestamp, year = self._timestamp(when)
+        starts, ends, phases = self.table(exchange, year)
+        i = bisect.bisect_right(starts, timestamp) - 1
+        if i >= 0 and timestamp < ends[i]:
+            return phases[i]
+
+        return None
+
+    def is_open(self, exchange, when=None):
+        """
+        Check if orders of an exchange are executed.
+
+        Parameters
+        ----------
+        exchange : str
+            Exchange, e.g. 'XET'.
+        when : datetime or float, optional
+            Time. The default is None (now).
+
+        Returns
+        -------
+        open : bool
+            True within any phase including auctions, False else.
+
+        """
+        return self.phase(exchange, when) is not None
+
+    def next_open(self, exchange, when=None):
+        """
+        Get the next time when an exchange is open.
+
+        Parameters
+        ----------
+        exchange : str
+            Exchange, e.g. 'XET'.
+        when : datetime or float, optional
+            Time. The default is None (now).
+
+        Returns
+        -------
+        time : datetime or None
+            `when` if the exchange is open, else start of the next
+            session in the time zone of the exchange, or None if there is
+            no session within a year.
+
+        """
+        timestamp, year = self._timestamp(when)
+        if self.is_open(exchange, timestamp):
+            return datetime.datetime.fromtimestamp(timestamp, self.timezone)
+
+        for year in (year, year + 1):
+            starts = self.table(exchange, year)[0]
+            i = bisect.bisect_right(starts, timestamp)
+            if i < len(starts):
+                return datetime.datetime.fromtimestamp(starts[i],
+                                                       self.timezone)
+
+        logger.error('No session of {} within a year.'.format(exchange))
+        return None
+
+    def trading_day(self, exchange, date=None):
+        """
+        Check if an exchange has a session on a date.
+
+        Parameters
+        ----------
+        exchange : str
+            Exchange, e.g. 'XET'.
+        date : datetime.date, optional
+            Date. The default is None (today).
+
+        Returns
+        -------
+        trading_day : bool
+            True if the exchange is not closed all day, False else.
+
+        """
+        if date is None:
+            date = datetime.datetime.now(self.timezone).date()
+        return not self.calendar(exchange).closed(date)
+
+
+# sessions of all exchanges, tables are computed with the first lookup
+sessions = TradingSessions()
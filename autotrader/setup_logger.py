@@ -1,38 +1,235 @@
 # -*- coding: utf-8 -*-
 """The file contains logger."""
 
+import os
 import sys
+import copy
+import time
+import queue
+import atexit
 import logging
+import threading
+from logging.handlers import (QueueHandler, QueueListener,
+                              RotatingFileHandler, TimedRotatingFileHandler)
 
 PATH_LOGS = '/var/www/flask/autotrader/autotrader.log'
 
+# rotation of the log file
+MAX_BYTES = 10 * 1024 * 1024
+BACKUP_COUNT = 5
+
+
+class ModuleLevelFilter(logging.Filter):
+    """
+    Filter of records by level of their module.
+
+    Levels are given by module name, e.g. `{'degiro': 'WARNING'}`.
+    Records of other modules pass.
+    """
+
+    def __init__(self, levels=None):
+        super().__init__()
+        self.levels = {}
+        self.set_levels(levels if levels else {})
+
+    def set_levels(self, levels):
+        """
+        Set levels of modules.
+
+        Parameters
+        ----------
+        levels : dict
+            Level names or numbers by module name. Level None removes
+            the level of a module.
+
+        Returns
+        -------
+        None.
+
+        """
+        for module, level in levels.items():
+            if level is None:
+                self.levels.pop(module, None)
+            elif isinstance(level, int):
+                self.levels[module] = level
+            else:
+                number = logging.getLevelName(str(level).upper())
+                if not isinstance(number, int):
+                    raise ValueError('Unknown level: {}'.format(level))
+                self.levels[module] = number
+
+        return None
+
+    def filter(self, record):
+        """Pass records at or above the level of their module."""
+        level = self.levels.get(record.module)
+        return level is None or record.levelno >= level
+
+
+class RateLimitFilter(logging.Filter):
+    """
+    Filter of repeated identical records.
+
+    An identical warning or error of the same module is passed once per
+    `interval` seconds; the next passed record tells how many records
+    were suppressed meanwhile.
+    """
+
+    def __init__(self, interval=60.0, level=logging.WARNING, size=1024):
+        super().__init__()
+        self.interval = interval
+        self.level = level
+        self.size = size
+        self.lock = threading.Lock()
+        # last pass and number of suppressed records by key
+        self.seen = {}
+
+    def filter(self, record):
+        """Pass a record, unless it was passed within the interval."""
+        if record.levelno < self.level or not self.interval:
+            return True
+
+        message = record.getMessage()
+        key = (record.module, record.levelno, message)
+        now = time.monotonic()
+        with self.lock:
+            seen = self.seen.get(key)
+            if seen is not None and now - seen[0] < self.interval:
+                seen[1] += 1
+                return False
+            suppressed = seen[1] if seen is not None else 0
+            self.seen[key] = [now, 0]
+            if len(self.seen) > self.size:
+                self.seen = {key: value for key, value in self.seen.items()
+                             if now - value[0] < self.interval}
+
+        if suppressed:
+            record.msg = '{} (suppressed {} times)'.format(message,
+                                                           suppressed)
+            record.args = None
+        return True
+
+
+class LogQueueHandler(QueueHandler):
+    """
+    Handler putting records into the queue of the listener thread.
+
+    The message is merged with its arguments in the calling thread, so
+    later changes of mutable arguments do not show up in the log and
+    the arguments are not kept alive by the queue. The record is
+    otherwise formatted by the listener thread.
+    """
+
+    def prepare(self, record):
+        """Merge arguments and traceback into a copy of the record."""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(
+                record.exc_info)
+        record.exc_info = None
+
+        return record
+
 
 class Logger():
-    """Logger class."""
+    """
+    Logger class.
 
-    def __init__(self, file_name=None):
+    Records are put into a queue and written by a background listener
+    thread, so callers never wait for file or console I/O. The log file
+    is rotated by size, or by time if `when` is given (see
+    `logging.handlers.TimedRotatingFileHandler`).
+    """
+
+    def __init__(self,
+                 file_name=None,
+                 levels=None,
+                 interval=60.0,
+                 max_bytes=MAX_BYTES,
+                 when=None,
+                 backup_count=BACKUP_COUNT
+                 ):
         self.logger = logging.getLogger(__name__)
+        self.levels = ModuleLevelFilter(levels)
+        self.rate_limit = RateLimitFilter(interval)
+        self.listener = None
         formatter = logging.Formatter(
             ('%(asctime)s %(threadName)-8s %(name)-8s '
              '%(funcName)-8s %(levelname)-6s %(message)s'),
             datefmt='%d.%m.%Y %H:%M:%S')
-        handler = logging.StreamHandler(sys.stdout)
+        # console output must not mix with output of scripts
+        handler = logging.StreamHandler(sys.stderr)
         error = ''
         if isinstance(file_name, str):
-            try:
-                handler = logging.FileHandler(file_name)
-            except FileNotFoundError as e:
-                error = e
+            # the file is opened with the first record, not at import
+            if not os.path.isdir(os.path.dirname(os.path.abspath(file_name))):
+                error = 'No such directory for log file: {}'.format(
+                    file_name)
+            elif when:
+                handler = TimedRotatingFileHandler(file_name,
+                                                   when=when,
+                                                   backupCount=backup_count,
+                                                   delay=True)
+            else:
+                handler = RotatingFileHandler(file_name,
+                                              maxBytes=max_bytes,
+                                              backupCount=backup_count,
+                                              delay=True)
         elif file_name is not None:
             error = 'Parameter "{}" is not a string'.format(file_name)
 
         if not len(self.logger.handlers):
             handler.setFormatter(formatter)
-            self.logger.addHandler(handler)
+            records = queue.SimpleQueue()
+            queue_handler = LogQueueHandler(records)
+            queue_handler.addFilter(self.levels)
+            queue_handler.addFilter(self.rate_limit)
+            self.logger.addHandler(queue_handler)
             self.logger.setLevel(logging.DEBUG)
+            self.listener = QueueListener(records, handler)
+            self.listener.start()
+            # write queued records at exit
+            atexit.register(self.stop)
 
         if error:
             self.logger.error(error)
 
+    def set_levels(self, levels):
+        """
+        Set levels of modules.
+
+        Parameters
+        ----------
+        levels : dict
+            Level names or numbers by module name, e.g.
+            `{'degiro': 'WARNING'}`.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.levels.set_levels(levels)
+
+        return None
+
+    def stop(self):
+        """
+        Write queued records and stop the listener thread.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.listener is not None:
+            self.listener.stop()
+            self.listener = None
+
+        return None
+
 
-logger = Logger(PATH_LOGS).logger
+log = Logger(PATH_LOGS)
+logger = log.logger
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of local SMTP stand-in."""
+
+import socket
+import threading
+import socketserver
+
+
+class SMTPStandin:
+    """
+    Class representation of a local SMTP stand-in.
+
+    The stand-in accepts plain SMTP with AUTH PLAIN and LOGIN on a local
+    port and keeps received messages in memory as tuples of sender,
+    recipients, and data. Numbers of connections and logins are counted,
+    so reuse of connections can be checked, and open connections can be
+    dropped (see `drop_connections`). Use `Notifier` with
+    `starttls=False` against it.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0):
+        self.host = host
+        self.port = port
+        self.lock = threading.Lock()
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        # sockets of open connections
+        self.sockets = set()
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.server = socketserver.ThreadingTCPServer(
+            (self.host, self.port), SMTPStandinHandler)
+        self.server.daemon_threads = True
+        self.server.standin = self
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='smtp-standin',
+                                       daemon=True)
+        self.thread.start()
+
+        return None
+
+    def stop(self):
+        """
+        Stop serving.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.thread.join()
+            self.server = None
+
+        return None
+
+    def drop_connections(self):
+        """
+        Close all open connections without reply, as a restarted server.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            sockets = list(self.sockets)
+        for connection in sockets:
+            try:
+                connection.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        return None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+class SMTPStandinHandler(socketserver.StreamRequestHandler):
+    """Handler of one SMTP connection of the stand-in."""
+
+    def reply(self, line):
+        """Write a reply line."""
+        self.wfile.write(line.encode('ascii') + b'\r\n')
+        self.wfile.flush()
+
+    def handle(self):
+        """Serve SMTP commands until QUIT."""
+        standin = self.server.standin
+        with standin.lock:
+            standin.connections += 1
+            standin.sockets.add(self.connection)
+        try:
+            self.serve(standin)
+        finally:
+            with standin.lock:
+                standin.sockets.discard(self.connection)
+
+    def serve(self, standin):
+        """Serve SMTP commands of a connection."""
+        sender = None
+        recipients = []
+        self.reply('220 localhost SMTP stand-in')
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                break
+            command = line.decode('utf-8', errors='replace').strip()
+            verb = command[:4].upper()
+            if verb == 'EHLO':
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif verb == 'HELO':
+                self.reply('250 localhost')
+            elif verb == 'AUTH':
+                # credentials are not checked
+                if command.upper().startswith('AUTH LOGIN'):
+                    self.reply('334 VXNlcm5hbWU6')
+                    self.rfile.readline()
+                    self.reply('334 UGFzc3dvcmQ6')
+                    self.rfile.readline()
+                with standin.lock:
+                    standin.logins += 1
+                self.reply('235 Authentication successful')
+            elif verb == 'MAIL':
+                sender = command.split(':', 1)[1].strip().strip('<>')
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipients.append(
+                    command.split(':', 1)[1].strip().strip('<>'))
+                self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while True:
+                    line = self.rfile.readline()
+                    if not line or line == b'.\r\n':
+                        break
+                    data.append(line[1:] if line.startswith(b'..') else line)
+                with standin.lock:
+                    standin.messages.append(
+                        (sender, recipients, b''.join(data).decode('utf-8')))
+                self.reply('250 OK')
+            elif verb in ('RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                break
+            else:
+                self.reply('502 Command not implemented')
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of compiled time plan."""
+
+import re
+import bisect
+import datetime
+from random import randrange
+
+# line of a time plan: H1[-H2][:M][/F]
+LINE = re.compile(r'^(\d{1,2})(?:-(\d{1,2}))?(?::(\d{1,2}))?(?:/(\d+))?$')
+
+# consecutive closed days, after which no further time point is searched
+MAX_CLOSED_DAYS = 366
+
+
+class TimePlanError(ValueError):
+    """Error of a time plan line."""
+
+
+class TimePlan:
+    """
+    Class representation of a compiled time plan.
+
+    A time plan contains one or several lines in format H1[-H2][:M][/F],
+    where H1 - start hour of execution, H2 - stop hour of execution,
+    M - minutes of execution, F - step in minutes between executions
+    within an hour (0 - once per hour).
+
+    The plan is parsed once into sorted times of day. Time points are
+    generated lazily for any number of days, skipping days when the
+    `calendar` is closed (see `autotrader.holidays.HolidayCalendar`).
+    """
+
+    def __init__(self, time_plan, calendar=None):
+        if isinstance(time_plan, str):
+            time_plan = time_plan.replace('\n', '').split(',')
+        self.calendar = calendar
+
+        seconds = set()
+        for line in time_plan:
+            line = line.strip()
+            if line:
+                seconds.update(self.parse(line))
+        if not seconds:
+            raise TimePlanError('No time points in the time plan.')
+        # seconds since midnight, sorted
+        self.seconds = sorted(seconds)
+        self.times = [datetime.time(second // 3600, second % 3600 // 60)
+                      for second in self.seconds]
+
+    @staticmethod
+    def parse(line):
+        """
+        Parse a line of a time plan.
+
+        Parameters
+        ----------
+        line : str
+            Line in format H1[-H2][:M][/F].
+
+        Raises
+        ------
+        TimePlanError
+            If the line is not valid.
+
+        Returns
+        -------
+        seconds : set
+            Times of day in seconds since midnight.
+
+        """
+        match = LINE.match(line.replace(' ', ''))
+        if not match:
+            raise TimePlanError('Line "{}" of the time plan is not in '
+                                'format H1[-H2][:M][/F].'.format(line))
+        start, stop, minutes, step = match.groups()
+        start = int(start)
+        stop = int(stop) if stop is not None else start
+        minutes = int(minutes) if minutes is not None else 0
+        step = int(step) if step is not None else 0
+        if step == 0:
+            step = 60
+        if not 0 <= start <= stop <= 23:
+            raise TimePlanError('Hours of line "{}" of the time plan are '
+                                'not an ascending range within 0-23.'
+                                .format(line))
+        if minutes > 59:
+            raise TimePlanError('Minutes of line "{}" of the time plan are '
+                                'not within 0-59.'.format(line))
+
+        return {hour * 3600 + minute * 60
+                for hour in range(start, stop + 1)
+                for minute in range(minutes, 60, step)}
+
+    def day(self, date):
+        """
+        Get time points of a day.
+
+        Parameters
+        ----------
+        date : datetime.date
+            Day.
+
+        Returns
+        -------
+        time_points : list
+            Sorted time points, empty if the calendar is closed.
+
+        """
+        if self.calendar is not None and self.calendar.closed(date):
+            return []
+        return [datetime.datetime.combine(date, time) for time in self.times]
+
+    def next_after(self, when):
+        """
+        Get the first time point after a time.
+
+        Parameters
+        ----------
+        when : datetime.datetime
+            Time.
+
+        Returns
+        -------
+        time_point : datetime.datetime or None
+            First time point after `when`, or None if the calendar is
+            closed for a year.
+
+        """
+        return next(self.points(when), None)
+
+    def points(self, start=None, end=None):
+        """
+        Generate time points lazily.
+
+        Parameters
+        ----------
+        start : datetime.datetime, optional
+            Time points after `start` are generated.
+            The default is None (now).
+        end : datetime.datetime, optional
+            Time points before `end` are generated.
+            The default is None (no end).
+
+        Yields
+        ------
+        time_point : datetime.datetime
+            Time point, with time zone of `start`.
+
+        """
+        if start is None:
+            start = datetime.datetime.now()
+        date = start.date()
+        offset = (start.hour * 3600 + start.minute * 60 + start.second
+                  + start.microsecond / 1e6)
+        # first time of the first day
+        i = bisect.bisect_right(self.seconds, offset)
+
+        closed = 0
+        while closed < MAX_CLOSED_DAYS:
+            if self.calendar is not None and self.calendar.closed(date):
+                closed += 1
+            else:
+                closed = 0
+                for time in self.times[i:]:
+                    time_point = datetime.datetime.combine(date, time,
+                                                           start.tzinfo)
+                    if end is not None and time_point >= end:
+                        return
+                    yield time_point
+            i = 0
+            date += datetime.timedelta(days=1)
+            if end is not None and datetime.datetime.combine(
+                    date, datetime.time(), start.tzinfo) >= end:
+                return
+
+
+def jittered(time_points, seconds=60):
+    """
+    Shift time points by random seconds.
+
+    Parameters
+    ----------
+    time_points : iterable
+        Time points.
+    seconds : int, optional
+        Maximum shift (exclusive). The default is 60.
+
+    Returns
+    -------
+    time_points : list
+        Sorted unique time points.
+
+    """
+    return sorted({time_point + datetime.timedelta(seconds=randrange(seconds))
+                   for time_point in time_points})
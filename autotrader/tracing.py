@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definitions of trade traces."""
+
+import os
+import json
+import time
+import uuid
+import threading
+from contextlib import contextmanager, nullcontext
+from autotrader.setup_logger import logger
+
+PATH_TRACES = '/var/www/flask/autotrader/traces.jsonl'
+
+
+class Trace:
+    """
+    Class representation of a trade trace.
+
+    A trace starts when trading info is received and collects timed spans
+    of all steps of the trade. Spans may be recorded by several threads.
+    """
+
+    def __init__(self, trace_id=None):
+        self.id = trace_id if trace_id else uuid.uuid4().hex[:16]
+        self.timestamp = time.time()
+        self.started = time.monotonic()
+        self.attributes = {}
+        self.spans = []
+        self.lock = threading.Lock()
+
+    def __repr__(self):
+        return 'Trace({!r})'.format(self.id)
+
+    def elapsed(self):
+        """
+        Get time since the trading info was received.
+
+        Returns
+        -------
+        elapsed : float
+            Seconds since start of the trace.
+
+        """
+        return time.monotonic() - self.started
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """
+        Record a timed span.
+
+        Parameters
+        ----------
+        name : str
+            Name of the step.
+        **attributes : dict
+            Attributes of the span. The yielded dictionary can be updated
+            within the span.
+
+        Yields
+        ------
+        attributes : dict
+            Attributes of the span.
+
+        """
+        start = time.monotonic()
+        try:
+            yield attributes
+        except BaseException as e:
+            attributes['error'] = str(e) or type(e).__name__
+            raise
+        finally:
+            self._record(name, start, time.monotonic() - start, attributes)
+
+    def event(self, name, **attributes):
+        """
+        Record an event, i.e. a span without duration.
+
+        Parameters
+        ----------
+        name : str
+            Name of the event.
+        **attributes : dict
+            Attributes of the event.
+
+        Returns
+        -------
+        None.
+
+        """
+        self._record(name, time.monotonic(), 0.0, attributes)
+
+        return None
+
+    def _record(self, name, start, duration, attributes):
+        """Append a span."""
+        with self.lock:
+            self.spans.append((start, name, duration, attributes))
+
+    def to_dict(self):
+        """
+        Export the trace as timeline.
+
+        Returns
+        -------
+        trace : dict
+            Trace with keys `trace_id`, `timestamp`, `duration`,
+            `attributes`, and `spans` ordered by start. Times of spans are
+            in milliseconds since start of the trace.
+
+        """
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span[0])
+        return {'trace_id': self.id,
+                'timestamp': self.timestamp,
+                'duration': round(self.elapsed() * 1000, 3),
+                'attributes': self.attributes,
+                'spans': [dict(attributes,
+                               name=name,
+                               start=round((start - self.started) * 1000, 3),
+                               duration=round(duration * 1000, 3))
+                          for start, name, duration, attributes in spans]}
+
+
+def span(trace, name, **attributes):
+    """
+    Record a timed span, if there is a trace.
+
+    Parameters
+    ----------
+    trace : Trace or None
+        Trace of the trade.
+    name : str
+        Name of the step.
+    **attributes : dict
+        Attributes of the span.
+
+    Returns
+    -------
+    context : context manager
+        Span of the trace, or context doing nothing if there is no trace.
+
+    """
+    if trace is None:
+        return nullcontext(attributes)
+    return trace.span(name, **attributes)
+
+
+class Tracer:
+    """
+    Class representation of a trace writer.
+
+    Finished traces are appended to a JSONL file, one trace per line.
+    """
+
+    def __init__(self, file_name=PATH_TRACES):
+        self.file_name = None
+        self.lock = threading.Lock()
+        if isinstance(file_name, str):
+            if os.path.isdir(os.path.dirname(os.path.abspath(file_name))):
+                self.file_name = file_name
+            else:
+                logger.error('No such directory for trace file: {}'
+                             .format(file_name))
+
+    def write(self, trace):
+        """
+        Append a finished trace to the file.
+
+        Parameters
+        ----------
+        trace : Trace
+            Finished trace.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not self.file_name:
+            return None
+
+        line = json.dumps(trace.to_dict(), default=str) + '\n'
+        try:
+            with self.lock, open(self.file_name, 'a') as file:
+                file.write(line)
+        except OSError as e:
+            logger.error('Writing trace failed: {}'.format(e))
+
+        return None
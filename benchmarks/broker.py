@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of the broker layer against the local Degiro stand-in."""
+
+import os
+import sys
+import time
+import inspect
+import logging
+import argparse
+from contextlib import nullcontext
+
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+sys.path.insert(0, parentdir)
+
+from autotrader.setup_logger import logger  # noqa: E402
+from autotrader.metrics import Registry  # noqa: E402
+from brokers import cassette as cassettes  # noqa: E402
+from brokers.cache import ProductCache  # noqa: E402
+from brokers.degiro import Degiro  # noqa: E402
+from brokers.retry import RetryPolicy  # noqa: E402
+from brokers.standin import (DegiroStandin, default_products,  # noqa: E402
+                             default_positions)
+
+USER = 'user'
+PASSWORD = 'password'
+
+
+def percentile(values, percent):
+    """
+    Get a percentile by the nearest-rank method.
+
+    Parameters
+    ----------
+    values : list
+        Values.
+    percent : float
+        Percentile between 0 and 100.
+
+    Returns
+    -------
+    value : float
+        Percentile of the values.
+
+    """
+    values = sorted(values)
+    rank = max(1, -(-len(values) * percent // 100))
+    return values[int(rank) - 1]
+
+
+def measure(operation, repeat, setup=None):
+    """
+    Measure latency of an operation.
+
+    Parameters
+    ----------
+    operation : callable
+        Operation taking the number of the run, returns True on success.
+    repeat : int
+        Number of runs.
+    setup : callable, optional
+        Preparation taking the number of the run, which is not measured.
+        The default is None.
+
+    Returns
+    -------
+    latencies : list
+        Latencies in seconds.
+    wall : float
+        Seconds spent in the operation.
+    failed : int
+        Number of failed runs.
+
+    """
+    latencies = []
+    failed = 0
+    for i in range(repeat):
+        if setup:
+            setup(i)
+        start = time.perf_counter()
+        ok = operation(i)
+        latencies.append(time.perf_counter() - start)
+        if not ok:
+            failed += 1
+
+    return latencies, sum(latencies), failed
+
+
+def measure_batch(degiro, orders):
+    """
+    Measure latencies of orders placed in one batch.
+
+    Parameters
+    ----------
+    degiro : brokers.degiro.Degiro
+        Broker session.
+    orders : list
+        Orders (see `Degiro.place_orders`).
+
+    Returns
+    -------
+    latencies : list
+        Seconds from start of the batch to the result of each order.
+    wall : float
+        Seconds spent in the batch.
+    failed : int
+        Number of failed orders.
+
+    """
+    latencies = []
+    failed = 0
+    start = time.perf_counter()
+    for result in degiro.place_orders(orders):
+        latencies.append(time.perf_counter() - start)
+        if not result['order_id']:
+            failed += 1
+
+    return latencies, time.perf_counter() - start, failed
+
+
+def broker_benchmark(repeat=50, latency=0.0, error_rate=0.0, positions=100,
+                     batch=30, workers=8, cassette=None, speed=None):
+    """
+    Run the broker benchmark.
+
+    Requests are served by the local stand-in, or replayed from
+    a cassette (see `brokers.cassette`), so parsing can be profiled with
+    recorded production payloads. Replayed searches of products, which
+    were not recorded, get recorded search results of other products.
+
+    Parameters
+    ----------
+    repeat : int, optional
+        Number of runs per operation. The default is 50.
+    latency : float, optional
+        Latency of the stand-in in seconds. The default is 0.0.
+    error_rate : float, optional
+        Rate of injected 503 errors for order checks and searches.
+        The default is 0.0.
+    positions : int, optional
+        Number of positions in the portfolio. The default is 100.
+    batch : int, optional
+        Number of orders placed in one batch. The default is 30.
+    workers : int, optional
+        Number of concurrent requests. The default is 8.
+    cassette : str, optional
+        Path of a cassette to replay instead of the stand-in.
+        The default is None.
+    speed : float, optional
+        Speed-up of recorded latencies, None for no delay.
+        The default is None.
+
+    Returns
+    -------
+    results : dict
+        Latencies, wall time, and failures by operation.
+
+    """
+    products = default_products(max(100, repeat, positions, batch))
+    errors = {'checkOrder': (error_rate, 503), 'search': (error_rate, 503)}
+    standin = DegiroStandin(products=products,
+                            positions=default_positions(positions),
+                            latency=latency,
+                            errors=errors,
+                            seed=0)
+    results = {}
+    with standin if cassette is None else nullcontext():
+        degiro = Degiro(**(standin.urls() if cassette is None else {}),
+                        product_cache=ProductCache(':memory:'),
+                        workers=workers,
+                        retry_policy=RetryPolicy(base=0.01, cap=0.1),
+                        metrics=Registry())
+        if cassette is not None:
+            cassettes.replay(degiro, cassette, speed)
+        degiro.connect(USER, PASSWORD)
+
+        def login(i):
+            degiro.signedup = False
+            degiro.login(USER, PASSWORD)
+            return degiro.signedup
+
+        def search(i):
+            return degiro.search_product_id(products[i]['isin']) is not None
+
+        def search_cached(i):
+            return degiro.search_product_id(products[0]['isin']) is not None
+
+        # refresh succeeded, if the update token moved on
+        def portfolio_full(i):
+            degiro.last_updated['portfolio'] = 0
+            degiro.get_data('portfolio')
+            return degiro.last_updated['portfolio'] > 0
+
+        def change_position(i):
+            if cassette is None:
+                standin.set_position('194{}'.format(i % positions),
+                                     50.0 + i)
+
+        def portfolio_delta(i):
+            token = degiro.last_updated['portfolio']
+            degiro.get_data('portfolio')
+            return degiro.last_updated['portfolio'] > token \
+                or cassette is not None
+
+        def order(i):
+            result = degiro.place_order('BUY', '1940', 1, limit=10.0)
+            return bool(result and result['order_id'])
+
+        results['login'] = measure(login, repeat)
+        results['search'] = measure(search, repeat)
+        results['search (cached)'] = measure(search_cached, repeat)
+        results['portfolio (full)'] = measure(portfolio_full, repeat)
+        results['portfolio (delta)'] = measure(portfolio_delta, repeat,
+                                               setup=change_position)
+        results['order'] = measure(order, repeat)
+        results['order (batch)'] = measure_batch(
+            degiro, [{'buy_sell': 'BUY', 'product_id': '194{}'.format(i),
+                      'size': 1, 'limit': 10.0}
+                     for i in range(batch)])
+
+    return results
+
+
+def report(results):
+    """
+    Print throughput and latency percentiles of the operations.
+
+    Parameters
+    ----------
+    results : dict
+        Results of `broker_benchmark`.
+
+    Returns
+    -------
+    None.
+
+    """
+    print('{:<18} {:>6} {:>10} {:>9} {:>9} {:>7}'.format(
+        'operation', 'runs', 'ops/s', 'p50 ms', 'p99 ms', 'failed'))
+    for name, (latencies, wall, failed) in results.items():
+        print('{:<18} {:>6} {:>10.1f} {:>9.2f} {:>9.2f} {:>7}'.format(
+            name, len(latencies),
+            len(latencies) / wall if wall else float('inf'),
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 99) * 1000,
+            failed))
+
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--repeat', type=int, default=50,
+                        help='runs per operation')
+    parser.add_argument('--latency', type=float, default=0.0,
+                        help='latency of the stand-in in seconds')
+    parser.add_argument('--error-rate', type=float, default=0.0,
+                        help='rate of injected 503 errors')
+    parser.add_argument('--positions', type=int, default=100,
+                        help='positions in the portfolio')
+    parser.add_argument('--batch', type=int, default=30,
+                        help='orders placed in one batch')
+    parser.add_argument('--workers', type=int, default=8,
+                        help='concurrent requests')
+    parser.add_argument('--cassette',
+                        help='replay requests from a cassette')
+    parser.add_argument('--speed', type=float,
+                        help='speed-up of recorded latencies')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.CRITICAL)
+    report(broker_benchmark(args.repeat, args.latency, args.error_rate,
+                            args.positions, args.batch, args.workers,
+                            args.cassette, args.speed))
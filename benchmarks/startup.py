@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""Benchmark of startup time of the entry points."""
+
+import os
+import sys
+import json
+import inspect
+import statistics
+import subprocess
+
+currentdir = os.path.dirname(
+    os.path.abspath(inspect.getfile(inspect.currentframe())))
+parentdir = os.path.dirname(currentdir)
+
+# entry points: module to import and modules which must not be loaded
+ENTRY_POINTS = {'client': ('autotrader.infrastructure',
+                           ['pandas', 'bs4']),
+                'scheduler': ('autotrader.scheduler',
+                              ['pandas', 'bs4']),
+                'broker': ('brokers.degiro',
+                           ['pandas', 'bs4'])}
+
+# prefix of the result line, other output (e.g. log records) is skipped
+MARKER = 'STARTUP-PROBE '
+
+PROBE = ('import sys, time, json\n'
+         'sys.path.insert(0, {parentdir!r})\n'
+         'start = time.perf_counter()\n'
+         'import {module}\n'
+         'elapsed = time.perf_counter() - start\n'
+         'print({marker!r} + json.dumps({{"elapsed": elapsed, '
+         '"loaded": [m for m in {heavy!r} if m in sys.modules]}}), '
+         'flush=True)\n')
+
+
+def measure(module, heavy, repeat=5):
+    """
+    Measure import time of a module in fresh interpreters.
+
+    Parameters
+    ----------
+    module : str
+        Module to import.
+    heavy : list
+        Heavy modules, which are checked for being loaded.
+    repeat : int, optional
+        Number of interpreter starts. The default is 5.
+
+    Returns
+    -------
+    elapsed : list
+        Import times in seconds.
+    loaded : list
+        Heavy modules loaded by the import.
+
+    """
+    code = PROBE.format(parentdir=parentdir, module=module, heavy=heavy,
+                        marker=MARKER)
+    elapsed = []
+    loaded = set()
+    for _ in range(repeat):
+        output = subprocess.run([sys.executable, '-c', code],
+                                capture_output=True, text=True,
+                                check=True).stdout
+        line = [line for line in output.splitlines()
+                if line.startswith(MARKER)][-1]
+        result = json.loads(line[len(MARKER):])
+        elapsed.append(result['elapsed'])
+        loaded.update(result['loaded'])
+
+    return elapsed, sorted(loaded)
+
+
+def startup_benchmark(repeat=5):
+    """
+    Run the startup benchmark for all entry points.
+
+    Parameters
+    ----------
+    repeat : int, optional
+        Number of interpreter starts per entry point. The default is 5.
+
+    Returns
+    -------
+    ok : bool
+        True if no entry point loads a forbidden module, False else.
+
+    """
+    ok = True
+    print('{:<10} {:<28} {:>10} {:>10}  {}'.format(
+        'entry', 'module', 'median ms', 'max ms', 'heavy modules loaded'))
+    for name, (module, heavy) in ENTRY_POINTS.items():
+        elapsed, loaded = measure(module, heavy, repeat)
+        print('{:<10} {:<28} {:>10.1f} {:>10.1f}  {}'.format(
+            name, module,
+            statistics.median(elapsed) * 1000, max(elapsed) * 1000,
+            ', '.join(loaded) if loaded else '-'))
+        if loaded:
+            ok = False
+
+    return ok
+
+
+if __name__ == "__main__":
+    repeat = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    sys.exit(0 if startup_benchmark(repeat) else 1)
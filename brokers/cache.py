@@ -0,0 +1,166 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of product cache."""
+
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from autotrader.setup_logger import logger
+
+PATH_PRODUCT_CACHE = '/var/www/flask/autotrader/products.db'
+
+
+class ProductCache:
+    """
+    Persistent cache of product IDs.
+
+    Search results are stored in a SQLite file and kept in an in-memory
+    LRU in front of it. Negative results (nothing found) are cached with
+    a shorter TTL than found product IDs.
+    """
+
+    def __init__(self,
+                 file_name=PATH_PRODUCT_CACHE,
+                 ttl=30*24*3600,
+                 negative_ttl=3600,
+                 size=1024
+                 ):
+        self.file_name = file_name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self.size = size
+        self.memory = OrderedDict()
+        self.lock = threading.Lock()
+        try:
+            self.connection = sqlite3.connect(file_name,
+                                              check_same_thread=False)
+        except sqlite3.Error as e:
+            logger.error('Product cache {}: {}'.format(file_name, e))
+            self.connection = sqlite3.connect(':memory:',
+                                              check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS products '
+                                    '(key TEXT PRIMARY KEY, '
+                                    'found TEXT, '
+                                    'expires REAL)')
+        self.evict()
+
+    @staticmethod
+    def key(text, by, exchange=None):
+        """
+        Build a cache key.
+
+        Parameters
+        ----------
+        text : str
+            Search text.
+        by : str
+            Search by name, isin, or symbol.
+        exchange : str, optional
+            Exchange. The default is None.
+
+        Returns
+        -------
+        key : str
+            Cache key.
+
+        """
+        return '{}|{}|{}'.format(by, text.lower(), exchange or '')
+
+    def get(self, key):
+        """
+        Get cached product IDs.
+
+        Parameters
+        ----------
+        key : str
+            Cache key.
+
+        Returns
+        -------
+        hit : bool
+            True if a valid entry exists, False else.
+        found : dict or None
+            Product IDs by exchanges, or None for a negative result.
+
+        """
+        now = time.time()
+        with self.lock:
+            # look into memory
+            if key in self.memory:
+                found, expires = self.memory[key]
+                if expires > now:
+                    self.memory.move_to_end(key)
+                    return True, found
+                del self.memory[key]
+
+            # look into file
+            row = self.connection.execute(
+                'SELECT found, expires FROM products WHERE key = ?',
+                (key,)).fetchone()
+            if row is None or row[1] <= now:
+                return False, None
+
+            found = json.loads(row[0])
+            self._remember(key, found, row[1])
+            return True, found
+
+    def set(self, key, found):
+        """
+        Cache product IDs.
+
+        Parameters
+        ----------
+        key : str
+            Cache key.
+        found : dict or None
+            Product IDs by exchanges, or None for a negative result.
+
+        Returns
+        -------
+        None.
+
+        """
+        expires = time.time() + (self.ttl if found else self.negative_ttl)
+        with self.lock:
+            self._remember(key, found, expires)
+            try:
+                with self.connection:
+                    self.connection.execute(
+                        'INSERT OR REPLACE INTO products VALUES (?, ?, ?)',
+                        (key, json.dumps(found), expires))
+            except sqlite3.Error as e:
+                logger.error(e)
+
+        return None
+
+    def evict(self):
+        """
+        Remove expired entries.
+
+        Returns
+        -------
+        None.
+
+        """
+        now = time.time()
+        with self.lock:
+            for key in [key for key, (_, expires) in self.memory.items()
+                        if expires <= now]:
+                del self.memory[key]
+            try:
+                with self.connection:
+                    self.connection.execute(
+                        'DELETE FROM products WHERE expires <= ?', (now,))
+            except sqlite3.Error as e:
+                logger.error(e)
+
+        return None
+
+    def _remember(self, key, found, expires):
+        """Put an entry into memory and drop the least recently used one."""
+        self.memory[key] = (found, expires)
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.size:
+            self.memory.popitem(last=False)
@@ -0,0 +1,390 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definitions of HTTP cassettes."""
+
+import re
+import gzip
+import json
+import time
+import threading
+from datetime import timedelta
+from urllib.parse import urlparse
+import requests
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+from autotrader.setup_logger import logger
+
+# placeholders of scrubbed values
+PLACEHOLDERS = {'username': 'user',
+                'password': 'password',
+                'sessionId': 'SESSIONID',
+                'intAccount': 1000001,
+                'clientId': 1000002}
+
+# endpoint names by URL attributes of `Degiro`
+ENDPOINTS = {'url_login': 'login',
+             'url_config': 'config',
+             'url_client': 'client',
+             'url_data': 'update',
+             'url_order': 'order',
+             'url_orders': 'orders',
+             'url_place_order': 'checkOrder',
+             'url_search': 'search',
+             'url_logout': 'logout'}
+
+
+def endpoints(degiro):
+    """
+    Get endpoint names by URL path of a Degiro session.
+
+    Parameters
+    ----------
+    degiro : brokers.degiro.Degiro
+        Degiro session.
+
+    Returns
+    -------
+    paths : dict
+        Endpoint names by URL path.
+
+    """
+    return {urlparse(getattr(degiro, attribute)).path.split(';')[0]
+            .rstrip('/'): name
+            for attribute, name in ENDPOINTS.items()}
+
+
+def endpoint(paths, url):
+    """Get endpoint name of a URL by the longest matching path."""
+    path = urlparse(url).path.split(';')[0].rstrip('/')
+    match = max((prefix for prefix in paths
+                 if path == prefix or path.startswith(prefix + '/')),
+                key=len, default=None)
+    return paths[match] if match is not None else 'other'
+
+
+def _text(body):
+    """Convert request body to text."""
+    if body is None:
+        return None
+    if isinstance(body, bytes):
+        return body.decode('utf-8', errors='replace')
+    return str(body)
+
+
+class Scrubber:
+    """
+    Class representation of a scrubber of credentials and IDs.
+
+    Secret values are learnt from login, configuration, and client
+    responses, and replaced by placeholders in all later interactions.
+    """
+
+    def __init__(self):
+        self.secrets = {}
+        self.pattern = None
+
+    def learn(self, name, value):
+        """Learn a secret value and its placeholder."""
+        if value in (None, ''):
+            return None
+        value = str(value)
+        placeholder = str(PLACEHOLDERS[name])
+        if value != placeholder and value not in self.secrets:
+            self.secrets[value] = placeholder
+            # longest secrets first, as a whole word only
+            self.pattern = re.compile('|'.join(
+                r'(?<!\w){}(?!\w)'.format(re.escape(secret))
+                for secret in sorted(self.secrets, key=len, reverse=True)))
+        return None
+
+    def learn_interaction(self, name, body, content):
+        """Learn secrets of an interaction with the endpoint `name`."""
+        try:
+            if name == 'login':
+                payload = json.loads(body or '{}')
+                self.learn('username', payload.get('username'))
+                self.learn('password', payload.get('password'))
+                self.learn('sessionId', json.loads(content).get('sessionId'))
+            elif name == 'config':
+                data = json.loads(content).get('data', {})
+                self.learn('sessionId', data.get('sessionId'))
+                self.learn('clientId', data.get('clientId'))
+            elif name == 'client':
+                data = json.loads(content).get('data', {})
+                self.learn('intAccount', data.get('intAccount'))
+                self.learn('clientId', data.get('id'))
+        except (ValueError, AttributeError):
+            pass
+
+        return None
+
+    def scrub(self, text):
+        """
+        Replace secrets by placeholders.
+
+        Parameters
+        ----------
+        text : str or None
+            Text of URL or body.
+
+        Returns
+        -------
+        text : str or None
+            Scrubbed text.
+
+        """
+        if not text or self.pattern is None:
+            return text
+        return self.pattern.sub(lambda match: self.secrets[match.group(0)],
+                                text)
+
+
+class Cassette:
+    """
+    Class representation of an HTTP cassette.
+
+    A cassette is a gzipped JSONL file with one request/response pair per
+    line. Only the endpoint, method, path with query, request body,
+    status code, content type, response body, and latency are kept.
+    """
+
+    def __init__(self, file_name):
+        self.file_name = file_name
+        self.lock = threading.Lock()
+        self.file = None
+
+    def append(self, interaction):
+        """
+        Append an interaction.
+
+        Parameters
+        ----------
+        interaction : dict
+            Request/response pair.
+
+        Returns
+        -------
+        None.
+
+        """
+        line = json.dumps(interaction, separators=(',', ':')) + '\n'
+        with self.lock:
+            if self.file is None:
+                self.file = gzip.open(self.file_name, 'at', encoding='utf-8')
+            self.file.write(line)
+
+        return None
+
+    def load(self):
+        """
+        Load all interactions.
+
+        Returns
+        -------
+        interactions : list
+            Request/response pairs in recorded order.
+
+        """
+        with gzip.open(self.file_name, 'rt', encoding='utf-8') as file:
+            return [json.loads(line) for line in file if line.strip()]
+
+    def close(self):
+        """
+        Close the cassette file.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+
+        return None
+
+
+class RecordingAdapter(BaseAdapter):
+    """
+    Transport adapter recording interactions of another adapter.
+
+    Credentials, session IDs, and account IDs are scrubbed before
+    the interaction is written, and the client information is reduced
+    to the account ID.
+    """
+
+    def __init__(self, cassette, adapter, paths):
+        super().__init__()
+        self.cassette = cassette
+        self.adapter = adapter
+        self.paths = paths
+        self.scrubber = Scrubber()
+        self.lock = threading.Lock()
+
+    def send(self, request, **kwargs):
+        """Send a request by the wrapped adapter and record it."""
+        # latency includes reading the body
+        started = time.perf_counter()
+        response = self.adapter.send(request, **kwargs)
+        content = response.text
+        elapsed = time.perf_counter() - started
+        name = endpoint(self.paths, request.url)
+        body = _text(request.body)
+        if name == 'client':
+            try:
+                data = json.loads(content)['data']
+                content = json.dumps(
+                    {'data': {'intAccount': data['intAccount']}})
+            except (ValueError, KeyError, TypeError):
+                pass
+
+        parsed = urlparse(request.url)
+        url = parsed._replace(scheme='', netloc='').geturl()
+        with self.lock:
+            self.scrubber.learn_interaction(name, body, response.text)
+            scrub = self.scrubber.scrub
+            interaction = {'endpoint': name,
+                           'method': request.method,
+                           'url': scrub(url),
+                           'body': scrub(body),
+                           'status': response.status_code,
+                           'content_type': response.headers.get(
+                               'Content-Type'),
+                           'content': scrub(content),
+                           'elapsed': round(elapsed, 6)}
+        self.cassette.append(interaction)
+
+        return response
+
+    def close(self):
+        """Close the wrapped adapter and the cassette."""
+        self.adapter.close()
+        self.cassette.close()
+
+
+class ReplayAdapter(BaseAdapter):
+    """
+    Transport adapter replaying recorded interactions.
+
+    A request is answered by the recorded interaction with the same
+    method and URL, else with the same method and endpoint. Interactions
+    of the same key are served in recorded order and then again from
+    the start, so a short cassette can be replayed many times.
+
+    Responses are delayed by the recorded latency divided by `speed`;
+    with speed None they are returned immediately.
+    """
+
+    def __init__(self, cassette, paths, speed=None):
+        super().__init__()
+        self.paths = paths
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.by_url = {}
+        self.by_endpoint = {}
+        for interaction in cassette.load():
+            self.by_url.setdefault(
+                (interaction['method'], interaction['url']),
+                []).append(interaction)
+            self.by_endpoint.setdefault(
+                (interaction['method'], interaction['endpoint']),
+                []).append(interaction)
+        self.served = {}
+
+    def _next(self, key, interactions):
+        """Get the next interaction of a key."""
+        with self.lock:
+            served = self.served.get(key, 0)
+            self.served[key] = served + 1
+        return interactions[served % len(interactions)]
+
+    def send(self, request, **kwargs):
+        """Answer a request with a recorded response."""
+        parsed = urlparse(request.url)
+        url = parsed._replace(scheme='', netloc='').geturl()
+        key = (request.method, url)
+        if key in self.by_url:
+            interaction = self._next(key, self.by_url[key])
+        else:
+            key = (request.method, endpoint(self.paths, request.url))
+            if key not in self.by_endpoint:
+                raise requests.ConnectionError(
+                    'No recorded response for {} {}.'.format(
+                        request.method, url), request=request)
+            interaction = self._next(key, self.by_endpoint[key])
+
+        if self.speed:
+            time.sleep(interaction['elapsed'] / self.speed)
+
+        response = requests.Response()
+        response.status_code = interaction['status']
+        response._content = (interaction['content'] or '').encode('utf-8')
+        response.headers = CaseInsensitiveDict()
+        if interaction['content_type']:
+            response.headers['Content-Type'] = interaction['content_type']
+        response.encoding = 'utf-8'
+        response.url = request.url
+        response.request = request
+        response.elapsed = timedelta(seconds=interaction['elapsed'])
+        response.connection = self
+
+        return response
+
+    def close(self):
+        """Nothing to close."""
+        return None
+
+
+def record(degiro, file_name):
+    """
+    Record all requests of a Degiro session into a cassette.
+
+    Parameters
+    ----------
+    degiro : brokers.degiro.Degiro
+        Degiro session.
+    file_name : str
+        Path of the cassette, new interactions are appended.
+
+    Returns
+    -------
+    adapter : RecordingAdapter
+        Mounted adapter, close it to finish the cassette.
+
+    """
+    adapter = RecordingAdapter(Cassette(file_name),
+                               degiro.session.get_adapter('https://'),
+                               endpoints(degiro))
+    degiro.session.mount('https://', adapter)
+    degiro.session.mount('http://', adapter)
+    logger.info('Recording requests into {}.'.format(file_name))
+
+    return adapter
+
+
+def replay(degiro, file_name, speed=None):
+    """
+    Answer all requests of a Degiro session from a cassette.
+
+    Parameters
+    ----------
+    degiro : brokers.degiro.Degiro
+        Degiro session.
+    file_name : str
+        Path of the cassette.
+    speed : float, optional
+        Speed-up of recorded latencies, e.g. 1.0 for recorded timing.
+        The default is None (no delay).
+
+    Returns
+    -------
+    adapter : ReplayAdapter
+        Mounted adapter.
+
+    """
+    adapter = ReplayAdapter(Cassette(file_name), endpoints(degiro), speed)
+    degiro.session.mount('https://', adapter)
+    degiro.session.mount('http://', adapter)
+    logger.info('Replaying requests from {}.'.format(file_name))
+
+    return adapter
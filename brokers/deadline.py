@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""The file contains timeouts of broker endpoints and deadline class."""
+
+import time
+
+# connect and read timeouts in seconds by endpoint
+TIMEOUTS = {'login': (3.05, 10.0),
+            'logout': (3.05, 5.0),
+            'config': (3.05, 5.0),
+            'client': (3.05, 5.0),
+            'update': (3.05, 10.0),
+            'search': (3.05, 5.0),
+            'checkOrder': (3.05, 15.0),
+            'confirm': (3.05, 15.0),
+            'cancel': (3.05, 10.0),
+            'orders': (3.05, 15.0)}
+
+
+class DeadlineExceeded(Exception):
+    """Exception raised when work is started after its deadline."""
+
+
+class Deadline:
+    """
+    Class representation of a deadline.
+
+    A deadline is created once per trade and passed to every request,
+    so each request waits at most for the time left.
+    """
+
+    def __init__(self, seconds):
+        self.seconds = seconds
+        self.expires = time.monotonic() + seconds
+
+    def __repr__(self):
+        return 'Deadline({:.3f} s left)'.format(self.remaining())
+
+    def remaining(self):
+        """
+        Get time left.
+
+        Returns
+        -------
+        remaining : float
+            Seconds left till the deadline, 0.0 if it has passed.
+
+        """
+        return max(0.0, self.expires - time.monotonic())
+
+    def expired(self):
+        """
+        Check if the deadline has passed.
+
+        Returns
+        -------
+        bool
+            True if the deadline has passed, False else.
+
+        """
+        return time.monotonic() >= self.expires
+
+    def timeout(self, timeout=None):
+        """
+        Clip a request timeout to the time left.
+
+        Parameters
+        ----------
+        timeout : tuple, optional
+            Connect and read timeouts in seconds. The default is None.
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline has passed.
+
+        Returns
+        -------
+        timeout : tuple
+            Connect and read timeouts not exceeding the time left.
+
+        """
+        remaining = self.remaining()
+        if remaining <= 0.0:
+            raise DeadlineExceeded('Deadline of {} s exceeded.'
+                                   .format(self.seconds))
+        if timeout is None:
+            return remaining, remaining
+
+        return tuple(min(value, remaining) for value in timeout)
@@ -3,15 +3,29 @@
 import sys
 import json
 import time
+import uuid
 import requests
 import urllib3
-import pandas as pd
+import heapq
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from datetime import datetime, timedelta
 from brokers import urls
+from brokers.cache import ProductCache
+from brokers.portfolio import Portfolio
+from brokers.retry import RetryPolicy
+from brokers.deadline import TIMEOUTS, DeadlineExceeded
 from autotrader.setup_logger import logger
+from autotrader.metrics import REGISTRY
+from autotrader.tracing import span
 
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
+# dictionary with exchanges
+EXCHANGES = {'194': 'XET',
+             '195': 'FRA'}
+
 
 class Degiro:
     """Class representation of unofficial Degiro API."""
@@ -25,7 +39,13 @@ class Degiro:
                  url_orders=urls.URL_DEGIRO_ORDERS,
                  url_place_order=urls.URL_DEGIRO_PLACE_ORDER,
                  url_search=urls.URL_DEGIRO_SEARCH,
-                 url_logout=urls.URL_DEGIRO_LOGOUT
+                 url_logout=urls.URL_DEGIRO_LOGOUT,
+                 product_cache=None,
+                 workers=8,
+                 retry_policy=None,
+                 timeouts=None,
+                 metrics=None,
+                 journal=None
                  ):
         self.url_login = url_login
         self.url_config = url_config
@@ -36,12 +56,30 @@ class Degiro:
         self.url_place_order = url_place_order
         self.url_search = url_search
         self.url_logout = url_logout
+        self.product_cache = product_cache
+        self.workers = workers
+        self.retry_policy = retry_policy if retry_policy else RetryPolicy()
+        self.retry_stats = {'retries': 0, 'retry_wait': 0.0, 'exhausted': 0}
+        self.timeouts = dict(TIMEOUTS, **(timeouts if timeouts else {}))
+        # order journal (see `brokers.journal.Journal`)
+        self.journal = journal
+        self._register_metrics(metrics if metrics is not None else REGISTRY)
+        # deadline of the current trade (see `brokers.deadline.Deadline`)
+        self.deadline = None
+        # trace of the current trade (see `autotrader.tracing.Trace`)
+        self.trace = None
+        self.login_lock = threading.Lock()
         self.signedup = False
+        self.credentials = None
         self.session_id = None
         self.client = None
         self.configuration = None
         self.capital = None
+        self.portfolio = Portfolio()
         self.orders = None
+        # state tracked by the update endpoint
+        self.last_updated = {'cashFunds': 0, 'portfolio': 0}
+        self.cash_funds = {}
         self.headers = {'User-Agent':
                         ('Mozilla/5.0 (X11; Linux x86_64) '
                          'AppleWebKit/537.11 (KHTML, like Gecko) '
@@ -57,10 +95,19 @@ class Degiro:
             # create session
             logger.info('Creating new session...')
             self.session = requests.Session()
+            # allow concurrent requests of all workers
+            adapter = requests.adapters.HTTPAdapter(
+                pool_maxsize=max(self.workers, 10))
+            self.session.mount('https://', adapter)
+            self.session.mount('http://', adapter)
         except Exception as e:
             logger.critical(e)
             sys.exit(-1)
 
+        # open cache of product IDs
+        if self.product_cache is None:
+            self.product_cache = ProductCache()
+
     def login(self, user, password):
         """
         Log into Degiro.
@@ -88,9 +135,8 @@ class Degiro:
                    'isRedirectToMobile': False}
 
         try:
-            auth = self.session.post(self.url_login,
-                                     headers=self.headers,
-                                     json=payload)
+            auth = self._send('POST', self.url_login, endpoint='login',
+                              json=payload)
 
             # check if response ok
             if auth.status_code == requests.codes.ok:
@@ -98,6 +144,9 @@ class Degiro:
                 if auth_json['status'] == 0:
                     # signed in
                     self.session_id = auth_json['sessionId']
+                    self.credentials = (user, password)
+                    # update tokens are bound to the session
+                    self.last_updated = dict.fromkeys(self.last_updated, 0)
                     self.signedup = True
                     logger.info('Logged in as {}.'.format(user))
                     return None
@@ -107,7 +156,10 @@ class Degiro:
                 logger.error('Response status code: {}'
                              .format(auth.status_code))
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            self._check_deadline(e)
             logger.error(e)
 
         # notify about failed login and exit
@@ -145,9 +197,8 @@ class Degiro:
 
         try:
             url = self.url_logout + ';jsessionid=' + self.session_id
-            logout_response = self.session.get(url,
-                                               headers=self.headers,
-                                               params=payload)
+            logout_response = self._request('GET', url, endpoint='logout',
+                                            params=payload)
 
             # check if response ok
             if logout_response.status_code == requests.codes.ok:
@@ -163,6 +214,281 @@ class Degiro:
 
         return None
 
+    def connect(self, user, password):
+        """
+        Open a session and load the account state.
+
+        Login, configuration and client information are requested only if
+        there is no session yet. Cash funds and portfolio are reloaded on
+        every call, so the method should be called once per batch of orders.
+
+        Parameters
+        ----------
+        user : str
+            User name.
+        password : str
+            User password.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not self.signedup:
+            self.login(user, password)
+            self.get_config()
+            self.get_user_info()
+        self.get_data('cashFunds')
+        self.get_data('portfolio')
+
+        return None
+
+    def _register_metrics(self, registry):
+        """
+        Register metrics of the requests.
+
+        Parameters
+        ----------
+        registry : autotrader.metrics.Registry
+            Registry of the metrics.
+
+        Returns
+        -------
+        None.
+
+        """
+        self.metrics = registry
+        self.request_seconds = registry.histogram(
+            'degiro_request_duration_seconds',
+            'Latency of Degiro requests in seconds.',
+            ('endpoint',))
+        self.request_count = registry.counter(
+            'degiro_requests_total',
+            'Degiro requests by response status code.',
+            ('endpoint', 'status'))
+        self.request_bytes = registry.counter(
+            'degiro_request_bytes_total',
+            'Bytes of Degiro request and response bodies.',
+            ('endpoint', 'direction'))
+        self.retry_count = registry.counter(
+            'degiro_order_check_retries_total',
+            'Retries of order checks.')
+        self.retry_seconds = registry.counter(
+            'degiro_order_check_retry_wait_seconds_total',
+            'Time waited before retries of order checks in seconds.')
+        self.exhausted_count = registry.counter(
+            'degiro_order_check_exhausted_total',
+            'Order checks failed after all retries.')
+
+        return None
+
+    def _observe(self, endpoint, status, seconds, sent=0, received=0):
+        """
+        Record metrics of a request.
+
+        Parameters
+        ----------
+        endpoint : str or None
+            Endpoint name.
+        status : int or str
+            Response status code, or `error` if there was no response.
+        seconds : float
+            Latency in seconds.
+        sent : int, optional
+            Bytes of the request body. The default is 0.
+        received : int, optional
+            Bytes of the response body. The default is 0.
+
+        Returns
+        -------
+        None.
+
+        """
+        endpoint = endpoint if endpoint else 'other'
+        self.request_seconds.observe(seconds, endpoint=endpoint)
+        self.request_count.inc(endpoint=endpoint, status=str(status))
+        self.request_bytes.inc(sent, endpoint=endpoint, direction='sent')
+        self.request_bytes.inc(received, endpoint=endpoint,
+                               direction='received')
+
+        return None
+
+    def _retried(self, delay):
+        """Count a scheduled retry of an order check."""
+        self.retry_stats['retries'] += 1
+        self.retry_stats['retry_wait'] += delay
+        self.retry_count.inc()
+        self.retry_seconds.inc(delay)
+
+    def _exhausted(self):
+        """Count an order check failed after all retries."""
+        self.retry_stats['exhausted'] += 1
+        self.exhausted_count.inc()
+
+    def _journal(self, event, **fields):
+        """Record an order event in the journal, if there is one."""
+        if self.journal is None:
+            return None
+        if self.trace is not None:
+            fields['trace_id'] = self.trace.id
+
+        return self.journal.record(event, **fields)
+
+    def _commit_journal(self):
+        """
+        Wait until recorded order events are synced to disk.
+
+        The wait is limited by the deadline of the current trade.
+
+        Returns
+        -------
+        committed : bool
+            True if the events are durable or there is no journal,
+            False on timeout.
+
+        """
+        if self.journal is None:
+            return True
+        timeout = self.deadline.remaining() if self.deadline is not None \
+            else None
+        committed = self.journal.commit(timeout=timeout)
+        if not committed:
+            logger.error('Order journal was not synced in time.')
+
+        return committed
+
+    def _timeout(self, endpoint):
+        """
+        Get timeouts of an endpoint clipped to the deadline.
+
+        Parameters
+        ----------
+        endpoint : str
+            Endpoint name (key of `timeouts`).
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline of the current trade has passed.
+
+        Returns
+        -------
+        timeout : tuple or None
+            Connect and read timeouts in seconds.
+
+        """
+        timeout = self.timeouts.get(endpoint)
+        if self.deadline is not None:
+            timeout = self.deadline.timeout(timeout)
+
+        return timeout
+
+    def _check_deadline(self, error):
+        """
+        Fail on an error of a request, which ran out of the deadline.
+
+        Parameters
+        ----------
+        error : Exception
+            Error of the request, e.g. a read timeout.
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline of the current trade has passed.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.deadline is not None and self.deadline.expired():
+            raise DeadlineExceeded('Deadline exceeded: {}'.format(error)) \
+                from error
+
+        return None
+
+    def _request(self, method, url, endpoint=None, **kwargs):
+        """
+        Send a request within the session.
+
+        The request uses connect and read timeouts of the endpoint, which
+        are clipped to the deadline of the current trade. If the response
+        is unauthorized, the session is considered expired: the user is
+        logged in again and the request is repeated once with the new
+        session ID.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method.
+        url : str
+            URL of the request.
+        endpoint : str, optional
+            Endpoint name (key of `timeouts`). The default is None.
+        **kwargs : dict
+            Keyword arguments passed to `requests.Session.request`.
+
+        Raises
+        ------
+        DeadlineExceeded
+            If the deadline of the current trade has passed.
+
+        Returns
+        -------
+        response : requests.Response
+            Response to the request.
+
+        """
+        old_session_id = self.session_id
+        response = self._send(method, url, endpoint, **kwargs)
+
+        # log in again, if session expired
+        if response.status_code == requests.codes.unauthorized \
+                and self.credentials:
+            with self.login_lock:
+                # other thread may have logged in already
+                if self.session_id == old_session_id:
+                    logger.warning('Session expired. Logging in again...')
+                    self.signedup = False
+                    self.login(*self.credentials)
+
+            # replace session ID in URL and parameters
+            url = url.replace(old_session_id, self.session_id)
+            for key in ['params', 'data', 'cookies']:
+                if isinstance(kwargs.get(key), dict):
+                    kwargs[key] = {
+                        k: self.session_id if v == old_session_id else v
+                        for k, v in kwargs[key].items()}
+
+            response = self._send(method, url, endpoint, **kwargs)
+
+        return response
+
+    def _send(self, method, url, endpoint=None, **kwargs):
+        """Send a request and record its metrics and span."""
+        timeout = self._timeout(endpoint)
+        with span(self.trace, endpoint if endpoint else 'other') as attributes:
+            started = time.perf_counter()
+            try:
+                response = self.session.request(method, url,
+                                                headers=self.headers,
+                                                timeout=timeout,
+                                                **kwargs)
+            except requests.RequestException:
+                self._observe(endpoint, 'error',
+                              time.perf_counter() - started)
+                raise
+
+            attributes['status'] = response.status_code
+            body = response.request.body
+            self._observe(endpoint, response.status_code,
+                          time.perf_counter() - started,
+                          sent=len(body) if body else 0,
+                          received=len(response.content))
+
+        return response
+
     def get_config(self):
         """
         Get configuration.
@@ -185,9 +511,8 @@ class Degiro:
         cookie = {'JSESSIONID': self.session_id}
 
         try:
-            config_response = self.session.get(self.url_config,
-                                               headers=self.headers,
-                                               cookies=cookie)
+            config_response = self._request('GET', self.url_config,
+                                            endpoint='config', cookies=cookie)
 
             # check if response ok
             if config_response.status_code == requests.codes.ok:
@@ -202,7 +527,10 @@ class Degiro:
                 logger.error('Response status code: {}'
                              .format(config_response.status_code))
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            self._check_deadline(e)
             logger.error(e)
 
         return None
@@ -229,9 +557,8 @@ class Degiro:
         payload = {'sessionId': self.session_id}
 
         try:
-            client_response = self.session.get(self.url_client,
-                                               headers=self.headers,
-                                               params=payload)
+            client_response = self._request('GET', self.url_client,
+                                            endpoint='client', params=payload)
 
             # check if response ok
             if client_response.status_code == requests.codes.ok:
@@ -246,7 +573,10 @@ class Degiro:
                 logger.error('Response status code: {}'
                              .format(client_response.status_code))
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            self._check_deadline(e)
             logger.error(e)
 
         return None
@@ -255,6 +585,10 @@ class Degiro:
         """
         Get amount of cash or actual portfolio.
 
+        The first call loads a full snapshot. Next calls send the last
+        update token of the data type and get only the changes since
+        then. The full snapshot is loaded again, if the token is rejected.
+
         Parameters
         ----------
         data_type : str
@@ -286,62 +620,37 @@ class Degiro:
             logger.warning('Wrong data_type.')
             return None
 
-        payload = {data_type: 0}
+        token = self.last_updated[data_type]
+        payload = {data_type: token}
 
         try:
             url = self.url_data + str(self.client['intAccount']) \
                 + ';jsessionid=' + self.session_id
-            data_response = self.session.get(url,
-                                             headers=self.headers,
-                                             params=payload)
+            data_response = self._request('GET', url, endpoint='update',
+                                          params=payload)
 
             # check if response ok
             if data_response.status_code in [requests.codes.ok,
                                              requests.codes.created]:
                 data_response_json = json.loads(data_response.content)
+                self._parse_data(data_type, data_response_json, token)
 
-                # get capital
-                if data_type == 'cashFunds':
-                    capital = {item['value'][1]['value']:
-                               item['value'][2]['value']
-                               for item in
-                               data_response_json['cashFunds']['value']}
-                    self.capital = capital
-                    logger.info('Got capital of {} EUR.'
-                                .format(capital['EUR']))
-
-                # get portfolio
-                elif data_type == 'portfolio':
-                    positions = []
-                    names = ['positionType',
-                             'breakEvenPrice',
-                             'price',
-                             'size',
-                             'value']
-                    for item in data_response_json['portfolio']['value']:
-                        position = {}
-                        position['id'] = item['id']
-                        for i in item['value']:
-                            for name in names:
-                                if i['name'] == name:
-                                    position[name] = i['value']
-                        if position:
-                            if position[
-                                    'positionType'] == 'PRODUCT' and position[
-                                        'size'] > 0.0:
-                                positions.append(position)
-
-                    if positions:
-                        self.portfolio = pd.DataFrame(positions)
-                        logger.info('Got portfolio of {} positions.'
-                                    .format(self.portfolio.shape[0]))
+            # update token is not valid anymore, load full snapshot
+            elif token:
+                logger.warning('Update token of {} was rejected. '
+                               'Loading full snapshot...'.format(data_type))
+                self.last_updated[data_type] = 0
+                return self.get_data(data_type)
 
             # response is not ok
             else:
                 logger.error('Response status code: {}'
                              .format(data_response.status_code))
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            self._check_deadline(e)
             logger.error(e)
 
         return None
@@ -382,37 +691,11 @@ class Degiro:
             logger.warning('Account ID does not exist.')
             return None
 
-        # check to_date
-        if to_date:
-            try:
-                to_date = datetime.strptime(to_date, '%d.%m.%Y')
-            except ValueError:
-                logger.warning('Date in format "dd.mm.YYYY" is required.')
-                return None
-        else:
-            # set as today
-            to_date = datetime.today()
-
-        # check from_date
-        if from_date:
-            try:
-                from_date = datetime.strptime(from_date, '%d.%m.%Y')
-            except ValueError:
-                logger.warning('Date in format "dd.mm.YYYY" is required.')
-                return None
-        else:
-            # set as today - 90 days
-            from_date = datetime.today() - timedelta(days=90)
-
-        # check range between from_date and to_date:
-        if (to_date - from_date).days > 90:
-            logger.warning('The maximal time interval is 90 days.')
-            return None
-
-        # check if from_dateis less than to_date:
-        if to_date < from_date:
-            logger.warning('Negative time interval is not allowed.')
+        # check time period
+        period = self._order_period(from_date, to_date)
+        if not period:
             return None
+        from_date, to_date = period
 
         payload = {'fromDate': from_date.strftime('%d/%m/%Y'),
                    'toDate': to_date.strftime('%d/%m/%Y'),
@@ -420,29 +703,23 @@ class Degiro:
                    'sessionId': self.session_id}
 
         try:
-            orders_response = self.session.get(self.url_orders,
-                                               headers=self.headers,
-                                               params=payload)
+            orders_response = self._request('GET', self.url_orders,
+                                            endpoint='orders', params=payload)
 
             # check if response ok
             if orders_response.status_code == requests.codes.ok:
                 orders_response_json = json.loads(orders_response.content)
-
-                # get orders
-                orders = pd.DataFrame(orders_response_json['data'])
-                if active:
-                    orders = orders.loc[orders['isActive'], :]
-                self.orders = orders
-                logger.info('Got {} order{}.'.format(
-                    self.orders.shape[0],
-                    '' if self.orders.shape[0] == 1 else 's'))
+                self._parse_orders(orders_response_json, active)
 
             # response is not ok
             else:
                 logger.error('Response status code: {}'
                              .format(orders_response.status_code))
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            self._check_deadline(e)
             logger.error(e)
 
         return None
@@ -472,7 +749,56 @@ class Degiro:
 
         Returns
         -------
-        None.
+        result : dict or None
+            Result of the order (see `place_orders`), or None if
+            the order was not sent.
+
+        """
+        order = {'buy_sell': buy_sell,
+                 'product_id': product_id,
+                 'size': size,
+                 'limit': limit,
+                 'stop_loss': stop_loss,
+                 'order_type': order_type,
+                 'validity': validity}
+        for result in self.place_orders([order]):
+            if result['error']:
+                logger.error(result['error'])
+            return result if result['sent'] else None
+
+        return None
+
+    def place_orders(self, orders):
+        """
+        Place several orders concurrently.
+
+        Every order is checked as soon as a worker is free and confirmed
+        as soon as its check is accepted, so checks and confirmations of
+        different orders overlap. Results are yielded in the order they
+        complete. The intent, check, and confirmation of every order are
+        recorded in the journal, if there is one. Intents of all orders
+        are synced to disk with one fsync before the first order is sent,
+        the remaining events when the batch ends.
+
+        Checks failed with a transient error are retried according to
+        `retry_policy`. A waiting check does not occupy a worker, so it
+        does not delay other orders.
+
+        Parameters
+        ----------
+        orders : list
+            Orders as dictionaries with keyword arguments of `place_order`.
+
+        Yields
+        ------
+        result : dict
+            Result with keys `order` (the given order), `intent_id`
+            (client-side ID of the order in the journal), `sent` (False if
+            the order was not sent because of wrong parameters),
+            `confirmation_id`, `order_id`, `fees` (total fee by
+            currencies), `attempts` (number of checks), `retry_wait`
+            (seconds waited for retries), and `error` (None if the order
+            was placed).
 
         """
         # check if signed up
@@ -490,133 +816,246 @@ class Degiro:
             logger.warning('Account ID does not exist.')
             return None
 
-        # check if buy_sell is correct
-        if buy_sell not in ['BUY', 'SELL']:
-            logger.warning('Only values "BUY" or "SELL" are allowed.')
+        orders = list(orders)
+        if not orders:
             return None
 
-        # check if order size is correct
-        if size == 0:
-            logger.warning('Order size must be not equal zero.')
-            return None
+        with ThreadPoolExecutor(max_workers=min(self.workers,
+                                                len(orders))) as executor:
+            pending = {}
+            # heap of checks waiting for retry
+            retries = []
+            sequence = itertools.count()
+            batch = []
+            for order in orders:
+                result = {'order': order,
+                          'intent_id': uuid.uuid4().hex,
+                          'sent': False,
+                          'confirmation_id': None,
+                          'order_id': None,
+                          'fees': None,
+                          'attempts': 0,
+                          'retry_wait': 0.0,
+                          'error': None}
+                payload = self._order_payload(**order)
+                self._journal('intent', intent_id=result['intent_id'],
+                              product_id=order.get('product_id'),
+                              order=order, sent=payload is not None)
+                if payload is None:
+                    result['error'] = 'Wrong order parameters.'
+                    yield result
+                    continue
+                batch.append((result, payload))
+
+            # intents are durable before any order reaches the broker
+            self._commit_journal()
+            for result, payload in batch:
+                result['sent'] = True
+                result['attempts'] = 1
+                future = executor.submit(self._send_check_order, payload)
+                pending[future] = ('check', result, payload, time.monotonic())
+
+            while pending or retries:
+                # resubmit checks which are due
+                now = time.monotonic()
+                while retries and retries[0][0] <= now:
+                    _, _, result, payload, started = heapq.heappop(retries)
+                    result['attempts'] += 1
+                    future = executor.submit(self._send_check_order, payload)
+                    pending[future] = ('check', result, payload, started)
+
+                # wait for the next completed request or due retry
+                timeout = max(0.0, retries[0][0] - now) if retries else None
+                if not pending:
+                    time.sleep(timeout)
+                    continue
+                done, _ = wait(pending, timeout=timeout,
+                               return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    stage, result, payload, started = pending.pop(future)
+                    try:
+                        value = future.result()
+                        error = None
+                    except Exception as e:
+                        value = None
+                        error = str(e)
+
+                    # order checked, confirm it
+                    if stage == 'check':
+                        confirmation_id, fees, status = value if value \
+                            else (None, None, None)
+                        if confirmation_id:
+                            result['confirmation_id'] = confirmation_id
+                            result['fees'] = fees
+                            self._journal('check',
+                                          intent_id=result['intent_id'],
+                                          product_id=payload['productId'],
+                                          confirmation_id=confirmation_id,
+                                          fees=fees,
+                                          attempts=result['attempts'],
+                                          error=None)
+                            future = executor.submit(self._send_confirm_order,
+                                                     confirmation_id, payload)
+                            pending[future] = ('confirm', result, payload,
+                                               started)
+                            continue
 
-        # check if order type is correct
-        # limit order
-        if order_type == 0:
-            if not limit:
-                logger.warning('Limit is required for limit order.')
-                return None
-            if stop_loss:
-                logger.warning('Stop loss is not required for limit order.')
-                return None
-        # stop limit order
-        elif order_type == 1:
-            pass
-        # market order
-        elif order_type == 2:
-            if limit:
-                logger.warning('Limit is not required for market order.')
-                return None
-            if stop_loss:
-                logger.warning('Stop loss is not required for market order.')
-                return None
-        # stop loss order
-        elif order_type == 3:
-            pass
-        else:
-            logger.warning('Only values 0 (limit), '
-                           '1 (stoplimit), '
-                           '2 (market), '
-                           'or 3 (stop loss), '
-                           'are allowed.')
-            return None
+                        # check failed, retry if transient and in budget
+                        error = error or 'Response status code: {}' \
+                            .format(status)
+                        delay = self.retry_policy.next_delay(
+                            result['attempts'], status,
+                            time.monotonic() - started)
+                        # do not wait beyond the deadline
+                        if delay is not None and self.deadline is not None \
+                                and delay >= self.deadline.remaining():
+                            delay = None
+                        if delay is not None:
+                            logger.warning('Check of order failed ({}). '
+                                           'Retry in {:.1f} s.'
+                                           .format(error, delay))
+                            result['retry_wait'] += delay
+                            self._retried(delay)
+                            heapq.heappush(retries,
+                                           (time.monotonic() + delay,
+                                            next(sequence),
+                                            result, payload, started))
+                            continue
+                        if self.retry_policy.retryable(status):
+                            self._exhausted()
+                        result['error'] = error
+                        self._journal('check',
+                                      intent_id=result['intent_id'],
+                                      product_id=payload['productId'],
+                                      confirmation_id=None,
+                                      fees=None,
+                                      attempts=result['attempts'],
+                                      error=error)
+                        yield result
+
+                    # order confirmed
+                    else:
+                        if value:
+                            result['order_id'], error = value
+                        result['error'] = error
+                        if result['order_id']:
+                            logger.info('Placed order with ID {}.'
+                                        .format(result['order_id']))
+                        self._journal('confirm',
+                                      intent_id=result['intent_id'],
+                                      product_id=payload['productId'],
+                                      order_id=result['order_id'],
+                                      error=error)
+                        yield result
+
+        self._commit_journal()
 
-        # check if order validity is correct
-        if validity not in [1, 3]:
-            logger.warning('Only values 1 (daily) or 3 (unlimited) '
-                           'are allowed.')
+        return None
+
+    def _order_payload(self, buy_sell, product_id, size, limit=None,
+                       stop_loss=None, order_type=0, validity=1):
+        """
+        Build payload of an order.
+
+        See `place_order` for the description of parameters.
+
+        Returns
+        -------
+        payload : dict or None
+            Payload of the order, or None if the parameters are wrong.
+
+        """
+        # check if order parameters are correct
+        if not self._check_order(buy_sell, size, limit, stop_loss,
+                                 order_type, validity):
             return None
 
-        confirmation_id = ''
+        return {'buySell': buy_sell,
+                'orderType': order_type,
+                'productId': product_id,
+                'timeType': validity,
+                'size': size,
+                'price': limit,
+                'stopPrice': stop_loss}
+
+    def _send_check_order(self, payload):
+        """
+        Check an order.
+
+        Parameters
+        ----------
+        payload : dict
+            Payload of the order.
+
+        Returns
+        -------
+        confirmation_id : str or None
+            Confirmation ID, or None if the order was not accepted.
+        fees : dict or None
+            Total fee by currencies.
+        status_code : int
+            Response status code.
+
+        """
         params = {'intAccount': str(self.client['intAccount']),
                   'sessionId': self.session_id}
-        payload = {'buySell': buy_sell,
-                   'orderType': order_type,
-                   'productId': product_id,
-                   'timeType': validity,
-                   'size': size,
-                   'price': limit,
-                   'stopPrice': stop_loss}
+        url = self.url_place_order + ';jsessionid=' + self.session_id
+        check_response = self._request('POST', url, endpoint='checkOrder',
+                                       params=params, json=payload)
+
+        # check if response ok
+        if check_response.status_code == requests.codes.ok:
+            check_response_json = json.loads(check_response.content)
+            return (check_response_json['data']['confirmationId'],
+                    self._total_fee(check_response_json[
+                        'data']['transactionFees']),
+                    check_response.status_code)
+
+        # response is not ok
+        return None, None, check_response.status_code
+
+    def _send_confirm_order(self, confirmation_id, payload):
+        """
+        Confirm a checked order.
 
-        try:
-            # make 3 attempts to place an order
-            attempt = 1
-            while attempt <= 3:
-                url = self.url_place_order + ';jsessionid=' + self.session_id
-                place_order_response = self.session.post(url,
-                                                         headers=self.headers,
-                                                         params=params,
-                                                         json=payload)
-
-                # check if response ok
-                if place_order_response.status_code == requests.codes.ok:
-                    place_order_response_json = json.loads(
-                        place_order_response.content)
-                    confirmation_id = place_order_response_json[
-                        'data']['confirmationId']
-                    transaction_fees = place_order_response_json[
-                        'data']['transactionFees']
-                    currencies = self.capital.keys()
-                    total_fee = {}
-                    for currency in currencies:
-                        total_fee[currency] = 0.0
-                        for fee in transaction_fees:
-                            if fee['currency'] == currency:
-                                total_fee[currency] += fee['amount']
-
-                    # break the loop
-                    break
-
-                time.sleep(attempt * 10)
-                attempt += 1
-
-                # response is not ok
-                if attempt == 3:
-                    logger.error('Response status code: {}'
-                                 .format(place_order_response.status_code))
-
-                time.sleep(attempt * 10)
-                attempt += 1
-
-            if confirmation_id:
-                url = self.url_order + confirmation_id + ';jsessionid=' \
-                    + self.session_id
-                confirm_response = self.session.post(url,
-                                                     headers=self.headers,
-                                                     params=params,
-                                                     json=payload)
-
-                # check if response ok
-                if confirm_response.status_code == requests.codes.ok:
-                    confirm_response_json = json.loads(
-                        confirm_response.content)
-                    order_id = confirm_response_json['data']['orderId']
-                    logger.info('Placed order with ID {}.'.format(order_id))
-
-                # response is not ok
-                else:
-                    logger.error('Response status code: {}'
-                                 .format(confirm_response.status_code))
+        Parameters
+        ----------
+        confirmation_id : str
+            Confirmation ID.
+        payload : dict
+            Payload of the order.
 
-        except Exception as e:
-            logger.error(e)
+        Returns
+        -------
+        order_id : str or None
+            Order ID.
+        error : str or None
+            Error message, or None if the order was placed.
 
-        return None
+        """
+        params = {'intAccount': str(self.client['intAccount']),
+                  'sessionId': self.session_id}
+        url = self.url_order + confirmation_id + ';jsessionid=' \
+            + self.session_id
+        confirm_response = self._request('POST', url, endpoint='confirm',
+                                         params=params, json=payload)
+
+        # check if response ok
+        if confirm_response.status_code == requests.codes.ok:
+            confirm_response_json = json.loads(confirm_response.content)
+            return confirm_response_json['data']['orderId'], None
+
+        # response is not ok
+        return None, 'Response status code: {}'.format(
+            confirm_response.status_code)
 
     def cancel_order(self, order_id):
         """
         Cancel order by the order ID.
 
+        The cancellation is recorded in the journal, if there is one.
+
         Parameters
         ----------
         order_id : str
@@ -645,11 +1084,12 @@ class Degiro:
         payload = {'intAccount': self.client['intAccount'],
                    'sessionId': self.session_id}
 
+        error = None
         try:
             url = self.url_order + order_id + ';jsessionid=' + self.session_id
-            delete_order_response = self.session.delete(url,
-                                                        headers=self.headers,
-                                                        data=payload)
+            delete_order_response = self._request('DELETE', url,
+                                                  endpoint='cancel',
+                                                  data=payload)
 
             # check if response ok
             if delete_order_response.status_code == requests.codes.ok:
@@ -657,12 +1097,16 @@ class Degiro:
 
             # response is not ok
             else:
-                logger.error('Response status code: {}'
-                             .format(delete_order_response.status_code))
+                error = 'Response status code: {}'.format(
+                    delete_order_response.status_code)
+                logger.error(error)
 
         except Exception as e:
+            error = str(e)
             logger.error(e)
 
+        self._journal('cancel', order_id=order_id, error=error)
+
         return None
 
     def search_product_id(self, text, by='isin', limit=None, exchange=None):
@@ -685,10 +1129,6 @@ class Degiro:
         None.
 
         """
-        # dictionary with exchanges
-        exchanges = {'194': 'XET',
-                     '195': 'FRA'}
-
         # check if signed up
         if not self.signedup:
             logger.warning('Not signed up.')
@@ -712,10 +1152,22 @@ class Degiro:
 
         # check if exchange is existing in the dictionary
         if exchange:
-            if exchange not in exchanges.values():
+            if exchange not in EXCHANGES.values():
                 logger.warning('Unknown exchange: "{}".'.format(exchange))
                 return None
 
+        # check if product IDs are cached
+        # (only ISINs and symbols are unique enough to be cached)
+        key = None
+        if by in ['isin', 'symbol']:
+            key = self.product_cache.key(text, by, exchange)
+            hit, found = self.product_cache.get(key)
+            if hit:
+                if found:
+                    logger.info('The following product IDs were found '
+                                'in cache: {}.'.format(found))
+                return found
+
         payload = {'searchText': text,
                    'limit': limit,
                    'offset': 0,
@@ -723,39 +1175,19 @@ class Degiro:
                    'sessionId': self.session_id}
 
         try:
-            search_response = self.session.get(self.url_search,
-                                               headers=self.headers,
-                                               params=payload)
+            search_response = self._request('GET', self.url_search,
+                                            endpoint='search', params=payload)
 
             # check if response ok
             if search_response.status_code == requests.codes.ok:
                 search_response_json = json.loads(
                         search_response.content)
-                products = search_response_json['products']
-
-                # build dictionary with codes of exchanges
-                codes = dict((value, key) for key, value in exchanges.items())
+                found = self._parse_products(
+                    text, by, exchange, search_response_json['products'])
 
-                found = {}
-                for product in products:
-                    # search for the given exchange only
-                    if exchange:
-                        if codes[exchange] != product['exchangeId']:
-                            continue
-
-                    # search by isin
-                    if by == 'isin':
-                        if text.lower() == product['isin'].lower():
-                            found[exchanges[product['exchangeId']]] = product[
-                                'id']
-                    # search by symbol
-                    elif by == 'symbol':
-                        if text.lower() == product['symbol'].lower():
-                            found[exchanges[product['exchangeId']]] = product[
-                                'id']
-                    # search by name
-                    else:
-                        found[exchanges[product['exchangeId']]] = product['id']
+                # cache found product IDs or negative result
+                if key:
+                    self.product_cache.set(key, found if found else None)
 
                 if found:
                     logger.info('The following product IDs were found: {}.'
@@ -767,7 +1199,332 @@ class Degiro:
                 logger.error('Response status code: {}'
                              .format(search_response.status_code))
 
+        except DeadlineExceeded:
+            raise
         except Exception as e:
+            self._check_deadline(e)
             logger.error(e)
 
         return None
+
+    def search_product_ids(self, texts, by='isin', exchange=None):
+        """
+        Search product IDs of several products concurrently.
+
+        The searches share the session and run in a pool of `workers`
+        threads.
+
+        Parameters
+        ----------
+        texts : list
+            Search texts.
+        by : str
+            Search by name, isin, or symbol. The default is 'isin'.
+        exchange : str, optional
+            Search for the given exchange only. The default is None.
+
+        Returns
+        -------
+        found : dict
+            Found product IDs by exchanges for each search text.
+        errors : dict
+            Error message for each search text without result.
+
+        """
+        found = {}
+        errors = {}
+        texts = list(dict.fromkeys(texts))
+        if not texts:
+            return found, errors
+
+        with ThreadPoolExecutor(max_workers=min(self.workers,
+                                                len(texts))) as executor:
+            futures = {text: executor.submit(self.search_product_id,
+                                             text, by=by, exchange=exchange)
+                       for text in texts}
+            for text, future in futures.items():
+                try:
+                    result = future.result()
+                except DeadlineExceeded:
+                    raise
+                except Exception as e:
+                    errors[text] = str(e)
+                    continue
+                if result:
+                    found[text] = result
+                else:
+                    errors[text] = 'No product ID was found for {}.' \
+                        .format(text)
+
+        return found, errors
+
+    def _parse_data(self, data_type, data_json, token):
+        """
+        Apply amount of cash or actual portfolio.
+
+        A response to a request with the update token 0 is a full
+        snapshot, which replaces the local state. Other responses contain
+        only changed items, which are merged into the local state.
+
+        Parameters
+        ----------
+        data_type : str
+            `cashFunds` or `portfolio`.
+        data_json : dict
+            Decoded response of the update endpoint.
+        token : int
+            Update token sent with the request. The stored token may have
+            been reset meanwhile by a new login.
+
+        Returns
+        -------
+        None.
+
+        """
+        full = not token
+        data = data_json.get(data_type)
+        if data is None:
+            # nothing changed since the last update
+            if not full:
+                return None
+            raise KeyError(data_type)
+
+        # get capital
+        if data_type == 'cashFunds':
+            if full:
+                self.cash_funds.clear()
+            for item in data.get('value', []):
+                if item.get('isRemoved'):
+                    self.cash_funds.pop(item['id'], None)
+                    continue
+                fields = self.cash_funds.setdefault(item['id'], {})
+                for i in item.get('value', []):
+                    if 'value' in i:
+                        fields[i['name']] = i['value']
+            self.capital = {fields['currencyCode']: fields['value']
+                            for fields in self.cash_funds.values()
+                            if 'currencyCode' in fields}
+            logger.info('Got capital of {} EUR.'
+                        .format(self.capital.get('EUR')))
+
+        # get portfolio
+        elif data_type == 'portfolio':
+            self.portfolio.apply(data.get('value', []), full)
+            logger.info('Got portfolio of {} positions.'
+                        .format(len(self.portfolio)))
+
+        self.last_updated[data_type] = data.get('lastUpdated', 0)
+
+        return None
+
+    def _order_period(self, from_date=None, to_date=None):
+        """
+        Check time period for the selection of orders.
+
+        Parameters
+        ----------
+        from_date : str, optional
+            Start date in format "dd.mm.YYYY". The default is None.
+        to_date : str, optional
+            End date in format "dd.mm.YYYY". The default is None.
+
+        Returns
+        -------
+        period : tuple or None
+            Start and end dates, or None if the period is not valid.
+
+        """
+        # check to_date
+        if to_date:
+            try:
+                to_date = datetime.strptime(to_date, '%d.%m.%Y')
+            except ValueError:
+                logger.warning('Date in format "dd.mm.YYYY" is required.')
+                return None
+        else:
+            # set as today
+            to_date = datetime.today()
+
+        # check from_date
+        if from_date:
+            try:
+                from_date = datetime.strptime(from_date, '%d.%m.%Y')
+            except ValueError:
+                logger.warning('Date in format "dd.mm.YYYY" is required.')
+                return None
+        else:
+            # set as today - 90 days
+            from_date = datetime.today() - timedelta(days=90)
+
+        # check range between from_date and to_date:
+        if (to_date - from_date).days > 90:
+            logger.warning('The maximal time interval is 90 days.')
+            return None
+
+        # check if from_dateis less than to_date:
+        if to_date < from_date:
+            logger.warning('Negative time interval is not allowed.')
+            return None
+
+        return from_date, to_date
+
+    def _parse_orders(self, orders_json, active=True):
+        """
+        Parse orders.
+
+        Parameters
+        ----------
+        orders_json : dict
+            Decoded response of the order history endpoint.
+        active : bool, optional
+            Select active orders only, if it is true. The default is True.
+
+        Returns
+        -------
+        None.
+
+        """
+        # pandas is heavy and required only here
+        import pandas as pd
+
+        orders = pd.DataFrame(orders_json['data'])
+        if active:
+            orders = orders.loc[orders['isActive'], :]
+        self.orders = orders
+        logger.info('Got {} order{}.'.format(
+            self.orders.shape[0],
+            '' if self.orders.shape[0] == 1 else 's'))
+
+        return None
+
+    def _check_order(self, buy_sell, size, limit, stop_loss,
+                     order_type, validity):
+        """
+        Check order parameters.
+
+        See `place_order` for the description of parameters.
+
+        Returns
+        -------
+        bool
+            True if the parameters are correct, False else.
+
+        """
+        # check if buy_sell is correct
+        if buy_sell not in ['BUY', 'SELL']:
+            logger.warning('Only values "BUY" or "SELL" are allowed.')
+            return False
+
+        # check if order size is correct
+        if size == 0:
+            logger.warning('Order size must be not equal zero.')
+            return False
+
+        # check if order type is correct
+        # limit order
+        if order_type == 0:
+            if not limit:
+                logger.warning('Limit is required for limit order.')
+                return False
+            if stop_loss:
+                logger.warning('Stop loss is not required for limit order.')
+                return False
+        # stop limit order
+        elif order_type == 1:
+            pass
+        # market order
+        elif order_type == 2:
+            if limit:
+                logger.warning('Limit is not required for market order.')
+                return False
+            if stop_loss:
+                logger.warning('Stop loss is not required for market order.')
+                return False
+        # stop loss order
+        elif order_type == 3:
+            pass
+        else:
+            logger.warning('Only values 0 (limit), '
+                           '1 (stoplimit), '
+                           '2 (market), '
+                           'or 3 (stop loss), '
+                           'are allowed.')
+            return False
+
+        # check if order validity is correct
+        if validity not in [1, 3]:
+            logger.warning('Only values 1 (daily) or 3 (unlimited) '
+                           'are allowed.')
+            return False
+
+        return True
+
+    def _total_fee(self, transaction_fees):
+        """
+        Sum up transaction fees by currencies.
+
+        Parameters
+        ----------
+        transaction_fees : list
+            Transaction fees returned by the check order endpoint.
+
+        Returns
+        -------
+        total_fee : dict
+            Total fee for each currency of the capital.
+
+        """
+        currencies = self.capital.keys() if self.capital else []
+        total_fee = {}
+        for currency in currencies:
+            total_fee[currency] = 0.0
+            for fee in transaction_fees:
+                if fee['currency'] == currency:
+                    total_fee[currency] += fee['amount']
+
+        return total_fee
+
+    def _parse_products(self, text, by, exchange, products):
+        """
+        Select product IDs from search results.
+
+        Parameters
+        ----------
+        text : str
+            Search text.
+        by : str
+            Search by name, isin, or symbol.
+        exchange : str
+            Search for the given exchange only.
+        products : list
+            Products returned by the search endpoint.
+
+        Returns
+        -------
+        found : dict
+            Product IDs by exchanges.
+
+        """
+        # build dictionary with codes of exchanges
+        codes = dict((value, key) for key, value in EXCHANGES.items())
+
+        found = {}
+        for product in products:
+            # search for the given exchange only
+            if exchange:
+                if codes[exchange] != product['exchangeId']:
+                    continue
+
+            # search by isin
+            if by == 'isin':
+                if text.lower() == product['isin'].lower():
+                    found[EXCHANGES[product['exchangeId']]] = product['id']
+            # search by symbol
+            elif by == 'symbol':
+                if text.lower() == product['symbol'].lower():
+                    found[EXCHANGES[product['exchangeId']]] = product['id']
+            # search by name
+            else:
+                found[EXCHANGES[product['exchangeId']]] = product['id']
+
+        return found
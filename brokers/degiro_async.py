@@ -0,0 +1,819 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of asynchronous Degiro API."""
+import sys
+import json
+import time
+import uuid
+import asyncio
+import aiohttp
+from urllib.parse import urlencode
+from brokers.degiro import Degiro, EXCHANGES
+from brokers.deadline import DeadlineExceeded
+from autotrader.setup_logger import logger
+from autotrader.tracing import span
+
+# HTTP status codes
+OK = 200
+CREATED = 201
+UNAUTHORIZED = 401
+
+
+class AsyncDegiro(Degiro):
+    """
+    Class representation of asynchronous unofficial Degiro API.
+
+    The class has the same surface as `Degiro`, but its requests are
+    coroutines sharing one pooled `aiohttp` connector, so many requests
+    can be in flight from one thread. The client should be used as
+    an asynchronous context manager or closed with `close`.
+    """
+
+    def __init__(self, *args, connections=100, **kwargs):
+        Degiro.__init__(self, *args, **kwargs)
+        self.connections = connections
+        self.login_lock = asyncio.Lock()
+        self.async_session = None
+
+    async def __aenter__(self):
+        """Open the session."""
+        self._open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        """Close the session."""
+        await self.close()
+
+    def _open(self):
+        """Create the session with a pooled connector, if required."""
+        if self.async_session is None or self.async_session.closed:
+            connector = aiohttp.TCPConnector(limit=self.connections)
+            self.async_session = aiohttp.ClientSession(
+                connector=connector,
+                headers=self.headers)
+
+    async def close(self):
+        """
+        Close the session.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.async_session is not None:
+            await self.async_session.close()
+            self.async_session = None
+
+        return None
+
+    async def _request(self, method, url, endpoint=None, **kwargs):
+        """
+        Send a request within the session.
+
+        The request uses timeouts of the endpoint clipped to the deadline
+        (see `Degiro._request`). If the response is unauthorized, the user
+        is logged in again and the request is repeated once with the new
+        session ID.
+
+        Parameters
+        ----------
+        method : str
+            HTTP method.
+        url : str
+            URL of the request.
+        endpoint : str, optional
+            Endpoint name (key of `timeouts`). The default is None.
+        **kwargs : dict
+            Keyword arguments passed to `aiohttp.ClientSession.request`.
+
+        Returns
+        -------
+        status : int
+            Response status code.
+        content : bytes
+            Response content.
+
+        """
+        self._open()
+        old_session_id = self.session_id
+        status, content = await self._send(method, url, endpoint, **kwargs)
+
+        # log in again, if session expired
+        if status == UNAUTHORIZED and self.credentials:
+            async with self.login_lock:
+                # other task may have logged in already
+                if self.session_id == old_session_id:
+                    logger.warning('Session expired. Logging in again...')
+                    self.signedup = False
+                    await self.login(*self.credentials)
+
+            # replace session ID in URL and parameters
+            url = url.replace(old_session_id, self.session_id)
+            for key in ['params', 'data', 'cookies']:
+                if isinstance(kwargs.get(key), dict):
+                    kwargs[key] = {
+                        k: self.session_id if v == old_session_id else v
+                        for k, v in kwargs[key].items()}
+
+            status, content = await self._send(method, url, endpoint,
+                                               **kwargs)
+
+        return status, content
+
+    async def _send(self, method, url, endpoint=None, **kwargs):
+        """Send a request, read the whole response, record metrics and span."""
+        timeout = self._timeout(endpoint)
+        if timeout is not None:
+            kwargs['timeout'] = aiohttp.ClientTimeout(sock_connect=timeout[0],
+                                                      sock_read=timeout[1])
+        # aiohttp accepts only strings as query parameters
+        if isinstance(kwargs.get('params'), dict):
+            kwargs['params'] = {key: str(value)
+                                for key, value in kwargs['params'].items()
+                                if value is not None}
+        if 'json' in kwargs:
+            sent = len(json.dumps(kwargs['json']).encode('utf-8'))
+        else:
+            data = kwargs.get('data') or b''
+            # form body as encoded by aiohttp
+            if isinstance(data, dict):
+                data = urlencode(data, doseq=True)
+            if isinstance(data, str):
+                data = data.encode('utf-8')
+            sent = len(data)
+
+        with span(self.trace, endpoint if endpoint else 'other') as attributes:
+            started = time.perf_counter()
+            try:
+                async with self.async_session.request(method, url,
+                                                      **kwargs) as response:
+                    content = await response.read()
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                self._observe(endpoint, 'error',
+                              time.perf_counter() - started)
+                raise
+
+            attributes['status'] = response.status
+            self._observe(endpoint, response.status,
+                          time.perf_counter() - started,
+                          sent=sent, received=len(content))
+
+        return response.status, content
+
+    async def connect(self, user, password):
+        """
+        Open a session and load the account state.
+
+        See `Degiro.connect`.
+
+        Returns
+        -------
+        None.
+
+        """
+        if not self.signedup:
+            await self.login(user, password)
+            await self.get_config()
+            await self.get_user_info()
+        await asyncio.gather(self.get_data('cashFunds'),
+                             self.get_data('portfolio'))
+
+        return None
+
+    async def login(self, user, password):
+        """
+        Log into Degiro.
+
+        Parameters
+        ----------
+        user : str
+            User name.
+        password : str
+            User password.
+
+        Returns
+        -------
+        None.
+
+        """
+        # check if signed up
+        if self.signedup:
+            logger.warning('Already signed up.')
+            return None
+
+        payload = {'username': user,
+                   'password': password,
+                   'isPassCodeReset': False,
+                   'isRedirectToMobile': False}
+
+        try:
+            self._open()
+            status, content = await self._send('POST', self.url_login,
+                                               endpoint='login',
+                                               json=payload)
+
+            # check if response ok
+            if status == OK:
+                auth_json = json.loads(content)
+                if auth_json['status'] == 0:
+                    # signed in
+                    self.session_id = auth_json['sessionId']
+                    self.credentials = (user, password)
+                    self.last_updated = dict.fromkeys(self.last_updated, 0)
+                    self.signedup = True
+                    logger.info('Logged in as {}.'.format(user))
+                    return None
+
+            # response is not ok
+            else:
+                logger.error('Response status code: {}'.format(status))
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._check_deadline(e)
+            logger.error(e)
+
+        # notify about failed login and exit
+        self.signedup = False
+        message = 'Login failed.'
+        logger.critical(message)
+        sys.exit(-1)
+
+    async def logout(self):
+        """
+        Log off from Degiro.
+
+        Returns
+        -------
+        None.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return None
+
+        # check if account ID is existing
+        if not self.client or not self.client['intAccount']:
+            logger.warning('Account ID does not exist.')
+            return None
+
+        payload = {'intAccount': str(self.client['intAccount']),
+                   'sessionId': self.session_id}
+
+        try:
+            url = self.url_logout + ';jsessionid=' + self.session_id
+            status, _ = await self._request('GET', url, endpoint='logout',
+                                            params=payload)
+
+            # check if response ok
+            if status == OK:
+                self.signedup = False
+                logger.info('Logged out.')
+
+            # response is not ok
+            else:
+                logger.error('Response status code: {}'.format(status))
+
+        except Exception as e:
+            logger.error(e)
+
+        return None
+
+    async def get_config(self):
+        """
+        Get configuration.
+
+        Returns
+        -------
+        None.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return None
+
+        cookie = {'JSESSIONID': self.session_id}
+
+        try:
+            status, content = await self._request('GET', self.url_config,
+                                                  endpoint='config',
+                                                  cookies=cookie)
+
+            # check if response ok
+            if status == OK:
+                self.configuration = json.loads(content)['data']
+                logger.info('Got configuration.')
+
+            # response is not ok
+            else:
+                logger.error('Response status code: {}'.format(status))
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._check_deadline(e)
+            logger.error(e)
+
+        return None
+
+    async def get_user_info(self):
+        """
+        Get information about the logged user.
+
+        Returns
+        -------
+        None.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return None
+
+        payload = {'sessionId': self.session_id}
+
+        try:
+            status, content = await self._request('GET', self.url_client,
+                                                  endpoint='client',
+                                                  params=payload)
+
+            # check if response ok
+            if status == OK:
+                self.client = json.loads(content)['data']
+                logger.info('Got client information.')
+
+            # response is not ok
+            else:
+                logger.error('Response status code: {}'.format(status))
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._check_deadline(e)
+            logger.error(e)
+
+        return None
+
+    async def get_data(self, data_type):
+        """
+        Get amount of cash or actual portfolio.
+
+        See `Degiro.get_data`.
+
+        Parameters
+        ----------
+        data_type : str
+            `cashFunds` to get amount of cash or
+            `portfolio` to get actual portfolio.
+
+        Returns
+        -------
+        None.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return None
+
+        # check if account ID is existing
+        if not self.client or not self.client['intAccount']:
+            logger.warning('Account ID does not exist.')
+            return None
+
+        # check if data_type is correct
+        if data_type not in ['cashFunds', 'portfolio']:
+            logger.warning('Wrong data_type.')
+            return None
+
+        token = self.last_updated[data_type]
+        payload = {data_type: token}
+
+        try:
+            url = self.url_data + str(self.client['intAccount']) \
+                + ';jsessionid=' + self.session_id
+            status, content = await self._request('GET', url,
+                                                  endpoint='update',
+                                                  params=payload)
+
+            # check if response ok
+            if status in [OK, CREATED]:
+                self._parse_data(data_type, json.loads(content), token)
+
+            # update token is not valid anymore, load full snapshot
+            elif token:
+                logger.warning('Update token of {} was rejected. '
+                               'Loading full snapshot...'.format(data_type))
+                self.last_updated[data_type] = 0
+                return await self.get_data(data_type)
+
+            # response is not ok
+            else:
+                logger.error('Response status code: {}'.format(status))
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._check_deadline(e)
+            logger.error(e)
+
+        return None
+
+    async def get_orders(self, from_date=None, to_date=None, active=True):
+        """
+        Get orders.
+
+        See `Degiro.get_orders`.
+
+        Returns
+        -------
+        None.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return None
+
+        # check if account ID is existing
+        if not self.client or not self.client['intAccount']:
+            logger.warning('Account ID does not exist.')
+            return None
+
+        # check time period
+        period = self._order_period(from_date, to_date)
+        if not period:
+            return None
+        from_date, to_date = period
+
+        payload = {'fromDate': from_date.strftime('%d/%m/%Y'),
+                   'toDate': to_date.strftime('%d/%m/%Y'),
+                   'intAccount': str(self.client['intAccount']),
+                   'sessionId': self.session_id}
+
+        try:
+            status, content = await self._request('GET', self.url_orders,
+                                                  endpoint='orders',
+                                                  params=payload)
+
+            # check if response ok
+            if status == OK:
+                self._parse_orders(json.loads(content), active)
+
+            # response is not ok
+            else:
+                logger.error('Response status code: {}'.format(status))
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._check_deadline(e)
+            logger.error(e)
+
+        return None
+
+    async def place_order(self, buy_sell, product_id, size, limit=None,
+                          stop_loss=None, order_type=0, validity=1):
+        """
+        Place a buy or sell order.
+
+        See `Degiro.place_order`.
+
+        Returns
+        -------
+        result : dict or None
+            Result of the order (see `Degiro.place_orders`), or None if
+            the order was not sent.
+
+        """
+        order = {'buy_sell': buy_sell,
+                 'product_id': product_id,
+                 'size': size,
+                 'limit': limit,
+                 'stop_loss': stop_loss,
+                 'order_type': order_type,
+                 'validity': validity}
+        async for result in self.place_orders([order]):
+            if result['error']:
+                logger.error(result['error'])
+            return result if result['sent'] else None
+
+        return None
+
+    async def place_orders(self, orders):
+        """
+        Place several orders concurrently.
+
+        See `Degiro.place_orders`. Every order runs as a task, which
+        checks and confirms the order. Checks are retried according to
+        `retry_policy`, and waiting between the attempts does not block
+        other orders. Intents of all orders are synced to the journal
+        before the first order is sent, the remaining events when the
+        batch ends.
+
+        Yields
+        ------
+        result : dict
+            Result of the order.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return
+
+        # check if account ID is existing
+        if not self.client or not self.client['intAccount']:
+            logger.warning('Account ID does not exist.')
+            return
+
+        batch = []
+        for order in orders:
+            result = {'order': order,
+                      'intent_id': uuid.uuid4().hex,
+                      'sent': False,
+                      'confirmation_id': None,
+                      'order_id': None,
+                      'fees': None,
+                      'attempts': 0,
+                      'retry_wait': 0.0,
+                      'error': None}
+            payload = self._order_payload(**order)
+            self._journal('intent', intent_id=result['intent_id'],
+                          product_id=order.get('product_id'),
+                          order=order, sent=payload is not None)
+            if payload is None:
+                result['error'] = 'Wrong order parameters.'
+                yield result
+                continue
+            batch.append((result, payload))
+
+        # intents are durable before any order reaches the broker
+        await self._commit_journal_async()
+        tasks = []
+        for result, payload in batch:
+            result['sent'] = True
+            tasks.append(asyncio.ensure_future(
+                self._send_order(result, payload)))
+
+        for task in asyncio.as_completed(tasks):
+            yield await task
+
+        await self._commit_journal_async()
+
+    async def _commit_journal_async(self):
+        """Wait for `_commit_journal` without blocking the event loop."""
+        if self.journal is None:
+            return True
+        return await asyncio.get_running_loop().run_in_executor(
+            None, self._commit_journal)
+
+    async def _send_order(self, result, payload):
+        """Check and confirm an order."""
+        params = {'intAccount': str(self.client['intAccount']),
+                  'sessionId': self.session_id}
+
+        started = asyncio.get_running_loop().time()
+        try:
+            while True:
+                result['attempts'] += 1
+                url = self.url_place_order + ';jsessionid=' + self.session_id
+                try:
+                    status, content = await self._request(
+                        'POST', url, endpoint='checkOrder',
+                        params=params, json=payload)
+                    error = 'Response status code: {}'.format(status)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    status, content = None, b''
+                    error = str(e) or type(e).__name__
+
+                # check if response ok
+                if status == OK:
+                    data = json.loads(content)['data']
+                    result['confirmation_id'] = data['confirmationId']
+                    result['fees'] = self._total_fee(data['transactionFees'])
+                    self._journal('check', intent_id=result['intent_id'],
+                                  product_id=payload['productId'],
+                                  confirmation_id=result['confirmation_id'],
+                                  fees=result['fees'],
+                                  attempts=result['attempts'],
+                                  error=None)
+                    break
+
+                # retry if transient and in budget
+                delay = self.retry_policy.next_delay(
+                    result['attempts'], status,
+                    asyncio.get_running_loop().time() - started)
+                # do not wait beyond the deadline
+                if delay is not None and self.deadline is not None \
+                        and delay >= self.deadline.remaining():
+                    delay = None
+                if delay is None:
+                    if self.retry_policy.retryable(status):
+                        self._exhausted()
+                    result['error'] = error
+                    self._journal('check', intent_id=result['intent_id'],
+                                  product_id=payload['productId'],
+                                  confirmation_id=None,
+                                  fees=None,
+                                  attempts=result['attempts'],
+                                  error=error)
+                    return result
+                logger.warning('Check of order failed ({}). '
+                               'Retry in {:.1f} s.'.format(error, delay))
+                result['retry_wait'] += delay
+                self._retried(delay)
+                await asyncio.sleep(delay)
+
+            url = self.url_order + result['confirmation_id'] \
+                + ';jsessionid=' + self.session_id
+            status, content = await self._request('POST', url,
+                                                  endpoint='confirm',
+                                                  params=params, json=payload)
+
+            # check if response ok
+            if status == OK:
+                result['order_id'] = json.loads(content)['data']['orderId']
+                logger.info('Placed order with ID {}.'
+                            .format(result['order_id']))
+
+            # response is not ok
+            else:
+                result['error'] = 'Response status code: {}'.format(status)
+
+        except Exception as e:
+            result['error'] = str(e)
+
+        if result['confirmation_id']:
+            self._journal('confirm', intent_id=result['intent_id'],
+                          product_id=payload['productId'],
+                          order_id=result['order_id'],
+                          error=result['error'])
+
+        return result
+
+    async def cancel_order(self, order_id):
+        """
+        Cancel order by the order ID.
+
+        Parameters
+        ----------
+        order_id : str
+            Order ID.
+
+        Returns
+        -------
+        None.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return None
+
+        # check if account ID is existing
+        if not self.client or not self.client['intAccount']:
+            logger.warning('Account ID does not exist.')
+            return None
+
+        payload = {'intAccount': self.client['intAccount'],
+                   'sessionId': self.session_id}
+
+        error = None
+        try:
+            url = self.url_order + order_id + ';jsessionid=' + self.session_id
+            status, _ = await self._request('DELETE', url, endpoint='cancel',
+                                            data=payload)
+
+            # check if response ok
+            if status == OK:
+                logger.info('Deleted order with ID {}.'.format(order_id))
+
+            # response is not ok
+            else:
+                error = 'Response status code: {}'.format(status)
+                logger.error(error)
+
+        except Exception as e:
+            error = str(e)
+            logger.error(e)
+
+        self._journal('cancel', order_id=order_id, error=error)
+
+        return None
+
+    async def search_product_id(self, text, by='isin', limit=None,
+                                exchange=None):
+        """
+        Search product ID by a product name, ISIN, or symbol.
+
+        See `Degiro.search_product_id`.
+
+        Returns
+        -------
+        found : dict or None
+            Product IDs by exchanges, or None if nothing was found.
+
+        """
+        # check if signed up
+        if not self.signedup:
+            logger.warning('Not signed up.')
+            return None
+
+        # check if account ID is existing
+        if not self.client or not self.client['intAccount']:
+            logger.warning('Account ID does not exist.')
+            return None
+
+        # check if 'by' has a correct value
+        if by not in ['name', 'isin', 'symbol']:
+            logger.warning('Only values "name", "isin", '
+                           'or "symbol" are allowed.')
+            return None
+
+        # check if exchange is existing in the dictionary
+        if exchange:
+            if exchange not in EXCHANGES.values():
+                logger.warning('Unknown exchange: "{}".'.format(exchange))
+                return None
+
+        # check if product IDs are cached
+        key = None
+        if by in ['isin', 'symbol']:
+            key = self.product_cache.key(text, by, exchange)
+            hit, found = self.product_cache.get(key)
+            if hit:
+                return found
+
+        payload = {'searchText': text,
+                   'limit': limit,
+                   'offset': 0,
+                   'intAccount': str(self.client['intAccount']),
+                   'sessionId': self.session_id}
+
+        try:
+            status, content = await self._request('GET', self.url_search,
+                                                  endpoint='search',
+                                                  params=payload)
+
+            # check if response ok
+            if status == OK:
+                found = self._parse_products(
+                    text, by, exchange, json.loads(content)['products'])
+
+                # cache found product IDs or negative result
+                if key:
+                    self.product_cache.set(key, found if found else None)
+
+                if found:
+                    logger.info('The following product IDs were found: {}.'
+                                .format(found))
+                    return found
+
+            # response is not ok
+            else:
+                logger.error('Response status code: {}'.format(status))
+
+        except DeadlineExceeded:
+            raise
+        except Exception as e:
+            self._check_deadline(e)
+            logger.error(e)
+
+        return None
+
+    async def search_product_ids(self, texts, by='isin', exchange=None):
+        """
+        Search product IDs of several products concurrently.
+
+        See `Degiro.search_product_ids`.
+
+        Returns
+        -------
+        found : dict
+            Found product IDs by exchanges for each search text.
+        errors : dict
+            Error message for each search text without result.
+
+        """
+        found = {}
+        errors = {}
+        texts = list(dict.fromkeys(texts))
+        results = await asyncio.gather(
+            *[self.search_product_id(text, by=by, exchange=exchange)
+              for text in texts],
+            return_exceptions=True)
+        for text, result in zip(texts, results):
+            if isinstance(result, DeadlineExceeded):
+                raise result
+            if isinstance(result, Exception):
+                errors[text] = str(result)
+            elif result:
+                found[text] = result
+            else:
+                errors[text] = 'No product ID was found for {}.'.format(text)
+
+        return found, errors
@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definitions of order journal and reader."""
+
+import os
+import json
+import time
+import queue
+import bisect
+import atexit
+import threading
+from autotrader.setup_logger import logger
+
+PATH_JOURNAL = '/var/www/flask/autotrader/orders.jsonl'
+
+# events of an order
+EVENTS = ('intent', 'check', 'confirm', 'cancel')
+
+
+class Journal:
+    """
+    Class representation of an append-only order journal.
+
+    Entries are JSON lines with keys `ts` (UNIX time), `event` (see
+    `EVENTS`), and fields of the event. They are written by a background
+    thread, which commits all entries queued meanwhile with a single
+    fsync (group commit), so durability costs one fsync per batch rather
+    than per order.
+    """
+
+    def __init__(self, file_name=PATH_JOURNAL, delay=0.0):
+        self.file_name = file_name
+        self.delay = delay
+        self.entries = queue.SimpleQueue()
+        self.lock = threading.Lock()
+        self.written = threading.Condition(self.lock)
+        # sequence numbers of recorded and committed entries
+        self.recorded = 0
+        self.committed = 0
+        self.file = open(file_name, 'ab')
+        self.thread = threading.Thread(target=self._write,
+                                       name='journal',
+                                       daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def record(self, event, **fields):
+        """
+        Record an event without waiting for it to be written.
+
+        Parameters
+        ----------
+        event : str
+            Event (see `EVENTS`).
+        **fields : dict
+            Fields of the event, e.g. `product_id`, `order_id`.
+
+        Returns
+        -------
+        sequence : int
+            Sequence number of the entry (see `commit`).
+
+        """
+        entry = dict(fields, ts=time.time(), event=event)
+        with self.lock:
+            self.recorded += 1
+            sequence = self.recorded
+            self.entries.put(entry)
+
+        return sequence
+
+    def commit(self, sequence=None, timeout=None):
+        """
+        Wait until entries are written and synced to disk.
+
+        Parameters
+        ----------
+        sequence : int, optional
+            Sequence number of the last entry to wait for.
+            The default is None (all recorded entries).
+        timeout : float, optional
+            Maximum seconds to wait. The default is None (no limit).
+
+        Returns
+        -------
+        committed : bool
+            True if the entries are durable, False on timeout.
+
+        """
+        with self.lock:
+            if sequence is None:
+                sequence = self.recorded
+            return self.written.wait_for(
+                lambda: self.committed >= sequence or self.file is None,
+                timeout)
+
+    def _write(self):
+        """Write batches of entries, one fsync per batch."""
+        while True:
+            entry = self.entries.get()
+            if entry is None:
+                break
+            # gather entries arriving while the last batch was synced
+            if self.delay:
+                time.sleep(self.delay)
+            batch = [entry]
+            stop = False
+            while True:
+                try:
+                    entry = self.entries.get_nowait()
+                except queue.Empty:
+                    break
+                if entry is None:
+                    stop = True
+                    break
+                batch.append(entry)
+
+            data = b''.join(json.dumps(entry, separators=(',', ':'),
+                                       default=str).encode('utf-8') + b'\n'
+                            for entry in batch)
+            try:
+                self.file.write(data)
+                self.file.flush()
+                os.fsync(self.file.fileno())
+            except (OSError, ValueError) as e:
+                logger.error('Writing order journal failed: {}'.format(e))
+
+            with self.lock:
+                self.committed += len(batch)
+                self.written.notify_all()
+            if stop:
+                break
+
+        return None
+
+    def close(self):
+        """
+        Write all recorded entries and close the journal.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.thread.is_alive():
+            self.entries.put(None)
+            self.thread.join()
+        with self.lock:
+            if self.file is not None:
+                self.file.close()
+                self.file = None
+            self.written.notify_all()
+
+        return None
+
+
+class JournalReader:
+    """
+    Class representation of an indexed journal reader.
+
+    The reader keeps byte offsets of entries by product ID, sorted by
+    time, so queries read only the matching lines. Cancellations are
+    indexed by the product of the confirmed order. New entries are
+    indexed by `refresh`.
+    """
+
+    def __init__(self, file_name=PATH_JOURNAL):
+        self.file_name = file_name
+        self.offset = 0
+        # times and offsets by product ID, sorted by time
+        self.index = {}
+        self.products = {}
+        self.refresh()
+
+    def refresh(self):
+        """
+        Index entries appended since the last refresh.
+
+        Returns
+        -------
+        count : int
+            Number of new entries.
+
+        """
+        count = 0
+        with open(self.file_name, 'rb') as file:
+            file.seek(self.offset)
+            while True:
+                offset = file.tell()
+                line = file.readline()
+                # incomplete line is indexed by the next refresh
+                if not line.endswith(b'\n'):
+                    break
+                self.offset = file.tell()
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                product_id = entry.get('product_id')
+                order_id = entry.get('order_id')
+                if product_id is not None and order_id is not None:
+                    self.products[order_id] = product_id
+                elif product_id is None and order_id is not None:
+                    product_id = self.products.get(order_id)
+                times, offsets = self.index.setdefault(
+                    str(product_id), ([], []))
+                i = bisect.bisect_right(times, entry['ts'])
+                times.insert(i, entry['ts'])
+                offsets.insert(i, offset)
+                count += 1
+
+        return count
+
+    def query(self, product_id=None, start=None, end=None, event=None):
+        """
+        Get entries of a product within a time range.
+
+        Parameters
+        ----------
+        product_id : str, optional
+            Product ID. The default is None (all products).
+        start : float or datetime, optional
+            Start of the range (inclusive). The default is None.
+        end : float or datetime, optional
+            End of the range (exclusive). The default is None.
+        event : str, optional
+            Event to select (see `EVENTS`). The default is None (all).
+
+        Returns
+        -------
+        entries : list
+            Entries sorted by time.
+
+        """
+        start = _timestamp(start, float('-inf'))
+        end = _timestamp(end, float('inf'))
+        keys = [str(product_id)] if product_id is not None \
+            else list(self.index)
+
+        selected = []
+        for key in keys:
+            times, offsets = self.index.get(key, ([], []))
+            first = bisect.bisect_left(times, start)
+            last = bisect.bisect_left(times, end)
+            selected.extend(zip(times[first:last], offsets[first:last]))
+        selected.sort()
+
+        entries = []
+        with open(self.file_name, 'rb') as file:
+            for _, offset in selected:
+                file.seek(offset)
+                entry = json.loads(file.readline())
+                if event is None or entry['event'] == event:
+                    entries.append(entry)
+
+        return entries
+
+
+def _timestamp(value, default):
+    """Convert datetime to UNIX time."""
+    if value is None:
+        return default
+    if hasattr(value, 'timestamp'):
+        return value.timestamp()
+    return float(value)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definitions of portfolio and position."""
+
+# attributes of position by field names of the update endpoint
+FIELDS = {'positionType': 'position_type',
+          'breakEvenPrice': 'break_even_price',
+          'price': 'price',
+          'size': 'size',
+          'value': 'value'}
+
+
+class Position:
+    """Class representation of a portfolio position."""
+
+    __slots__ = ('id', 'position_type', 'break_even_price',
+                 'price', 'size', 'value')
+
+    def __init__(self, product_id):
+        self.id = product_id
+        self.position_type = None
+        self.break_even_price = None
+        self.price = None
+        self.size = 0.0
+        self.value = None
+
+    def __repr__(self):
+        return 'Position(id={!r}, size={!r}, price={!r})'.format(
+            self.id, self.size, self.price)
+
+    @property
+    def is_open(self):
+        """bool: True if the position is an open product position."""
+        return self.position_type == 'PRODUCT' and self.size > 0.0
+
+
+class Portfolio:
+    """
+    Class representation of a portfolio.
+
+    Positions are kept in a dictionary keyed by product ID, so lookups do
+    not depend on the number of positions.
+    """
+
+    def __init__(self):
+        self.positions = {}
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __iter__(self):
+        return (position for position in self.positions.values()
+                if position.is_open)
+
+    def __contains__(self, product_id):
+        return self.get(product_id) is not None
+
+    def apply(self, items, full=True):
+        """
+        Apply positions returned by the update endpoint.
+
+        Parameters
+        ----------
+        items : list
+            Positions with keys `id` and `value` (list of fields), or
+            with key `isRemoved` for removed positions.
+        full : bool, optional
+            If it is true, items are a full snapshot replacing all
+            positions, else only changed positions. The default is True.
+
+        Returns
+        -------
+        None.
+
+        """
+        if full:
+            self.positions = {}
+        positions = self.positions
+        for item in items:
+            product_id = item['id']
+            if item.get('isRemoved'):
+                positions.pop(product_id, None)
+                continue
+            position = positions.get(product_id)
+            if position is None:
+                position = positions[product_id] = Position(product_id)
+            for field in item.get('value', ()):
+                attribute = FIELDS.get(field['name'])
+                if attribute and 'value' in field:
+                    setattr(position, attribute, field['value'])
+
+        return None
+
+    def get(self, product_id):
+        """
+        Get an open position.
+
+        Parameters
+        ----------
+        product_id : str
+            Product ID.
+
+        Returns
+        -------
+        position : Position or None
+            Open position, or None if there is no open position.
+
+        """
+        position = self.positions.get(product_id)
+        if position is not None and position.is_open:
+            return position
+        return None
+
+    def to_dataframe(self):
+        """
+        Export open positions as data frame.
+
+        Returns
+        -------
+        portfolio : pandas.DataFrame
+            Open positions with columns `id` and field names of
+            the update endpoint.
+
+        """
+        import pandas as pd
+
+        columns = ['id'] + list(FIELDS)
+        return pd.DataFrame(
+            [[position.id] + [getattr(position, attribute)
+                              for attribute in FIELDS.values()]
+             for position in self],
+            columns=columns)
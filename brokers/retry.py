@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of retry policy."""
+
+import random
+
+# status codes worth retrying (None stands for a connection error)
+RETRYABLE = {None, 408, 425, 429, 500, 502, 503, 504}
+
+
+class RetryPolicy:
+    """
+    Class representation of a retry policy.
+
+    Delays grow exponentially from `base` up to `cap` seconds and are
+    randomized with full jitter. The retries of one request stop after
+    `attempts` attempts or when the next attempt would start later than
+    `budget` seconds after the first one.
+    """
+
+    def __init__(self,
+                 attempts=3,
+                 base=1.0,
+                 cap=30.0,
+                 budget=60.0,
+                 jitter=True
+                 ):
+        self.attempts = attempts
+        self.base = base
+        self.cap = cap
+        self.budget = budget
+        self.jitter = jitter
+
+    def retryable(self, status_code):
+        """
+        Check if a failed request should be retried.
+
+        Parameters
+        ----------
+        status_code : int or None
+            Response status code, or None if there was no response.
+
+        Returns
+        -------
+        bool
+            True if the failure is transient, False else.
+
+        """
+        return status_code in RETRYABLE
+
+    def delay(self, attempt):
+        """
+        Get delay before the next attempt.
+
+        Parameters
+        ----------
+        attempt : int
+            Number of the failed attempt, starting with 1.
+
+        Returns
+        -------
+        delay : float
+            Delay in seconds.
+
+        """
+        delay = min(self.cap, self.base * 2 ** (attempt - 1))
+        if self.jitter:
+            delay = random.uniform(0.0, delay)
+
+        return delay
+
+    def next_delay(self, attempt, status_code, elapsed):
+        """
+        Get delay before the next attempt, if the request should be retried.
+
+        Parameters
+        ----------
+        attempt : int
+            Number of the failed attempt, starting with 1.
+        status_code : int or None
+            Response status code, or None if there was no response.
+        elapsed : float
+            Seconds since the first attempt.
+
+        Returns
+        -------
+        delay : float or None
+            Delay in seconds, or None if the request should not be
+            retried.
+
+        """
+        if attempt >= self.attempts or not self.retryable(status_code):
+            return None
+        delay = self.delay(attempt)
+        if elapsed + delay > self.budget:
+            return None
+
+        return delay
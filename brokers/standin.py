@@ -0,0 +1,534 @@
+# -*- coding: utf-8 -*-
+"""The file contains the class definition of local Degiro stand-in."""
+
+import json
+import time
+import uuid
+import random
+import threading
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from brokers import urls
+
+# endpoint names by URL paths
+ENDPOINTS = {urlparse(url).path.rstrip('/'): name for name, url in [
+    ('login', urls.URL_DEGIRO_LOGIN),
+    ('logout', urls.URL_DEGIRO_LOGOUT),
+    ('client', urls.URL_DEGIRO_CLIENT),
+    ('update', urls.URL_DEGIRO_DATA),
+    ('config', urls.URL_DEGIRO_CONFIG),
+    ('checkOrder', urls.URL_DEGIRO_PLACE_ORDER),
+    ('order', urls.URL_DEGIRO_ORDER),
+    ('orders', urls.URL_DEGIRO_ORDERS),
+    ('search', urls.URL_DEGIRO_SEARCH)]}
+
+
+class DegiroStandin:
+    """
+    Class representation of a local Degiro stand-in.
+
+    The stand-in serves the endpoints listed in `brokers.urls` over HTTP
+    on a local port and keeps sessions, cash, portfolio, and orders in
+    memory. Use `urls` to get the keyword arguments for `Degiro`.
+
+    Latency is given in seconds, either for all endpoints or by endpoint
+    name (see `ENDPOINTS`). Errors are injected by endpoint name as
+    a tuple of rate and status code; status code None drops the
+    connection without response. Attributes `latency` and `errors` can be
+    changed while serving.
+    """
+
+    def __init__(self,
+                 host='127.0.0.1',
+                 port=0,
+                 user='user',
+                 password='password',
+                 account=1000001,
+                 cash=10000.0,
+                 products=None,
+                 positions=None,
+                 latency=0.0,
+                 errors=None,
+                 seed=None
+                 ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.account = account
+        self.cash = cash
+        self.lock = threading.Lock()
+        self.sessions = set()
+        self.confirmations = {}
+        self.orders = []
+        self.requests = []
+        self.products = []
+        for i, product in enumerate(products if products is not None
+                                    else default_products()):
+            for exchange_id in ['194', '195']:
+                self.products.append(
+                    dict(product,
+                         id='{}{}'.format(exchange_id, i),
+                         exchangeId=exchange_id))
+        self.positions = dict(positions) if positions else {}
+        # versions of changes for update tokens
+        self.version = 1
+        self.changes = {('cashFunds', 1): 1}
+        self.changes.update({('portfolio', product_id): 1
+                             for product_id in self.positions})
+        self.latency = latency
+        self.errors = dict(errors) if errors else {}
+        self.random = random.Random(seed)
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        """
+        Start serving in a background thread.
+
+        Returns
+        -------
+        self : DegiroStandin
+            The started stand-in.
+
+        """
+        handler = type('Handler', (StandinHandler,), {'standin': self})
+        self.server = ThreadingHTTPServer((self.host, self.port), handler)
+        self.server.daemon_threads = True
+        self.port = self.server.server_port
+        self.thread = threading.Thread(target=self.server.serve_forever,
+                                       name='standin',
+                                       daemon=True)
+        self.thread.start()
+
+        return self
+
+    def stop(self):
+        """
+        Stop serving.
+
+        Returns
+        -------
+        None.
+
+        """
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+
+        return None
+
+    def __enter__(self):
+        """Start the stand-in."""
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        """Stop the stand-in."""
+        self.stop()
+
+    def urls(self):
+        """
+        Get URLs of the stand-in.
+
+        Returns
+        -------
+        urls : dict
+            Keyword arguments with URLs for `Degiro` or `AsyncDegiro`.
+
+        """
+        base = 'http://{}:{}'.format(self.host, self.port)
+        return {key: base + urlparse(getattr(urls, name)).path
+                for key, name in [
+                    ('url_login', 'URL_DEGIRO_LOGIN'),
+                    ('url_config', 'URL_DEGIRO_CONFIG'),
+                    ('url_client', 'URL_DEGIRO_CLIENT'),
+                    ('url_data', 'URL_DEGIRO_DATA'),
+                    ('url_order', 'URL_DEGIRO_ORDER'),
+                    ('url_orders', 'URL_DEGIRO_ORDERS'),
+                    ('url_place_order', 'URL_DEGIRO_PLACE_ORDER'),
+                    ('url_search', 'URL_DEGIRO_SEARCH'),
+                    ('url_logout', 'URL_DEGIRO_LOGOUT')]}
+
+    def expire_sessions(self):
+        """
+        Expire all sessions, so the next requests are unauthorized.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            self.sessions.clear()
+
+        return None
+
+    def set_cash(self, cash):
+        """
+        Change amount of cash.
+
+        Parameters
+        ----------
+        cash : float
+            Amount of cash in EUR.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            self.version += 1
+            self.cash = cash
+            self.changes[('cashFunds', 1)] = self.version
+
+        return None
+
+    def set_position(self, product_id, size):
+        """
+        Change or remove (with size 0) a position.
+
+        Parameters
+        ----------
+        product_id : str
+            Product ID.
+        size : float
+            Size of position.
+
+        Returns
+        -------
+        None.
+
+        """
+        with self.lock:
+            self.version += 1
+            if size:
+                self.positions[product_id] = size
+            else:
+                self.positions.pop(product_id, None)
+            self.changes[('portfolio', product_id)] = self.version
+
+        return None
+
+    def items(self, data_type, token=0):
+        """
+        Build cash funds or portfolio as returned by the update endpoint.
+
+        Parameters
+        ----------
+        data_type : str
+            `cashFunds` or `portfolio`.
+        token : int, optional
+            Last update token. Only items changed after it are returned.
+            The default is 0 (all items).
+
+        Returns
+        -------
+        items : list
+            Changed items.
+
+        """
+        items = []
+        for (kind, item_id), version in self.changes.items():
+            if kind != data_type or version <= token:
+                continue
+            if data_type == 'cashFunds':
+                items.append({'id': item_id,
+                              'value': [{'name': 'id', 'value': item_id},
+                                        {'name': 'currencyCode',
+                                         'value': 'EUR'},
+                                        {'name': 'value',
+                                         'value': self.cash}]})
+            elif item_id not in self.positions:
+                if token:
+                    items.append({'id': item_id, 'isRemoved': True})
+            else:
+                size = self.positions[item_id]
+                items.append({'id': item_id,
+                              'value': [{'name': 'id', 'value': item_id},
+                                        {'name': 'positionType',
+                                         'value': 'PRODUCT'},
+                                        {'name': 'size', 'value': size},
+                                        {'name': 'price', 'value': 10.0},
+                                        {'name': 'value',
+                                         'value': size * 10.0},
+                                        {'name': 'breakEvenPrice',
+                                         'value': 9.5}]})
+
+        return items
+
+    def delay(self, name):
+        """
+        Get latency of an endpoint.
+
+        Parameters
+        ----------
+        name : str
+            Endpoint name.
+
+        Returns
+        -------
+        delay : float
+            Latency in seconds.
+
+        """
+        if isinstance(self.latency, dict):
+            return self.latency.get(name, 0.0)
+        return self.latency
+
+    def error(self, name):
+        """
+        Draw an injected error of an endpoint.
+
+        Parameters
+        ----------
+        name : str
+            Endpoint name.
+
+        Returns
+        -------
+        injected : bool
+            True if an error is injected, False else.
+        status : int or None
+            Status code of the error, None to drop the connection.
+
+        """
+        rate, status = self.errors.get(name, (0.0, None))
+        with self.lock:
+            injected = rate > 0.0 and self.random.random() < rate
+        return injected, status
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    """Request handler of the Degiro stand-in."""
+
+    standin = None
+    protocol_version = 'HTTP/1.1'
+    # headers and body are written separately
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        """Suppress access logs."""
+        return None
+
+    def do_GET(self):
+        """Handle GET request."""
+        self.dispatch('GET')
+
+    def do_POST(self):
+        """Handle POST request."""
+        self.dispatch('POST')
+
+    def do_DELETE(self):
+        """Handle DELETE request."""
+        self.dispatch('DELETE')
+
+    def dispatch(self, method):
+        """Route a request to the endpoint."""
+        standin = self.standin
+        parsed = urlparse(self.path)
+        path, matrix = parsed.path, parsed.params
+        query = {key: values[-1] for key, values in
+                 parse_qs(parsed.query).items()}
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+
+        # find endpoint by the longest matching path
+        endpoint, argument = None, ''
+        for endpoint_path, name in ENDPOINTS.items():
+            if path == endpoint_path or path.startswith(endpoint_path + '/'):
+                if endpoint is None or len(endpoint_path) > len(endpoint[0]):
+                    endpoint = (endpoint_path, name)
+                    argument = path[len(endpoint_path):].strip('/')
+        if endpoint is None:
+            return self.reply(404, {})
+        name = endpoint[1]
+        with standin.lock:
+            standin.requests.append((method, name))
+
+        # simulate network and broker
+        delay = standin.delay(name)
+        if delay:
+            time.sleep(delay)
+        injected, status = standin.error(name)
+        if injected:
+            if status is None:
+                self.close_connection = True
+                return None
+            return self.reply(status, {})
+
+        if name == 'login':
+            return self.login(body)
+
+        # check session
+        session_id = query.get('sessionId') \
+            or matrix.replace('jsessionid=', '') \
+            or self.cookie('JSESSIONID')
+        if session_id not in standin.sessions:
+            return self.reply(401, {})
+
+        if name == 'logout':
+            with standin.lock:
+                standin.sessions.discard(session_id)
+            return self.reply(200, {})
+        if name == 'config':
+            return self.reply(200, {'data': {'sessionId': session_id}})
+        if name == 'client':
+            return self.reply(200, {'data': {'intAccount': standin.account}})
+        if name == 'update':
+            return self.update(query)
+        if name == 'search':
+            return self.search(query)
+        if name == 'checkOrder':
+            return self.check_order(body)
+        if name == 'order':
+            return self.order(method, argument)
+        if name == 'orders':
+            return self.reply(200, {'data': standin.orders})
+
+        return self.reply(404, {})
+
+    def cookie(self, name):
+        """Get a cookie value."""
+        for item in self.headers.get('Cookie', '').split(';'):
+            key, _, value = item.strip().partition('=')
+            if key == name:
+                return value
+        return ''
+
+    def reply(self, status, content):
+        """Send a JSON response."""
+        data = json.dumps(content).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def login(self, body):
+        """Handle login."""
+        standin = self.standin
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self.reply(400, {})
+        if payload.get('username') != standin.user \
+                or payload.get('password') != standin.password:
+            return self.reply(400, {'status': 3,
+                                    'statusText': 'badCredentials'})
+        session_id = uuid.uuid4().hex.upper()
+        with standin.lock:
+            standin.sessions.add(session_id)
+        return self.reply(200, {'status': 0, 'sessionId': session_id})
+
+    def update(self, query):
+        """Handle update of cash funds and portfolio."""
+        standin = self.standin
+        content = {}
+        with standin.lock:
+            for data_type in ['cashFunds', 'portfolio']:
+                if data_type not in query:
+                    continue
+                try:
+                    token = int(query[data_type])
+                except ValueError:
+                    return self.reply(400, {})
+                # unknown token
+                if token > standin.version:
+                    return self.reply(400, {})
+                content[data_type] = {
+                    'lastUpdated': standin.version,
+                    'value': standin.items(data_type, token)}
+        return self.reply(200, content)
+
+    def search(self, query):
+        """Handle product lookup."""
+        text = query.get('searchText', '').lower()
+        products = [product for product in self.standin.products
+                    if text in [product['isin'].lower(),
+                                product['symbol'].lower()]
+                    or text in product['name'].lower()]
+        limit = query.get('limit')
+        if limit:
+            products = products[:int(limit)]
+        return self.reply(200, {'offset': 0, 'products': products})
+
+    def check_order(self, body):
+        """Handle order check."""
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            return self.reply(400, {})
+        if payload.get('buySell') not in ['BUY', 'SELL'] \
+                or not payload.get('size') \
+                or not payload.get('productId'):
+            return self.reply(400, {'errors': [{'text': 'Invalid order.'}]})
+        confirmation_id = uuid.uuid4().hex
+        with self.standin.lock:
+            self.standin.confirmations[confirmation_id] = payload
+        return self.reply(200, {'data': {
+            'confirmationId': confirmation_id,
+            'transactionFees': [{'id': 2, 'amount': 2.0,
+                                 'currency': 'EUR'}]}})
+
+    def order(self, method, argument):
+        """Handle order confirmation or cancellation."""
+        standin = self.standin
+        with standin.lock:
+            if method == 'POST':
+                payload = standin.confirmations.pop(argument, None)
+                if payload is None:
+                    return self.reply(400, {})
+                order_id = uuid.uuid4().hex
+                standin.orders.append(dict(payload,
+                                           orderId=order_id,
+                                           isActive=True))
+                return self.reply(200, {'data': {'orderId': order_id}})
+            if method == 'DELETE':
+                for order in standin.orders:
+                    if order['orderId'] == argument and order['isActive']:
+                        order['isActive'] = False
+                        return self.reply(200, {})
+        return self.reply(400, {})
+
+
+def default_products(count=100):
+    """
+    Generate default products of the stand-in.
+
+    Parameters
+    ----------
+    count : int, optional
+        Number of products. The default is 100.
+
+    Returns
+    -------
+    products : list
+        Products with keys `isin`, `symbol`, and `name`.
+
+    """
+    return [{'isin': 'DE{:010d}'.format(i),
+             'symbol': 'SYM{}'.format(i),
+             'name': 'Product {}'.format(i)}
+            for i in range(count)]
+
+
+def default_positions(count, size=100.0):
+    """
+    Generate positions in the first default products on XETRA.
+
+    Parameters
+    ----------
+    count : int
+        Number of positions.
+    size : float, optional
+        Size of each position. The default is 100.0.
+
+    Returns
+    -------
+    positions : dict
+        Sizes by product ID.
+
+    """
+    return {'194{}'.format(i): size for i in range(count)}
@@ -11,7 +11,7 @@ currentdir = os.path.dirname(
 parentdir = os.path.dirname(currentdir)
 sys.path.insert(0, parentdir)
 
-from autotrader.setup_logger import logger
+from autotrader.setup_logger import log, logger
 from autotrader.infrastructure import TradingServer
 
 PATH_SETTINGS = '/var/www/flask/autotrader/settings.cfg'
@@ -29,6 +29,10 @@ try:
     BROKER_USER = config.get('DEGIRO', 'USER')
     BROKER_PASSWORD = config.get('DEGIRO', 'PASSWORD')
 
+    # optional log levels by module, e.g. degiro = WARNING
+    if config.has_section('LOGGING'):
+        log.set_levels(dict(config.items('LOGGING')))
+
 except Exception as e:
     logger.critical(e)
     sys.exit(-1)
@@ -37,6 +37,8 @@ try:
     LISTENER_PASSWORD = config.get('LISTENER', 'PASSWORD')
 
     TIME_PLAN = config.get('TIMING', 'PLAN').replace('\n', '').split(',')
+    # keep running across days
+    DAEMON = config.getboolean('TIMING', 'DAEMON', fallback=False)
 
 except Exception as e:
     logger.critical(e)
@@ -44,7 +46,8 @@ except Exception as e:
 
 
 def wikifolio_notifier(host, port, listener_password, time_plan,
-                       recipient, relay, relay_user, relay_password):
+                       recipient, relay, relay_user, relay_password,
+                       daemon=False):
     """
     Set a wikifolio notifier according to the time plan.
 
@@ -56,6 +59,8 @@ def wikifolio_notifier(host, port, listener_password, time_plan,
         Port which is being used by the Listener object.
     listener_password : str
         Authentication key.
+    daemon : bool, optional
+        Run on every trading day in one process. The default is False.
 
     Returns
     -------
@@ -74,6 +79,16 @@ def wikifolio_notifier(host, port, listener_password, time_plan,
     # create scheduler
     sdl = Scheduler(host, port, listener_password)
 
+    # run scheduler on every trading day
+    if daemon:
+        sdl.run_daemon(time_plan, wfm.notify,
+                       recipient=recipient,
+                       relay=relay,
+                       relay_user=relay_user,
+                       relay_password=relay_password,
+                       host=host, port=port, password=listener_password)
+        return None
+
     # create time plan
     sdl.create_time_plan(time_plan)
 
@@ -88,4 +103,5 @@ def wikifolio_notifier(host, port, listener_password, time_plan,
 
 if __name__ == "__main__":
     wikifolio_notifier(HOST, PORT, LISTENER_PASSWORD, TIME_PLAN,
-                       RECIPIENT, RELAY, RELAY_USER, RELAY_PASSWORD)
+                       RECIPIENT, RELAY, RELAY_USER, RELAY_PASSWORD,
+                       daemon=DAEMON)
@@ -0,0 +1,9 @@
+# -*- coding: utf-8 -*-
+"""Configuration of tests."""
+
+import os
+import sys
+
+# make the packages importable without installation
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
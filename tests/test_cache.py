@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""Tests of the product cache."""
+
+import time
+from brokers.cache import ProductCache
+
+FOUND = {'XET': '1941'}
+
+
+def test_negative_results_expire_first(tmp_path):
+    cache = ProductCache(str(tmp_path / 'products.db'), ttl=3600,
+                         negative_ttl=0.05)
+    cache.set('isin|de0000000001|XET', FOUND)
+    cache.set('isin|xx0000000000|XET', None)
+    assert cache.get('isin|xx0000000000|XET') == (True, None)
+
+    time.sleep(0.1)
+    assert cache.get('isin|de0000000001|XET') == (True, FOUND)
+    assert cache.get('isin|xx0000000000|XET') == (False, None)
+
+
+def test_found_results_expire(tmp_path):
+    cache = ProductCache(str(tmp_path / 'products.db'), ttl=0.05)
+    cache.set('isin|de0000000001|XET', FOUND)
+    time.sleep(0.1)
+    assert cache.get('isin|de0000000001|XET') == (False, None)
+
+    # expired entries are removed from the file as well
+    cache.evict()
+    assert cache.connection.execute(
+        'SELECT COUNT(*) FROM products').fetchone()[0] == 0
+
+
+def test_least_recently_used_leave_memory_only(tmp_path):
+    file_name = str(tmp_path / 'products.db')
+    cache = ProductCache(file_name, size=2)
+    cache.set('a', {'XET': '1'})
+    cache.set('b', {'XET': '2'})
+    cache.get('a')
+    cache.set('c', {'XET': '3'})
+    assert list(cache.memory) == ['a', 'c']
+
+    # evicted entry is read from the file, and survives a restart
+    assert cache.get('b') == (True, {'XET': '2'})
+    assert list(cache.memory) == ['c', 'b']
+    assert ProductCache(file_name).get('a') == (True, {'XET': '1'})
+
+
+def test_missing_directory_falls_back_to_memory(tmp_path):
+    cache = ProductCache(str(tmp_path / 'missing' / 'products.db'))
+    cache.set('a', FOUND)
+    assert cache.get('a') == (True, FOUND)
+    cache.memory.clear()
+    assert cache.get('a') == (True, FOUND)
@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""Tests of the Degiro client against the local stand-in."""
+
+import asyncio
+import pytest
+from brokers.deadline import Deadline, DeadlineExceeded
+from brokers.degiro import Degiro
+from brokers.degiro_async import AsyncDegiro
+from brokers.cache import ProductCache
+from brokers.retry import RetryPolicy
+from brokers.standin import DegiroStandin
+from autotrader.metrics import Registry
+
+
+def test_update_across_relogin_keeps_cash_funds():
+    with DegiroStandin(cash=10000.0) as standin:
+        degiro = Degiro(product_cache=ProductCache(':memory:'),
+                        **standin.urls())
+        degiro.login(standin.user, standin.password)
+        degiro.get_config()
+        degiro.get_user_info()
+        degiro.get_data('cashFunds')
+        assert degiro.capital == {'EUR': 10000.0}
+
+        # change other data, so the delta of cash funds is empty
+        standin.set_position('1940', 10.0)
+        standin.expire_sessions()
+        degiro.get_data('cashFunds')
+
+        assert ('POST', 'login') in standin.requests[4:]
+        assert degiro.capital == {'EUR': 10000.0}
+
+
+def test_async_update_across_relogin_keeps_cash_funds():
+    async def run(standin):
+        async with AsyncDegiro(product_cache=ProductCache(':memory:'),
+                               **standin.urls()) as degiro:
+            await degiro.login(standin.user, standin.password)
+            await degiro.get_config()
+            await degiro.get_user_info()
+            await degiro.get_data('cashFunds')
+            assert degiro.capital == {'EUR': 10000.0}
+
+            standin.set_position('1940', 10.0)
+            standin.expire_sessions()
+            await degiro.get_data('cashFunds')
+
+            assert degiro.capital == {'EUR': 10000.0}
+
+    with DegiroStandin(cash=10000.0) as standin:
+        asyncio.run(run(standin))
+
+
+def test_deadline_fails_connect_and_lookup():
+    with DegiroStandin(latency={'update': 0.3}) as standin:
+        degiro = Degiro(product_cache=ProductCache(':memory:'),
+                        **standin.urls())
+        degiro.deadline = Deadline(0.2)
+        with pytest.raises(DeadlineExceeded):
+            degiro.connect(standin.user, standin.password)
+
+    with DegiroStandin(latency={'search': 0.3}) as standin:
+        degiro = Degiro(product_cache=ProductCache(':memory:'),
+                        **standin.urls())
+        degiro.connect(standin.user, standin.password)
+        degiro.deadline = Deadline(0.2)
+        with pytest.raises(DeadlineExceeded):
+            degiro.search_product_ids(['DE0000000001'])
+
+
+def test_async_deadline_fails_connect_and_lookup():
+    async def connect(standin):
+        async with AsyncDegiro(product_cache=ProductCache(':memory:'),
+                               **standin.urls()) as degiro:
+            degiro.deadline = Deadline(0.2)
+            with pytest.raises(DeadlineExceeded):
+                await degiro.connect(standin.user, standin.password)
+
+    async def lookup(standin):
+        async with AsyncDegiro(product_cache=ProductCache(':memory:'),
+                               **standin.urls()) as degiro:
+            await degiro.connect(standin.user, standin.password)
+            degiro.deadline = Deadline(0.2)
+            with pytest.raises(DeadlineExceeded):
+                await degiro.search_product_ids(['DE0000000001'])
+
+    with DegiroStandin(latency={'update': 0.3}) as standin:
+        asyncio.run(connect(standin))
+    with DegiroStandin(latency={'search': 0.3}) as standin:
+        asyncio.run(lookup(standin))
+
+
+def test_async_session_against_standin():
+    async def run(standin):
+        async with AsyncDegiro(product_cache=ProductCache(':memory:'),
+                               retry_policy=RetryPolicy(base=0.01,
+                                                        jitter=False),
+                               **standin.urls()) as degiro:
+            # login and account state
+            await degiro.connect(standin.user, standin.password)
+            assert degiro.signedup
+            assert degiro.client['intAccount'] == standin.account
+            assert degiro.capital == {'EUR': 10000.0}
+
+            # product lookup
+            found, errors = await degiro.search_product_ids(
+                ['DE0000000001', 'XX0000000000'], exchange='XET')
+            assert found == {'DE0000000001': {'XET': '1941'}}
+            assert list(errors) == ['XX0000000000']
+
+            # check fails once with 503 and is retried, then confirmed
+            standin.errors = {'checkOrder': (0.5, 503)}
+            results = [result async for result in degiro.place_orders([
+                {'buy_sell': 'BUY', 'product_id': '1941', 'size': 10,
+                 'limit': 10.0, 'stop_loss': None, 'order_type': 0,
+                 'validity': 3}])]
+            standin.errors = {}
+            assert len(results) == 1
+            result = results[0]
+            assert result['error'] is None
+            assert result['attempts'] == 2
+            assert result['fees'] == {'EUR': 2.0}
+            assert degiro.retry_stats['retries'] == 1
+            assert standin.orders[0]['orderId'] == result['order_id']
+            assert standin.orders[0]['isActive']
+
+            # cancel after the session expired logs in again
+            standin.expire_sessions()
+            await degiro.cancel_order(result['order_id'])
+            assert standin.requests.count(('POST', 'login')) == 2
+            assert not standin.orders[0]['isActive']
+
+    # the first error draw of seed 1 injects, the second does not
+    with DegiroStandin(cash=10000.0, seed=1) as standin:
+        asyncio.run(run(standin))
+
+
+def test_sent_bytes_of_form_posts_match():
+    order = {'buy_sell': 'BUY', 'product_id': '1941', 'size': 10,
+             'limit': 10.0, 'stop_loss': None, 'order_type': 0,
+             'validity': 3}
+
+    async def run(standin, registry):
+        async with AsyncDegiro(product_cache=ProductCache(':memory:'),
+                               metrics=registry,
+                               **standin.urls()) as degiro:
+            await degiro.connect(standin.user, standin.password)
+            result = await degiro.place_order(**order)
+            await degiro.cancel_order(result['order_id'])
+
+    with DegiroStandin() as standin:
+        registry = Registry()
+        degiro = Degiro(product_cache=ProductCache(':memory:'),
+                        metrics=registry, **standin.urls())
+        degiro.connect(standin.user, standin.password)
+        degiro.cancel_order(degiro.place_order(**order)['order_id'])
+        async_registry = Registry()
+        asyncio.run(run(standin, async_registry))
+
+    sent = [registry.counter('degiro_request_bytes_total', '',
+                             ('endpoint', 'direction'))
+            .get(endpoint='cancel', direction='sent')
+            for registry in (registry, async_registry)]
+    assert sent[0] > 0
+    assert sent[0] == sent[1]
@@ -0,0 +1,64 @@
+# -*- coding: utf-8 -*-
+"""Tests of exchange holiday calendar."""
+
+import datetime
+from autotrader.holidays import HolidayCalendar, default_holidays
+
+
+def test_lookup_never_fetches():
+    year = datetime.date.today().year
+    calendar = HolidayCalendar(file_name=None)
+
+    def fetch(year):
+        raise AssertionError('Lookup fetched the exchange calendar.')
+
+    calendar.fetch = fetch
+    assert calendar.holidays(year) == default_holidays(year)
+    assert calendar.closed(datetime.date(year, 1, 1))
+
+
+def test_refresh_persists_and_falls_back(tmp_path):
+    year = datetime.date.today().year
+    file_name = str(tmp_path / 'holidays.json')
+    holidays = default_holidays(year) | {datetime.date(year, 6, 3)}
+
+    calendar = HolidayCalendar(file_name)
+    calendar.fetch = lambda year: holidays
+    assert calendar.refresh()
+    assert calendar.version == 1
+    # fetched once per year
+    assert not calendar.refresh()
+
+    # site is unreachable, persisted holidays of the year are used
+    calendar = HolidayCalendar(file_name)
+
+    def fetch(year):
+        raise OSError('Network is unreachable')
+
+    calendar.fetch = fetch
+    assert not calendar.refresh()
+    assert calendar.holidays(year) == holidays
+
+
+def test_background_refresh():
+    year = datetime.date.today().year
+    calendar = HolidayCalendar(file_name=None, retry=0.01)
+    answers = [OSError('Network is unreachable'), default_holidays(year)]
+
+    def fetch(year):
+        answer = answers[0] if len(answers) == 1 else answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    calendar.fetch = fetch
+    calendar.start()
+    try:
+        for i in range(500):
+            if year in calendar.fetched:
+                break
+            calendar.stopped.wait(0.01)
+    finally:
+        calendar.stop()
+    assert year in calendar.fetched
+    assert calendar.version == 1
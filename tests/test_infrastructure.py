@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""Tests of trading server."""
+
+import time
+import threading
+from contextlib import contextmanager
+from autotrader.infrastructure import TradingServer, TradingClient
+
+MESSAGE = {'from': 'test',
+           'to': 'degiro',
+           'data': [{'isin': 'DE0000000001',
+                     'transaction': 'BUY',
+                     'price': 10.0,
+                     'size': 0.1}]}
+
+
+def message(i):
+    """Trading info, which is no duplicate of others."""
+    return dict(MESSAGE, data=[dict(MESSAGE['data'][0], price=10.0 + i)])
+
+
+@contextmanager
+def running(tmp_path, **kwargs):
+    """Run a trading server without trade workers in a thread."""
+    server = TradingServer(port=0, password='secret', workers=0,
+                           trace_file=str(tmp_path / 'traces.jsonl'),
+                           journal_file=None, **kwargs)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        TradingClient(port=server.port, password='secret').stop_server()
+        thread.join(10.0)
+    assert not thread.is_alive()
+
+
+def test_expired_job_does_not_keep_dedup_keys(tmp_path):
+    server = TradingServer(port=0, trade_timeout=0.0,
+                           trace_file=str(tmp_path / 'traces.jsonl'),
+                           journal_file=None)
+    try:
+        assert server.submit(MESSAGE) == 'accepted'
+        server.jobs.put(None)
+        server.work()
+
+        # trading data did not reach the broker, a resend is traded
+        assert server.submit(MESSAGE) == 'accepted'
+        message, keys, deadline, trace = server.jobs.get_nowait()
+        assert message == MESSAGE
+        assert len(keys) == 1
+    finally:
+        server.listener.close()
+
+
+def test_full_queue_rejects_trading_info(tmp_path):
+    with running(tmp_path, queue_size=2) as server:
+        client = TradingClient(port=server.port, password='secret')
+        replies = [client.submit(message(i)) for i in range(3)]
+        client.close()
+
+    assert replies == ['accepted', 'accepted', 'rejected']
+    assert server.jobs.qsize() == 2
+
+
+def test_idle_connection_is_closed_and_client_reconnects(tmp_path):
+    with running(tmp_path, idle_timeout=1.0) as server:
+        client = TradingClient(port=server.port, password='secret',
+                               reconnect=True)
+        assert client.submit(message(0)) == 'accepted'
+        first = client.connection
+
+        # closed by the server after the idle timeout
+        deadline = time.monotonic() + 5.0
+        while client.alive() and time.monotonic() < deadline:
+            time.sleep(0.1)
+        assert not client.alive()
+
+        # sent over a new connection
+        assert client.submit(message(1)) == 'accepted'
+        assert client.connection is not first
+        assert server.jobs.qsize() == 2
+        client.close()
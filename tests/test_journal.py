@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""Tests of the order journal."""
+
+import asyncio
+from brokers.cache import ProductCache
+from brokers.degiro import Degiro
+from brokers.degiro_async import AsyncDegiro
+from brokers.journal import Journal, JournalReader
+from brokers.standin import DegiroStandin
+
+ORDER = {'buy_sell': 'BUY', 'product_id': '1941', 'size': 10, 'limit': 10.0,
+         'stop_loss': None, 'order_type': 0, 'validity': 3}
+
+
+def test_intents_are_durable_before_orders_are_sent(tmp_path):
+    file_name = str(tmp_path / 'orders.jsonl')
+    # the writer waits before each batch, so only commits make it durable
+    journal = Journal(file_name, delay=0.5)
+    try:
+        with DegiroStandin() as standin:
+            degiro = Degiro(product_cache=ProductCache(':memory:'),
+                            journal=journal, **standin.urls())
+            degiro.connect(standin.user, standin.password)
+
+            # journal as read by another process at the first check
+            seen = []
+            send_check_order = degiro._send_check_order
+
+            def check_order(payload):
+                seen.append([entry['event']
+                             for entry in JournalReader(file_name).query()])
+                return send_check_order(payload)
+
+            degiro._send_check_order = check_order
+            results = list(degiro.place_orders([ORDER, ORDER]))
+
+        assert seen[0] == ['intent', 'intent']
+        assert all(result['order_id'] for result in results)
+
+        # the process may crash now, the batch is on disk
+        events = [entry['event']
+                  for entry in JournalReader(file_name).query()]
+        assert sorted(events) == ['check', 'check', 'confirm', 'confirm',
+                                  'intent', 'intent']
+    finally:
+        journal.close()
+
+
+def test_async_batch_is_durable_when_it_ends(tmp_path):
+    async def run(standin, journal):
+        async with AsyncDegiro(product_cache=ProductCache(':memory:'),
+                               journal=journal, **standin.urls()) as degiro:
+            await degiro.connect(standin.user, standin.password)
+            return [result async for result in degiro.place_orders([ORDER])]
+
+    file_name = str(tmp_path / 'orders.jsonl')
+    journal = Journal(file_name, delay=0.5)
+    try:
+        with DegiroStandin() as standin:
+            results = asyncio.run(run(standin, journal))
+
+        assert results[0]['order_id']
+        events = [entry['event']
+                  for entry in JournalReader(file_name).query()]
+        assert events == ['intent', 'check', 'confirm']
+    finally:
+        journal.close()
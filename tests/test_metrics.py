@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+"""Tests of metrics."""
+
+import os
+import threading
+from autotrader.metrics import Registry
+
+
+def test_concurrent_writes_do_not_collide(tmp_path):
+    registry = Registry()
+    counter = registry.counter('test_total', 'Test counter.')
+    counter.inc()
+    file_name = str(tmp_path / 'autotrader.prom')
+    errors = []
+
+    def write():
+        try:
+            for i in range(50):
+                registry.write(file_name)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=write) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert not errors
+    assert os.listdir(str(tmp_path)) == ['autotrader.prom']
+    with open(file_name) as file:
+        assert 'test_total 1' in file.read()
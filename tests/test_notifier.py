@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+"""Tests of the email notifier against the local SMTP stand-in."""
+
+from autotrader.notifier import Notifier
+from autotrader.smtp_standin import SMTPStandin
+
+
+def notifier(standin, delay=0.05):
+    return Notifier('127.0.0.1', 'user', 'password', port=standin.port,
+                    starttls=False, delay=delay)
+
+
+def test_connection_is_reused():
+    with SMTPStandin() as standin:
+        sender = notifier(standin)
+        for i in range(3):
+            sender.send('Subject {}'.format(i), 'Body', 'a@example.com')
+            assert sender.flush(5.0)
+        sender.close()
+
+        assert len(standin.messages) == 3
+        assert standin.connections == 1
+        assert standin.logins == 1
+
+
+def test_burst_is_sent_as_digest():
+    with SMTPStandin() as standin:
+        sender = notifier(standin, delay=0.5)
+        for i in range(5):
+            sender.send('Subject {}'.format(i), 'Body {}'.format(i),
+                        'a@example.com')
+        sender.send('Other', 'Body', 'b@example.com')
+        assert sender.flush(5.0)
+        sender.close()
+
+        by_recipient = {tuple(recipients): data
+                        for _, recipients, data in standin.messages}
+        assert len(standin.messages) == 2
+        assert 'Subject: Digest of 5 notifications' \
+            in by_recipient[('a@example.com',)]
+        assert 'Body 4' in by_recipient[('a@example.com',)]
+        assert 'Subject: Other' in by_recipient[('b@example.com',)]
+
+
+def test_dropped_connection_is_reopened():
+    with SMTPStandin() as standin:
+        sender = notifier(standin)
+        sender.send('First', 'Body', 'a@example.com')
+        assert sender.flush(5.0)
+
+        standin.drop_connections()
+        sender.send('Second', 'Body', 'a@example.com')
+        assert sender.flush(5.0)
+        sender.close()
+
+        assert [data.count('Subject: First') + data.count('Subject: Second')
+                for _, _, data in standin.messages] == [1, 1]
+        assert standin.connections == 2
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""Tests of batch order placement."""
+
+import time
+from brokers.cache import ProductCache
+from brokers.degiro import Degiro
+from brokers.standin import DegiroStandin
+
+
+def test_orders_are_checked_and_confirmed_concurrently():
+    orders = [{'buy_sell': 'BUY', 'product_id': '194{}'.format(i),
+               'size': 10, 'limit': 10.0, 'stop_loss': None,
+               'order_type': 0, 'validity': 3} for i in range(8)]
+    with DegiroStandin(latency={'checkOrder': 0.2, 'order': 0.2}) \
+            as standin:
+        degiro = Degiro(product_cache=ProductCache(':memory:'), workers=8,
+                        **standin.urls())
+        degiro.connect(standin.user, standin.password)
+        started = time.perf_counter()
+        results = list(degiro.place_orders(orders))
+        elapsed = time.perf_counter() - started
+
+    # two round trips instead of sixteen
+    assert elapsed < 1.6
+    assert sorted(result['order']['product_id'] for result in results) \
+        == sorted(order['product_id'] for order in orders)
+    assert all(result['order_id'] and result['confirmation_id']
+               and result['fees'] == {'EUR': 2.0} for result in results)
+    assert len(standin.orders) == 8
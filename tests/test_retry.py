@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+"""Tests of the retry policy."""
+
+from brokers.cache import ProductCache
+from brokers.degiro import Degiro
+from brokers.retry import RetryPolicy
+from brokers.standin import DegiroStandin
+
+ORDER = {'buy_sell': 'BUY', 'product_id': '1941', 'size': 10, 'limit': 10.0,
+         'stop_loss': None, 'order_type': 0, 'validity': 3}
+
+
+def test_backoff_is_bounded():
+    policy = RetryPolicy(base=1.0, cap=5.0, jitter=False)
+    assert [policy.delay(attempt) for attempt in range(1, 6)] \
+        == [1.0, 2.0, 4.0, 5.0, 5.0]
+
+    policy = RetryPolicy(base=1.0, cap=5.0)
+    for attempt in range(1, 6):
+        for i in range(100):
+            assert 0.0 <= policy.delay(attempt) <= min(5.0, 2 ** (attempt - 1))
+
+
+def test_only_transient_errors_are_retried():
+    policy = RetryPolicy(jitter=False)
+    for status in (None, 429, 500, 503):
+        assert policy.next_delay(1, status, 0.0) == 1.0
+    for status in (200, 400, 401, 404):
+        assert policy.next_delay(1, status, 0.0) is None
+
+
+def test_retries_stop_at_attempts_and_budget():
+    policy = RetryPolicy(attempts=3, base=1.0, budget=10.0, jitter=False)
+    assert policy.next_delay(2, 503, 0.0) == 2.0
+    assert policy.next_delay(3, 503, 0.0) is None
+    # next attempt would start after the budget
+    assert policy.next_delay(2, 503, 8.5) is None
+
+
+def test_exhausted_checks_are_counted():
+    with DegiroStandin(errors={'checkOrder': (1.0, 503)}) as standin:
+        degiro = Degiro(product_cache=ProductCache(':memory:'),
+                        retry_policy=RetryPolicy(attempts=3, base=0.01,
+                                                 jitter=False),
+                        **standin.urls())
+        degiro.connect(standin.user, standin.password)
+        result, = degiro.place_orders([ORDER])
+        assert result['attempts'] == 3
+        assert result['error'] == 'Response status code: 503'
+        assert degiro.retry_stats['retries'] == 2
+        assert degiro.retry_stats['exhausted'] == 1
+
+        # rejected checks are not retried
+        standin.errors = {'checkOrder': (1.0, 400)}
+        result, = degiro.place_orders([ORDER])
+        assert result['attempts'] == 1
+        assert degiro.retry_stats['exhausted'] == 1
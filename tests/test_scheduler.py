@@ -0,0 +1,85 @@
+# -*- coding: utf-8 -*-
+"""Tests of the scheduler daemon and its job store."""
+
+import os
+import time
+import signal
+import datetime
+import pytest
+from apscheduler.schedulers.background import BackgroundScheduler
+from autotrader import scheduler
+from autotrader.holidays import HolidayCalendar
+from autotrader.jobstore import JobStore
+from autotrader.sessions import TradingSessions
+from autotrader.timeplan import TimePlan
+
+# a Monday, which is no holiday
+DAY = datetime.date(2030, 6, 3)
+
+
+def task():
+    pass
+
+
+@pytest.fixture
+def local_time(monkeypatch):
+    # time plans are in local time of the system
+    monkeypatch.setenv('TZ', 'Europe/Berlin')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+def state(store, slot):
+    return store.connection.execute('SELECT state FROM slots WHERE slot = ?',
+                                    (slot.isoformat(),)).fetchone()[0]
+
+
+def test_missing_directory_falls_back_to_memory(tmp_path):
+    store = JobStore(str(tmp_path / 'missing' / 'jobs.sqlite'))
+    slot = datetime.datetime.combine(DAY, datetime.time(10))
+    assert store.add(slot, slot) == ('scheduled', slot, True)
+    store.close()
+
+
+def test_resume_after_restart(tmp_path, monkeypatch, local_time):
+    calendar = HolidayCalendar(file_name=None)
+    monkeypatch.setattr(scheduler, 'sessions',
+                        TradingSessions(calendars={'XET': calendar}))
+    plan = TimePlan('10-12', calendar=calendar)
+    slots = [datetime.datetime.combine(DAY, datetime.time(hour))
+             for hour in (10, 11, 12)]
+
+    # state before the restart: the first slot was submitted, the second
+    # is overdue beyond the grace time
+    store = JobStore(str(tmp_path / 'jobs.sqlite'))
+    store.add(slots[0], slots[0])
+    store.update(slots[0].isoformat(), 'running')
+    store.add(slots[1], slots[1])
+
+    daemon = scheduler.Scheduler('localhost', 6000, '')
+    daemon.store = store
+    daemon.scheduler = BackgroundScheduler()
+    now = datetime.datetime.combine(DAY, datetime.time(11, 30))
+    run_dates = daemon.schedule_day(plan, DAY, task, {}, now=now)
+
+    assert [job.id for job in daemon.scheduler.get_jobs()] \
+        == [slots[2].isoformat()]
+    assert len(run_dates) == 1 and run_dates[0] >= slots[2]
+    assert state(store, slots[0]) == 'running'
+    assert state(store, slots[1]) == 'missed'
+    assert state(store, slots[2]) == 'scheduled'
+    store.close()
+
+
+def test_terminating_restores_previous_handler():
+    previous = signal.getsignal(signal.SIGTERM)
+    with pytest.raises(SystemExit) as info:
+        with scheduler.terminating():
+            assert signal.getsignal(signal.SIGTERM) is not previous
+            os.kill(os.getpid(), signal.SIGTERM)
+            # handler runs at the next bytecode boundary
+            time.sleep(1.0)
+    assert info.value.code == 128 + signal.SIGTERM
+    assert signal.getsignal(signal.SIGTERM) is previous
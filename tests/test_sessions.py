@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+"""Tests of trading sessions."""
+
+import datetime
+from autotrader.holidays import HolidayCalendar, default_holidays
+from autotrader.sessions import TradingSessions
+
+
+def test_table_is_rebuilt_after_calendar_fetch():
+    year = datetime.date.today().year
+    # a weekday, which is no regular holiday
+    holiday = datetime.date(year, 6, 1)
+    while holiday.weekday() > 4 or holiday in default_holidays(year):
+        holiday += datetime.timedelta(days=1)
+    noon = datetime.datetime.combine(holiday, datetime.time(12),
+                                     datetime.timezone.utc)
+
+    calendar = HolidayCalendar(file_name=None)
+    answers = [OSError('Network is unreachable'),
+               default_holidays(year) | {holiday}]
+
+    def fetch(year):
+        answer = answers.pop(0)
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    calendar.fetch = fetch
+    sessions = TradingSessions(calendars={'XET': calendar})
+
+    # failed fetch, regular holidays
+    assert not calendar.refresh()
+    assert sessions.is_open('XET', noon)
+    # fetched holidays replace the regular ones
+    assert calendar.refresh()
+    assert not sessions.is_open('XET', noon)
+    assert not answers
+
+
+def test_lookup_does_not_fetch_calendar():
+    calendar = HolidayCalendar(file_name=None)
+
+    def fetch(year):
+        raise AssertionError('Lookup fetched the exchange calendar.')
+
+    calendar.fetch = fetch
+    sessions = TradingSessions(calendars={'XET': calendar})
+    # a weekday of the current year, which is no regular holiday
+    year = datetime.date.today().year
+    day = datetime.date(year, 6, 1)
+    while day.weekday() > 4 or day in default_holidays(year):
+        day += datetime.timedelta(days=1)
+    noon = datetime.datetime.combine(day, datetime.time(12),
+                                     datetime.timezone.utc)
+    assert sessions.is_open('XET', noon)
+    assert sessions.trading_day('XET', day)
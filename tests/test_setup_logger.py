@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+"""Tests of the logger."""
+
+import sys
+import queue
+import logging
+from autotrader.setup_logger import LogQueueHandler
+
+
+def test_record_is_merged_in_the_calling_thread():
+    records = queue.SimpleQueue()
+    handler = LogQueueHandler(records)
+    orders = ['BUY']
+    try:
+        raise ValueError('Wrong order.')
+    except ValueError:
+        record = logging.LogRecord('test', logging.ERROR, __file__, 1,
+                                   'Orders: %s', (orders,), sys.exc_info())
+    handler.handle(record)
+    orders.append('SELL')
+
+    queued = records.get_nowait()
+    assert queued.getMessage() == "Orders: ['BUY']"
+    assert queued.args is None
+    assert queued.exc_info is None
+    assert 'ValueError: Wrong order.' in queued.exc_text
+    assert 'ValueError: Wrong order.' \
+        in logging.Formatter().format(queued)
@@ -0,0 +1,46 @@
+# -*- coding: utf-8 -*-
+"""Tests of compiled time plans."""
+
+import datetime
+import pytest
+from autotrader.holidays import HolidayCalendar, default_holidays
+from autotrader.timeplan import TimePlan, TimePlanError
+
+
+@pytest.mark.parametrize('line', ['24', '12-10', '10:60', '9-17/x', 'abc',
+                                  '-1', ''])
+def test_invalid_lines_raise(line):
+    with pytest.raises(TimePlanError):
+        TimePlan(line)
+
+
+def test_lines_are_compiled():
+    plan = TimePlan('9-10:15/30, 17')
+    assert plan.times == [datetime.time(9, 15), datetime.time(9, 45),
+                          datetime.time(10, 15), datetime.time(10, 45),
+                          datetime.time(17, 0)]
+
+
+def test_next_after_skips_night_and_holiday():
+    calendar = HolidayCalendar(file_name=None)
+    # Wednesday 2030-06-05 is closed
+    calendar.years[2030] = default_holidays(2030) | {datetime.date(2030, 6, 5)}
+    plan = TimePlan('10, 16', calendar=calendar)
+
+    tuesday = datetime.datetime(2030, 6, 4)
+    assert plan.next_after(tuesday.replace(hour=10)) \
+        == tuesday.replace(hour=16)
+    # across the day boundary and the holiday
+    assert plan.next_after(tuesday.replace(hour=16)) \
+        == datetime.datetime(2030, 6, 6, 10)
+    # across the weekend
+    assert plan.next_after(datetime.datetime(2030, 6, 7, 17)) \
+        == datetime.datetime(2030, 6, 10, 10)
+
+
+def test_points_are_lazy_and_bounded():
+    plan = TimePlan('10')
+    start = datetime.datetime(2030, 6, 4, 12)
+    points = list(plan.points(start, start + datetime.timedelta(days=3)))
+    assert points == [datetime.datetime(2030, 6, day, 10)
+                      for day in (5, 6, 7)]